@@ -5,12 +5,13 @@ import re
 from datetime import datetime, timedelta, date, time
 from functools import wraps
 from math import ceil
+from time import perf_counter
 from dateutil.relativedelta import relativedelta
 from io import StringIO
 from flask_mail import Mail, Message
 from itsdangerous import URLSafeTimedSerializer
 from calendar import monthrange
-import logging
+import click
 
 from flask import (
     Flask,
@@ -22,10 +23,10 @@ from flask import (
     send_from_directory,
     send_file,
     make_response,
-    render_template
+    render_template,
+    stream_with_context
 )
 from flask_cors import CORS
-from sqlalchemy.orm import joinedload
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import (
     JWTManager,
@@ -43,6 +44,33 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from sqlalchemy import or_, func, desc, asc
 
+import approval_queue
+import capture
+import compression
+import endpoint_bench
+import fieldsets
+import intake
+import json_provider
+import ledger
+import logs
+import metrics
+import portfolio
+import profiler
+import replay
+import rates
+import read_models
+import result_cache
+import forecast
+import stress
+import synthetic
+import valuation
+import versions
+import scheduler
+import sql_inspector
+import fulltext
+import withdrawals
+import work_queue
+
 from models import (
     db,
     AdminUser,
@@ -52,13 +80,23 @@ from models import (
     Notification,
     AuditLog,
     LoanRepayment,
-    WithdrawalRequest
+    WithdrawalRequest,
+    SchedulerLock,
+    QueuedApproval,
+    InvestmentValuation,
+    transition_status,
+    ConcurrentUpdateError,
+    INVESTOR_FIELDS,
+    LOAN_FIELDS,
+    INVESTMENT_ACTIVE_STATUSES,
+    LOAN_ACTIVE_STATUSES,
+    matching_statuses,
+    add_missing_columns
 )
 
 # -------------------- App & DB Config --------------------
 app = Flask(__name__)
-
-app.logger.setLevel(logging.DEBUG)
+app.json = json_provider.OrjsonProvider(app)
 
 # --- Gmail SMTP Configuration ---
 app.config.update(
@@ -90,7 +128,7 @@ UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app.config.update({
-    'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(basedir, 'microfinance.db')}",
+    'SQLALCHEMY_DATABASE_URI': os.environ.get('SQLALCHEMY_DATABASE_URI', f"sqlite:///{os.path.join(basedir, 'microfinance.db')}"),
     'SQLALCHEMY_TRACK_MODIFICATIONS': False,
     'JWT_SECRET_KEY': os.environ.get('JWT_SECRET_KEY', '9b353dec2ca5d21763c7577dee8f113cc09f9234d1083e89c883447004d3b590'),
     'UPLOAD_FOLDER': UPLOAD_FOLDER,
@@ -106,14 +144,67 @@ app.config.update({
 
     # ←— Refresh token cookie only sent on this endpoint
     'JWT_REFRESH_COOKIE_PATH': '/api/auth/refresh',
+
+    # ←— Withdrawal surge intake: 'off', 'on' or 'window' (only 28th–8th)
+    'WITHDRAWAL_SURGE_MODE': os.environ.get('WITHDRAWAL_SURGE_MODE', 'off'),
+    'INTAKE_DATABASE_URI': os.environ.get('INTAKE_DATABASE_URI', f"sqlite:///{os.path.join(basedir, 'intake.db')}"),
+    'INTAKE_WORKERS': int(os.environ.get('INTAKE_WORKERS', 1)),
+    'INTAKE_RATE': int(os.environ.get('INTAKE_RATE', 200)),
+
+    # ←— Result cache for expensive reads: 'memory' (per worker) or 'sqlite' (shared file)
+    'RESULT_CACHE_BACKEND': os.environ.get('RESULT_CACHE_BACKEND', 'memory'),
+    'RESULT_CACHE_PATH': os.environ.get('RESULT_CACHE_PATH', os.path.join(basedir, 'result_cache.db')),
+
+    # ←— gzip/brotli for JSON, CSV and text responses (routes override with @compression.level)
+    'COMPRESS_LEVEL': int(os.environ.get('COMPRESS_LEVEL', 6)),
+    'COMPRESS_MIN_SIZE': int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+
+    # ←— /metrics: set METRICS_DIR to aggregate across worker processes; METRICS_TOKEN guards the endpoint
+    'METRICS_DIR': os.environ.get('METRICS_DIR'),
+    'METRICS_FLUSH_SECONDS': float(os.environ.get('METRICS_FLUSH_SECONDS', 1.0)),
+    'METRICS_TOKEN': os.environ.get('METRICS_TOKEN'),
+
+    # ←— Development/staging SQL inspector: per-request reports, N+1 warnings, slow-query plans
+    'SQL_INSPECT': os.environ.get('SQL_INSPECT', '0') == '1',
+    'SQL_SLOW_MS': float(os.environ.get('SQL_SLOW_MS', 100)),
+    'SQL_N_PLUS_ONE_THRESHOLD': int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5)),
+    'SQL_REPORTS_DIR': os.environ.get('SQL_REPORTS_DIR'),  # shared by serve.py workers; per-process ring if unset
+
+    # ←— Request profiling: signed X-Profile-Token header, or a sampled share of all requests
+    'PROFILE_DIR': os.environ.get('PROFILE_DIR', os.path.join(basedir, 'profiles')),
+    'PROFILE_SAMPLE_RATE': float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0)),
+    'PROFILE_SAMPLE_MODE': os.environ.get('PROFILE_SAMPLE_MODE', 'sample'),
+    'PROFILE_INTERVAL_MS': float(os.environ.get('PROFILE_INTERVAL_MS', 5)),
+    'PROFILE_KEEP': int(os.environ.get('PROFILE_KEEP', 100)),
+
+    # ←— Traffic capture for replay.py: anonymized request metadata, one file per worker in CAPTURE_DIR
+    'CAPTURE_DIR': os.environ.get('CAPTURE_DIR'),
+    'CAPTURE_SAMPLE': float(os.environ.get('CAPTURE_SAMPLE', 1.0)),
+    'CAPTURE_BATCH': int(os.environ.get('CAPTURE_BATCH', 100)),
+
+    # ←— Logging: JSON lines via a background writer; per-logger levels, throttled repeats, sampling
+    'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'INFO'),
+    'LOG_LEVELS': os.environ.get('LOG_LEVELS', ''),
+    'LOG_FORMAT': os.environ.get('LOG_FORMAT', 'json'),
+    'LOG_FILE': os.environ.get('LOG_FILE'),
+    'LOG_RATE_LIMIT': int(os.environ.get('LOG_RATE_LIMIT', 20)),
+    'LOG_RATE_WINDOW': float(os.environ.get('LOG_RATE_WINDOW', 60)),
+    'LOG_SAMPLE': os.environ.get('LOG_SAMPLE', ''),
 })
 serializer = URLSafeTimedSerializer(app.config['JWT_SECRET_KEY'])
 CONFIRM_TOKEN_EXPIRATION = 600
 PASSWORD_RESET_EXPIRATION = 600
 
-# Initialize DB + JWT
+# Initialize logging, DB + JWT
+logs.init_app(app)
 db.init_app(app) 
 jwt = JWTManager(app)
+compression.init_app(app)
+intake.init_app(app)
+metrics.init_app(app)
+sql_inspector.init_app(app)
+profiler.init_app(app)
+capture.init_app(app)
 
 def send_email(to, subject, html_body):
     """
@@ -141,6 +232,19 @@ def _missing_token_callback(error_string):
     current_app.logger.warning("Missing JWT: %s", error_string)
     return jsonify(error="Missing token"), 401
 
+@app.errorhandler(fieldsets.InvalidFields)
+def _invalid_fields(error):
+    return jsonify(error=str(error)), 400
+
+@app.errorhandler(ConcurrentUpdateError)
+def _concurrent_update(error):
+    # transition_status ran out of retries: the row is busy, not the request wrong
+    db.session.rollback()
+    current_app.logger.warning("Concurrent update conflict: %s", error)
+    response = jsonify(error="This record is being updated by another request; please retry", retry=True)
+    response.headers['Retry-After'] = '1'
+    return response, 409
+
 
 # -------------------- Helpers --------------------
 def audit_log(actor_id, role, action, details=None):
@@ -150,7 +254,8 @@ def audit_log(actor_id, role, action, details=None):
         action=action,
         details=details,
         ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        user_agent=request.headers.get('User-Agent'),
+        request_id=logs.request_id()
     )
     db.session.add(log)
     db.session.commit()
@@ -159,19 +264,10 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'pdf'}
 
 def is_within_window():
-    today = date.today().day
-    return today >= 28 or today <= 8
+    return approval_queue.window_is_open()
 
 def calculate_interest_rate(amount, duration_months):
-    brackets = [
-        (28, 99, {1:8, 2:8, 3:8, 4:10, 5:10, 6:10, 7:12, 8:12, 9:12, 10:12, 11:12, 12:12}),
-        (100, 199, {1:10,2:10,3:10,4:12,5:12,6:12,7:13,8:13,9:13,10:13,11:13,12:13}),
-        (200, float('inf'), {1:12,2:12,3:12,4:14,5:14,6:14,7:15,8:15,9:15,10:15,11:15,12:15})
-    ]
-    for lo, hi, rates in brackets:
-        if lo <= amount <= hi:
-            return rates.get(duration_months, rates[max(rates)])
-    return 0
+    return rates.rate_for(amount, duration_months)
 
 def loan_interest_rate(amount):
     if 28 <= amount <= 99:
@@ -186,36 +282,6 @@ def validate_email(email):
     pattern = r'^\S+@\S+\.\S+$'
     return re.match(pattern, email)
 
-def calculate_expected_return(amount, duration_months):
-    # Example rates - adjust to your actual rates
-    if amount < 100:
-        if duration_months <= 3:
-            rate = 0.08
-        elif duration_months <= 6:
-            rate = 0.10
-        else:
-            rate = 0.12
-    elif amount < 200:
-        if duration_months <= 3:
-            rate = 0.10
-        elif duration_months <= 6:
-            rate = 0.12
-        else:
-            rate = 0.13
-    else:
-        if duration_months <= 3:
-            rate = 0.12
-        elif duration_months <= 6:
-            rate = 0.14
-        else:
-            rate = 0.15
-
-    # Compound interest monthly
-    total_return = amount * ((1 + rate) ** duration_months)
-    expected_profit = total_return - amount
-    return expected_profit, total_return
-
-
 # -------------------- Decorators --------------------
 def admin_required(fn):
     @wraps(fn)
@@ -629,7 +695,13 @@ def investor_investment_history():
     # Base query
     query = Investment.query.filter_by(investor_id=inv_id)
     if status_filter:
-        query = query.filter_by(status=status_filter)
+        query = query.filter(Investment.status.in_(matching_statuses(status_filter, INVESTMENT_ACTIVE_STATUSES)))
+    if ready_withdrawal_filter:
+        # Narrow in SQL using the stored status/maturity; the exact check still runs below
+        query = query.filter(
+            Investment.status.in_(INVESTMENT_ACTIVE_STATUSES),
+            or_(Investment.maturity_date.is_(None), Investment.maturity_date <= today.date())
+        )
 
     # Sorting
     if sort_by in ['amount', 'rate', 'created_at']:
@@ -655,11 +727,11 @@ def investor_investment_history():
             hour=0, minute=0, second=0, microsecond=0)
 
         # Can only request withdrawal if:
-        #  1. status is 'approved'
+        #  1. status is 'approved' or 'matured'
         #  2. today >= expected_dt
         #  3. we're in the 28th–8th withdrawal window
         can_withdraw_now = (
-            inv.status == 'approved' and
+            inv.status in INVESTMENT_ACTIVE_STATUSES and
             today.date() >= expected_dt.date() and
             in_withdrawal_window(today)
         )
@@ -676,7 +748,7 @@ def investor_investment_history():
             'rate': inv.rate,
             'duration_months': inv.duration_months,
             'status': inv.status,
-            'is_approved': (inv.status == 'approved'),
+            'is_approved': (inv.status in INVESTMENT_ACTIVE_STATUSES),
             'created_at': inv.created_at.strftime('%Y-%m-%d'),
             'expected_return': round(inv.projected_value(), 2),
             'expected_withdrawal_date': expected_dt.strftime('%Y-%m-%d'),
@@ -706,34 +778,47 @@ def request_withdrawal(investment_id):
     if not is_within_window():
         return jsonify(error='Withdrawals only allowed from 28th to 8th'), 400
 
-    investment = db.session.get(Investment, investment_id)
-    if investment is None:
-        abort(404)
-
-    # Remove the is_approved check—just check status
-    if investment.status != 'approved':
-        return jsonify(error='Only approved investments can be withdrawn'), 400
-
-    # Prevent duplicate pending requests
-    if WithdrawalRequest.query.filter_by(investment_id=investment_id, status='pending').first():
-        return jsonify(error='You already requested a withdrawal for this investment'), 400
-
     investor_id = get_jwt_identity()
 
-    withdrawal = WithdrawalRequest(
-        investment_id=investment.id,
-        investor_id=investor_id,
-        amount=investment.amount,
-        status='pending',
-        created_at=datetime.utcnow()
-    )
-    investment.status = 'withdrawal_requested'
-    db.session.add(withdrawal)
+    # Surge mode: accept into the intake queue, workers validate and persist it
+    if intake.surge_enabled(app, window_open=True):
+        request_id = intake.submit_withdrawal(investor_id, investment_id)
+        return jsonify(
+            msg='Withdrawal request received',
+            request_id=request_id,
+            status_url=f'/api/investor/withdrawal-requests/{request_id}'
+        ), 202
+
+    try:
+        withdrawals.open_withdrawal(investment_id, investor_id)
+    except LookupError:
+        abort(404)
+    except withdrawals.WithdrawalRefused as exc:
+        db.session.rollback()
+        return jsonify(error=str(exc)), 400
     db.session.commit()
     audit_log(investor_id, 'investor', f'Requested withdrawal for investment {investment_id}')
     return jsonify(msg='Withdrawal requested'), 200
 
 
+@app.route('/api/investor/withdrawal-requests/<string:request_id>', methods=['GET'])
+@investor_required
+def withdrawal_request_status(request_id):
+    status = intake.get_status(request_id, get_jwt_identity())
+    if status is None:
+        return jsonify(error='Request not found'), 404
+    return jsonify(status), 200
+
+
+@app.route('/api/admin/withdrawal-intake', methods=['GET'])
+@admin_required
+def withdrawal_intake_backlog():
+    return jsonify(
+        surge_mode=app.config['WITHDRAWAL_SURGE_MODE'],
+        backlog=intake.backlog()
+    ), 200
+
+
 @app.route('/api/investor/withdrawal-proof/<filename>', methods=['GET'])
 @investor_required
 def serve_withdrawal_proof(filename):
@@ -759,10 +844,8 @@ def confirm_withdrawal(withdrawal_id):
 
     withdrawal = WithdrawalRequest.query.filter_by(id=withdrawal_id, investor_id=investor_id).first_or_404()
 
-    if withdrawal.status != 'paid':
+    if not transition_status(WithdrawalRequest, withdrawal.id, 'paid', status='completed'):
         return jsonify(error='This withdrawal is not marked as paid yet'), 400
-
-    withdrawal.status = 'completed'
     db.session.commit()
 
     audit_log(investor_id, 'investor', f'Confirmed withdrawal receipt for withdrawal {withdrawal_id}')
@@ -772,50 +855,31 @@ def confirm_withdrawal(withdrawal_id):
 # -------------------- Admin: Get Withdrawals --------------------
 @app.route('/api/admin/withdrawals', methods=['GET'])
 @admin_required
+@versions.conditional(WithdrawalRequest, Investment, Investor)
 def get_withdrawals():
     # query args
     status = request.args.get('status')
     page   = int(request.args.get('page', 1))
     per_page = 20
 
-    # base query, ordered newest first
-    qry = db.session.query(WithdrawalRequest) \
-        .order_by(WithdrawalRequest.created_at.desc())
-
-    if status:
-        qry = qry.filter(WithdrawalRequest.status == status)
-
-    # eager‑load each withdrawal’s investment → investor
-    qry = qry.options(
-        joinedload(WithdrawalRequest.investment)
-            .joinedload(Investment.investor)
-    )
-
-    # paginate
-    pagination = qry.paginate(page=page, per_page=per_page, error_out=False)
-    withdrawals = pagination.items
+    # newest first, each with its investment terms and investor name
+    pagination = read_models.withdrawals(status, page, per_page)
 
     results = []
-    for w in withdrawals:
-        inv = w.investment
-        investor = inv.investor
-
+    for w in pagination.items:
         # build full name (first_name + surname)
-        investor_name = f"{investor.first_name} {investor.surname}"
+        investor_name = f"{w.investor_first_name} {w.investor_surname}"
 
-        # calculate expected withdrawal amount if not stored
-        if getattr(inv, 'expected_withdrawal_amount', None) is not None:
-            expected = inv.expected_withdrawal_amount
-        else:
-            principal = inv.amount
-            rate      = inv.rate / 100.0
-            months    = inv.duration_months
-            expected  = round(principal * ((1 + rate) ** months), 2)
+        # calculate expected withdrawal amount
+        principal = w.investment_amount
+        rate      = w.investment_rate / 100.0
+        months    = w.investment_duration_months
+        expected  = round(principal * ((1 + rate) ** months), 2)
 
         results.append({
             "id": w.id,
-            "investment_id": inv.id,
-            "investor_id": investor.id,
+            "investment_id": w.investment_id,
+            "investor_id": w.investor_id,
             "investor_name": investor_name,
             "amount": float(w.amount),
             "expected_withdrawal_amount": expected,
@@ -824,7 +888,7 @@ def get_withdrawals():
         })
 
     return jsonify({
-        "withdrawals": results,
+        "withdrawals": json_provider.listing(results),
         "total_pages": pagination.pages
     })
 
@@ -842,22 +906,21 @@ def approve_withdrawal(withdrawal_id):
         return jsonify(error='Proof of payment file is required'), 400
 
     filename = secure_filename(f"withdrawal_proof_{withdrawal.id}_{proof.filename}")
+
+    # Claim the withdrawal first so two admins can't both pay it out
+    if not transition_status(WithdrawalRequest, withdrawal.id, 'pending',
+                             status='paid', proof_of_payment=filename):
+        db.session.rollback()
+        return jsonify(error='Withdrawal already processed'), 400
+    transition_status(Investment, withdrawal.investment_id, 'withdrawal_requested', status='withdrawn')
+    ledger.post_withdrawal_paid(withdrawal, db.session.get(Investment, withdrawal.investment_id))
+    portfolio.withdrawal_paid(withdrawal.investor_id)
+
     proof_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'withdrawals')
     os.makedirs(proof_folder, exist_ok=True)
     filepath = os.path.join(proof_folder, filename)
     proof.save(filepath)
 
-    withdrawal.status = 'paid'
-    withdrawal.proof_of_payment = filename
-    withdrawal.date_approved = datetime.utcnow()  # if your model supports it
-
-    investment = db.session.get(Investment, withdrawal.investment_id)
-    if investment:
-        investment.status = 'withdrawn'
-        investment.withdrawal_paid = True
-        investment.withdrawal_payment_proof = filename
-        investment.withdrawal_date = datetime.utcnow()
-
     db.session.commit()
     audit_log(get_jwt_identity(), 'admin', f'Approved withdrawal {withdrawal_id}')
     return jsonify(msg='Withdrawal approved and marked paid')
@@ -871,10 +934,14 @@ def reject_withdrawal(withdrawal_id):
     if withdrawal.status != 'pending':
         return jsonify(error='Withdrawal already processed'), 400
 
-    withdrawal.status = 'rejected'
-    investment = Investment.query.get(withdrawal.investment_id)
-    if investment:
-        investment.status = 'approved'
+    if not transition_status(WithdrawalRequest, withdrawal.id, 'pending', status='rejected'):
+        db.session.rollback()
+        return jsonify(error='Withdrawal already processed'), 400
+    investment = db.session.get(Investment, withdrawal.investment_id)
+    restored = 'matured' if investment and investment.maturity_date \
+        and investment.maturity_date <= date.today() else 'approved'
+    if transition_status(Investment, withdrawal.investment_id, 'withdrawal_requested', status=restored):
+        portfolio.withdrawal_rejected(investment)
 
     db.session.commit()
     audit_log(get_jwt_identity(), 'admin', f'Rejected withdrawal {withdrawal_id}')
@@ -887,25 +954,15 @@ def reject_withdrawal(withdrawal_id):
 def investor_withdrawals():
     investor_id = int(get_jwt_identity())
     # Pull all withdrawals for this investor, newest first
-    withdrawals = (
-        db.session.query(WithdrawalRequest)
-        .join(Investment, WithdrawalRequest.investment_id == Investment.id)
-        .filter(WithdrawalRequest.investor_id == investor_id)
-        .order_by(WithdrawalRequest.created_at.desc())
-        .all()
-    )
+    withdrawals = read_models.investor_withdrawals(investor_id)
 
     result = []
     for w in withdrawals:
-        inv = db.session.get(Investment, w.investment_id)
-        # Compute expected withdrawal amount if not stored on Investment
-        if getattr(inv, 'expected_withdrawal_amount', None) is not None:
-            expected = inv.expected_withdrawal_amount
-        else:
-            p = inv.amount
-            r = inv.rate / 100.0
-            n = inv.duration_months
-            expected = round(p * ((1 + r) ** n), 2)
+        # Compute expected withdrawal amount from the investment's terms
+        p = w.investment_amount
+        r = w.investment_rate / 100.0
+        n = w.investment_duration_months
+        expected = round(p * ((1 + r) ** n), 2)
 
         result.append({
             'id': w.id,
@@ -955,6 +1012,7 @@ def submit_loan_application():
     loan.repayment_due_date = None
 
     db.session.add(loan)
+    portfolio.loan_submitted(loan)
     db.session.commit()
 
     return jsonify({
@@ -971,11 +1029,15 @@ def approve_investment(investment_id):
     investment = db.session.get(Investment, investment_id)
     if investment is None:
         abort(404)
-    if investment.status != 'pending':
+    if work_queue.claimed_by_other(Investment, investment_id, get_jwt_identity()):
+        return jsonify(error='This item is being reviewed by another admin'), 409
+    approved_at = datetime.utcnow()
+    if not transition_status(Investment, investment_id, 'pending', status='approved',
+                             approved_at=approved_at, is_authorized=True,
+                             maturity_date=Investment.maturity_for(approved_at, investment.duration_months)):
         return jsonify(error='Investment not pending approval'), 400
-    investment.status = 'approved'
-    investment.approved_at = datetime.utcnow()
-    investment.is_authorized = True
+    ledger.post_investment_approved(investment)
+    portfolio.investment_opened(investment)
     db.session.commit()
     notif = Notification(investor_id=investment.investor_id, message=f'Investment {investment_id} approved')
     db.session.add(notif)
@@ -996,12 +1058,14 @@ def reapprove_investment(investment_id):
     investment = db.session.get(Investment, investment_id)
     if investment is None:
          abort(404)
-    if investment.status != 'rejected':
+    # Re‑approve; the term starts now, as for a first approval
+    approved_at = datetime.utcnow()
+    if not transition_status(Investment, investment_id, 'rejected', status='approved',
+                             approved_at=approved_at, is_authorized=True,
+                             maturity_date=Investment.maturity_for(approved_at, investment.duration_months)):
         return jsonify(error='Investment not in rejected status'), 400
-
-    # Re‑approve
-    investment.status = 'approved'
-    investment.is_authorized = True
+    ledger.post_investment_approved(investment)
+    portfolio.investment_opened(investment)
     db.session.commit()
 
     # Notify investor
@@ -1023,7 +1087,9 @@ def reapprove_investment(investment_id):
 
 # -------------------- Admin View Pending Investments --------------------
 @app.route('/api/admin/pending-investments', methods=['GET'])
-@jwt_required()  # or @admin_required if you have that decorator
+@jwt_required()
+@admin_required
+@versions.conditional(Investment, Investor)
 def view_pending_investments():
     current_user = get_jwt_identity()
 
@@ -1034,17 +1100,9 @@ def view_pending_investments():
     # 2. Base query
     query = Investment.query.filter_by(status='pending')
 
-    # 3. Optional search across investor fields
+    # 3. Optional ranked search across investor fields
     if search:
-        pattern = f"%{search}%"
-        query = query.join(Investor).filter(
-            db.or_(
-                Investor.first_name.ilike(pattern),
-                Investor.surname.ilike(pattern),
-                Investor.username.ilike(pattern),
-                Investor.email.ilike(pattern),
-            )
-        )
+        query = fulltext.ranked(query.join(Investor), Investor, search)
 
     # 4. Pagination
     per_page     = 10
@@ -1072,7 +1130,7 @@ def view_pending_investments():
         })
 
     return jsonify({
-        'pending_investments':  results,
+        'pending_investments':  json_provider.listing(results),
         'total_pages': total_pages
     }), 200
 
@@ -1083,9 +1141,10 @@ def reject_investment(investment_id):
     investment = db.session.get(Investment, investment_id)
     if investment is None:
         abort(404)
-    if investment.status != 'pending':
+    if work_queue.claimed_by_other(Investment, investment_id, get_jwt_identity()):
+        return jsonify(error='This item is being reviewed by another admin'), 409
+    if not transition_status(Investment, investment_id, 'pending', status='rejected'):
         return jsonify(error='Investment not pending approval'), 400
-    investment.status = 'rejected'
     db.session.commit()
     notif = Notification(investor_id=investment.investor_id, message=f'Investment {investment_id} rejected')
     db.session.add(notif)
@@ -1096,30 +1155,20 @@ def reject_investment(investment_id):
 
 @app.route('/api/admin-investments', methods=['GET'])
 @admin_required
+@versions.conditional(Investment, Investor)
 def view_all_investments():
     status_filter = request.args.get('status')
     sort_by       = request.args.get('sort_by', 'created_at')
     order         = request.args.get('order', 'desc')
 
-    query = Investment.query
-    if status_filter:
-        query = query.filter_by(status=status_filter)
-
     # Ordering is handled in Python below to support custom keys
-    investments = query.all()
+    investments = read_models.investments(status_filter)
 
     result = []
     for inv in investments:
-        investor = db.session.get(Investor, inv.investor_id)
-
         raw_maturity = inv.created_at + timedelta(days=30 * inv.duration_months)
         expected_withdrawal_date = get_next_withdrawal_window(raw_maturity)
 
-        # Auto‑fill withdrawal_date when approved
-        if inv.status == 'approved' and not inv.expected_withdrawal_date:
-            inv.withdrawal_date = expected_withdrawal_date
-            db.session.commit()
-
         expected_amount = round(
             inv.amount * ((1 + inv.rate / 100) ** inv.duration_months),
             2
@@ -1132,8 +1181,11 @@ def view_all_investments():
             'rate': inv.rate,
             'status': inv.status,
             'proof_of_payment': inv.proof_of_payment,
-            'investor_name': f"{investor.first_name} {investor.surname}" if investor else 'Unknown',
-            'investor_phone': investor.phone if investor else '',
+            'investor_name': (
+                f"{inv.investor_first_name} {inv.investor_surname}" if inv.investor_first_name is not None
+                else 'Unknown'
+            ),
+            'investor_phone': inv.investor_phone or '',
             'created_at': inv.created_at.strftime('%Y-%m-%d'),
             'expected_withdrawal_date': expected_withdrawal_date.strftime('%Y-%m-%d'),
             'expected_withdrawal_amount': expected_amount
@@ -1147,23 +1199,36 @@ def view_all_investments():
     else:
         result.sort(key=lambda x: x['created_at'], reverse=(order == 'desc'))
 
-    return jsonify(investments=result), 200
+    return jsonify(investments=json_provider.listing(result)), 200
 
 # -------------------- Admin Approve Loan --------------------
 @app.route('/api/admin/approve-loan/<int:loan_id>', methods=['PUT'])
 @jwt_required()
 @admin_required
 def approve_loan(loan_id):
-    if not is_within_window():
-        return jsonify(error='Loan approvals only allowed from 28th to 8th'), 400
     loan = LoanApplication.query.get_or_404(loan_id)
-    if loan.status != 'pending':
-        return jsonify(error='Loan not pending approval'), 400
-
-    loan.status = 'approved'
-    loan.approved_at = datetime.utcnow()
+    if work_queue.claimed_by_other(LoanApplication, loan_id, get_jwt_identity()):
+        return jsonify(error='This item is being reviewed by another admin'), 409
+    if not is_within_window():
+        # Outside 28th–8th the approval is queued and applied when the window opens
+        if loan.status != 'pending':
+            return jsonify(error='Loan not pending approval'), 400
+        item, created = approval_queue.queue_loan_approval(loan_id, get_jwt_identity())
+        db.session.commit()
+        if created:
+            audit_log(get_jwt_identity(), 'admin', f'Queued approval of loan {loan_id}')
+        return jsonify(
+            msg='Loan approval queued until the window opens on the 28th',
+            queued_approval_id=item.id
+        ), 202
+    approved_at = datetime.utcnow()
     # Auto-calculate repayment due date (30 days ahead)
-    loan.repayment_due_date = loan.approved_at + timedelta(days=30)
+    if not transition_status(LoanApplication, loan_id, 'pending', status='approved',
+                             approved_at=approved_at,
+                             repayment_due_date=approved_at + timedelta(days=30)):
+        return jsonify(error='Loan not pending approval'), 400
+    ledger.post_loan_approved(loan)
+    portfolio.loan_approved(loan)
 
     db.session.commit()
     notif = Notification(investor_id=loan.investor_id, message=f'Loan {loan_id} approved')
@@ -1174,14 +1239,104 @@ def approve_loan(loan_id):
 
 
 
+# -------------------- Admin: Queued Approvals --------------------
+@app.route('/api/admin/queued-approvals', methods=['GET'])
+@admin_required
+def list_queued_approvals():
+    status = request.args.get('status', type=str)
+    batch_id = request.args.get('batch_id', type=str)
+    query = QueuedApproval.query
+    if status:
+        query = query.filter(QueuedApproval.status == status)
+    if batch_id:
+        query = query.filter(QueuedApproval.batch_id == batch_id)
+    items = query.order_by(QueuedApproval.id.desc()).limit(500).all()
+    return jsonify(
+        window_open=is_within_window(),
+        queued_approvals=[item.to_dict() for item in items]
+    ), 200
+
+
+@app.route('/api/admin/queued-approvals/<int:item_id>', methods=['DELETE'])
+@admin_required
+def cancel_queued_approval(item_id):
+    QueuedApproval.query.get_or_404(item_id)
+    if not approval_queue.cancel(item_id):
+        return jsonify(error='Approval is no longer queued'), 400
+    db.session.commit()
+    audit_log(get_jwt_identity(), 'admin', f'Cancelled queued approval {item_id}')
+    return jsonify(msg='Queued approval cancelled'), 200
+
+
+@app.route('/api/admin/queued-approvals/apply', methods=['POST'])
+@admin_required
+def apply_queued_approvals():
+    if not is_within_window():
+        return jsonify(error='Queued approvals can only be applied from 28th to 8th'), 400
+    summary = approval_queue.apply_queued()
+    audit_log(get_jwt_identity(), 'admin', 'Applied queued approvals', details=str(summary))
+    return jsonify(summary), 200
+
+
+# -------------------- Admin: Review Work Queues --------------------
+@app.route('/api/admin/work-queue/<string:kind>', methods=['GET'])
+@admin_required
+def my_work_queue(kind):
+    model = work_queue.KINDS.get(kind)
+    if model is None:
+        return jsonify(error=f"kind must be one of {', '.join(work_queue.KINDS)}"), 400
+    items = work_queue.held(model, get_jwt_identity())
+    return jsonify(
+        items=work_queue.review_items(kind, items),
+        backlog=work_queue.backlog(model)
+    ), 200
+
+
+@app.route('/api/admin/work-queue/<string:kind>/claim', methods=['POST'])
+@admin_required
+def claim_work(kind):
+    model = work_queue.KINDS.get(kind)
+    if model is None:
+        return jsonify(error=f"kind must be one of {', '.join(work_queue.KINDS)}"), 400
+    data = request.get_json(silent=True) or {}
+    try:
+        count = int(data.get('count', 5))
+    except (TypeError, ValueError):
+        return jsonify(error='count must be an integer'), 400
+    if not 0 <= count <= work_queue.MAX_CLAIM:
+        return jsonify(error=f'count must be between 0 and {work_queue.MAX_CLAIM}'), 400
+
+    items = work_queue.claim(model, get_jwt_identity(), count)
+    return jsonify(
+        items=work_queue.review_items(kind, items),
+        lease_seconds=int(work_queue.LEASE.total_seconds()),
+        backlog=work_queue.backlog(model)
+    ), 200
+
+
+@app.route('/api/admin/work-queue/<string:kind>/release', methods=['POST'])
+@admin_required
+def release_work(kind):
+    model = work_queue.KINDS.get(kind)
+    if model is None:
+        return jsonify(error=f"kind must be one of {', '.join(work_queue.KINDS)}"), 400
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if ids is not None and not isinstance(ids, list):
+        return jsonify(error='ids must be a list'), 400
+    released = work_queue.release(model, get_jwt_identity(), ids)
+    return jsonify(released=released), 200
+
+
 # -------------------- Admin Reject Loan --------------------
 @app.route('/api/admin/reject-loan/<int:loan_id>', methods=['PUT'])
 @admin_required
 def reject_loan(loan_id):
     loan = LoanApplication.query.get_or_404(loan_id)
-    if loan.status != 'pending':
+    if work_queue.claimed_by_other(LoanApplication, loan_id, get_jwt_identity()):
+        return jsonify(error='This item is being reviewed by another admin'), 409
+    if not transition_status(LoanApplication, loan_id, 'pending', status='rejected'):
         return jsonify(error='Loan not pending approval'), 400
-    loan.status = 'rejected'
     db.session.commit()
     notif = Notification(investor_id=loan.investor_id, message=f'Loan {loan_id} rejected')
     db.session.add(notif)
@@ -1192,36 +1347,31 @@ def reject_loan(loan_id):
 # -------------------- Admin List of Pending Investors --------------------
 @app.route('/api/admin/pending-investors', methods=['GET'])
 @admin_required
+@versions.conditional(Investor)
 def get_pending_investors():
     page   = request.args.get('page', 1, type=int)
     search = request.args.get('search', "", type=str).strip()
 
+    fields = INVESTOR_FIELDS.parse()
+
     # Only those that are not approved and not rejected
-    query = Investor.query.filter(
+    query = Investor.query.options(INVESTOR_FIELDS.load_only(fields)).filter(
         Investor.is_confirmed.is_(True),
         Investor.is_approved.is_(False),
         Investor.is_rejected.is_(False)
     )
 
     if search:
-        pattern = f"%{search}%"
-        query = query.filter(
-            db.or_(
-                Investor.first_name.ilike(pattern),
-                Investor.surname.ilike(pattern),
-                Investor.username.ilike(pattern),
-                Investor.email.ilike(pattern),
-            )
-        )
+        query = fulltext.ranked(query, Investor, search)
 
     paginated   = query.order_by(Investor.id)\
                        .paginate(page=page, per_page=10, error_out=False)
     total_pages = paginated.pages
 
-    results = [ inv.to_dict() for inv in paginated.items ]
+    results = [ inv.to_dict(fields) for inv in paginated.items ]
 
     return jsonify({
-        'investors':    results,
+        'investors':    json_provider.listing(results),
         'total_pages':  total_pages
     }), 200
 
@@ -1232,6 +1382,8 @@ def approve_investor(investor_id):
     investor = Investor.query.get_or_404(investor_id)
     if investor.is_approved:
         return jsonify(error='Investor already approved'), 400
+    if work_queue.claimed_by_other(Investor, investor_id, get_jwt_identity()):
+        return jsonify(error='This item is being reviewed by another admin'), 409
 
     investor.is_approved = True
     db.session.commit()
@@ -1261,17 +1413,8 @@ def approve_investor(investor_id):
 
 
 # -------------------- Admin: Get full Investor details --------------------
-@app.route('/api/admin/investors/<int:investor_id>', methods=['GET'])
-@jwt_required()
-@admin_required
-def get_investor_details(investor_id):
-    investor = Investor.query.get_or_404(investor_id)
-
-    # Base dict from your model
-    inv_data = investor.to_dict()
-
-    # Add loans & investments arrays
-    inv_data['investments'] = [
+def _investor_investments(investor):
+    return [
         {
             "id": inv.id,
             "amount": inv.amount,
@@ -1280,7 +1423,9 @@ def get_investor_details(investor_id):
         }
         for inv in investor.investments
     ]
-    inv_data['loans'] = [
+
+def _investor_loans(investor):
+    return [
         {
             "id": loan.id,
             "amount": loan.amount,
@@ -1290,33 +1435,44 @@ def get_investor_details(investor_id):
         for loan in investor.loans
     ]
 
-    return jsonify(inv_data)
+INVESTOR_DETAIL_FIELDS = fieldsets.Fieldset(dict(
+    INVESTOR_FIELDS.fields,
+    investments=fieldsets.computed([Investor.id], _investor_investments),
+    loans=fieldsets.computed([Investor.id], _investor_loans),
+))
+
+@app.route('/api/admin/investors/<int:investor_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_investor_details(investor_id):
+    fields = INVESTOR_DETAIL_FIELDS.parse()
+    investor = Investor.query.options(INVESTOR_DETAIL_FIELDS.load_only(fields)).get_or_404(investor_id)
+
+    # Investor columns plus, unless left out of `fields`, the loans & investments arrays
+    return jsonify(INVESTOR_DETAIL_FIELDS.dump(investor, fields))
 
 # -------------------- Admin: List Active Investors --------------------
 @app.route('/api/admin/active-investors', methods=['GET'])
 @jwt_required()
 @admin_required
+@versions.conditional(Investor)
 def list_active_investors():
     page      = int(request.args.get('page', 1))
     search    = request.args.get('search', '').strip()
     per_page  = 10  # or whatever your default is
 
-    query = Investor.query.filter_by(is_approved=True)
+    fields    = INVESTOR_FIELDS.parse()
+
+    query = Investor.query.options(INVESTOR_FIELDS.load_only(fields)).filter_by(is_approved=True)
     if search:
-        query = query.filter(
-            or_(
-                Investor.first_name.ilike(f"%{search}%"),
-                Investor.surname.ilike(f"%{search}%"),
-                Investor.email.ilike(f"%{search}%")
-            )
-        )
+        query = fulltext.ranked(query, Investor, search)
 
     pagination = query.order_by(Investor.created_at.desc())\
                       .paginate(page=page, per_page=per_page, error_out=False)
 
-    investors = [inv.to_dict() for inv in pagination.items]
+    investors = [inv.to_dict(fields) for inv in pagination.items]
     return jsonify({
-        "investors": investors,
+        "investors": json_provider.listing(investors),
         "page":      pagination.page,
         "total_pages": pagination.pages
     })
@@ -1326,27 +1482,24 @@ def list_active_investors():
 @app.route('/api/admin/rejected-investors', methods=['GET'])
 @jwt_required()
 @admin_required
+@versions.conditional(Investor)
 def list_rejected_investors():
     page      = int(request.args.get('page', 1))
     search    = request.args.get('search', '').strip()
     per_page  = 10
 
-    query = Investor.query.filter_by(is_rejected=True)
+    fields    = INVESTOR_FIELDS.parse()
+
+    query = Investor.query.options(INVESTOR_FIELDS.load_only(fields)).filter_by(is_rejected=True)
     if search:
-        query = query.filter(
-            or_(
-                Investor.first_name.ilike(f"%{search}%"),
-                Investor.surname.ilike(f"%{search}%"),
-                Investor.email.ilike(f"%{search}%")
-            )
-        )
+        query = fulltext.ranked(query, Investor, search)
 
     pagination = query.order_by(Investor.created_at.desc())\
                       .paginate(page=page, per_page=per_page, error_out=False)
 
-    investors = [inv.to_dict() for inv in pagination.items]
+    investors = [inv.to_dict(fields) for inv in pagination.items]
     return jsonify({
-        "investors": investors,
+        "investors": json_provider.listing(investors),
         "page":      pagination.page,
         "total_pages": pagination.pages
     })
@@ -1426,6 +1579,8 @@ def reject_investor(investor_id):
 
     if inv.is_approved:
         return jsonify(error='Investor already approved'), 400
+    if work_queue.claimed_by_other(Investor, investor_id, get_jwt_identity()):
+        return jsonify(error='This item is being reviewed by another admin'), 409
 
     # Mark as rejected (not just “not approved”)
     inv.is_rejected = True
@@ -1456,9 +1611,22 @@ def reject_investor(investor_id):
 
 
 # -------------------- View Loans with Filtering and Pagination --------------------
+LOAN_LIST_FIELDS = fieldsets.Fieldset(dict(
+    LOAN_FIELDS.fields,
+    investor_name=fieldsets.computed(
+        [LoanApplication.investor_id],
+        lambda loan, investor_names: investor_names.get(loan.investor_id, 'Unknown')
+    ),
+))
+LOAN_LIST_DEFAULT = (
+    'loan_id', 'investor_id', 'investor_name', 'amount', 'status', 'interest_rate', 'submitted_at',
+    'approved_at', 'repayment_due_date', 'collateral', 'next_of_kin_details', 'other_details'
+)
+
 @app.route('/api/admin/loans', methods=['GET'])
 @jwt_required()
 @admin_required
+@versions.conditional(LoanApplication, Investor)
 def view_loans():
     status = request.args.get('status')
     investor_id = request.args.get('investor_id', type=int)
@@ -1468,10 +1636,11 @@ def view_loans():
     end_date = request.args.get('end_date')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    fields = LOAN_LIST_FIELDS.parse(default=LOAN_LIST_DEFAULT)
 
-    query = LoanApplication.query
+    query = LoanApplication.query.options(LOAN_LIST_FIELDS.load_only(fields))
     if status:
-        query = query.filter_by(status=status)
+        query = query.filter(LoanApplication.status.in_(matching_statuses(status, LOAN_ACTIVE_STATUSES)))
     if investor_id:
         query = query.filter_by(investor_id=investor_id)
     if min_amount is not None:
@@ -1495,30 +1664,22 @@ def view_loans():
                      .paginate(page=page, per_page=per_page, error_out=False)
     loans = paginated.items
 
-    result = []
-    for loan in loans:
-        investor = Investor.query.get(loan.investor_id)
-        result.append({
-            'loan_id': loan.id,
-            'investor_id': loan.investor_id,
-            'investor_name': f"{investor.first_name} {investor.surname}" if investor else 'Unknown',
-            'amount': loan.amount,
-            'status': loan.status,
-            'interest_rate': loan.interest_rate,
-            'submitted_at': loan.submitted_at.isoformat(),
-            'approved_at': loan.approved_at.isoformat() if loan.approved_at else None,
-            'repayment_due_date': loan.repayment_due_date.isoformat() if loan.repayment_due_date else None,
-            'collateral': loan.collateral,
-            'next_of_kin_details': loan.next_of_kin_details,
-            'other_details': loan.other_details
-        })
+    names = {}
+    if 'investor_name' in fields:
+        # One query for the page's borrower names
+        names = {
+            inv_id: f"{first} {surname}"
+            for inv_id, first, surname in db.session.query(Investor.id, Investor.first_name, Investor.surname)
+                .filter(Investor.id.in_({loan.investor_id for loan in loans}))
+        }
+    result = [LOAN_LIST_FIELDS.dump(loan, fields, investor_names=names) for loan in loans]
 
     return jsonify({
         'page': paginated.page,
         'per_page': paginated.per_page,
         'total': paginated.total,
         'pages': paginated.pages,
-        'loans': result
+        'loans': json_provider.listing(result)
     }), 200
 
 
@@ -1526,56 +1687,58 @@ def view_loans():
 @app.route('/api/admin/loans/export', methods=['GET'])
 @jwt_required()
 @admin_required
+@compression.level(9)
 def export_loans_csv():
-    loans = LoanApplication.query.all()
-
-    output = io.BytesIO()
-    writer = csv.writer(io.TextIOWrapper(output, encoding='utf-8', newline=''))
-
-    writer.writerow(['Loan ID', 'Investor ID', 'Full Name', 'Email', 'Amount', 'Status', 'Submitted At'])
-
-    for loan in loans:
-        writer.writerow([
-            loan.id,
-            loan.investor_id,
-            loan.full_name,
-            loan.email,
-            loan.amount,
-            loan.status,
-            loan.submitted_at.isoformat()
-        ])
-
-    output.seek(0)
-
-    return send_file(
-        output,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name='loans_export.csv'
+    columns = (
+        LoanApplication.id,
+        LoanApplication.investor_id,
+        LoanApplication.full_name,
+        LoanApplication.email,
+        LoanApplication.amount,
+        LoanApplication.status,
+        LoanApplication.submitted_at
     )
 
+    def generate():
+        # Stream the export in row batches; the compression hook gzips it chunk by chunk
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Loan ID', 'Investor ID', 'Full Name', 'Email', 'Amount', 'Status', 'Submitted At'])
+        rows = db.session.execute(
+            db.select(*columns).order_by(LoanApplication.id).execution_options(yield_per=1000)
+        )
+        for partition in rows.partitions():
+            for loan_id, investor_id, full_name, email, amount, status, submitted_at in partition:
+                writer.writerow([
+                    loan_id, investor_id, full_name, email, amount, status,
+                    submitted_at.isoformat() if submitted_at else ''
+                ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    response = app.response_class(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=loans_export.csv'
+    return response
+
 # -------------------- View loan details --------------------
+LOAN_DETAIL_DEFAULT = (
+    'loan_id', 'amount', 'status', 'interest_rate', 'repayment_due_date', 'submitted_at',
+    'collateral', 'next_of_kin_details', 'other_details', 'signed_documents'
+)
+
 @app.route('/api/admin/loans/<int:loan_id>', methods=['GET'])
 @jwt_required()
 @admin_required
 def loan_details(loan_id):
-    loan = LoanApplication.query.get_or_404(loan_id)
+    fields = LOAN_FIELDS.parse(default=LOAN_DETAIL_DEFAULT)
+    loan = LoanApplication.query.options(LOAN_FIELDS.load_only(fields, LoanApplication.investor_id)).get_or_404(loan_id)
     investor = Investor.query.get(loan.investor_id)
     repayments = LoanRepayment.query.filter_by(loan_id=loan_id).order_by(LoanRepayment.date_paid.desc()).all()
 
     return jsonify({
-        'loan': {
-            'loan_id': loan.id,
-            'amount': loan.amount,
-            'status': loan.status,
-            'interest_rate': loan.interest_rate,
-            'repayment_due_date': loan.repayment_due_date.isoformat() if loan.repayment_due_date else None,
-            'submitted_at': loan.submitted_at.isoformat(),
-            'collateral': loan.collateral,
-            'next_of_kin_details': loan.next_of_kin_details,
-            'other_details': loan.other_details,
-            'signed_documents': getattr(loan, 'signed_documents', None),
-        },
+        'loan': LOAN_FIELDS.dump(loan, fields),
         'investor': {
             'id': investor.id,
             'name': f"{investor.first_name} {investor.surname}",
@@ -1615,16 +1778,11 @@ def view_loan_repayments_admin(loan_id):
 @app.route('/api/investor/loans', methods=['GET'])
 @jwt_required()
 def get_investor_loans():
-    investor_id = get_jwt_identity()
+    investor_id = int(get_jwt_identity())
     status = request.args.get('status')  # optional filter
 
-    # Base query
-    query = LoanApplication.query.filter_by(investor_id=investor_id)
-    if status:
-        query = query.filter_by(status=status)
-
     # Fetch all matching loans, newest first
-    loans = query.order_by(LoanApplication.submitted_at.desc()).all()
+    loans = read_models.investor_loans(investor_id, status)
 
     result = []
     for loan in loans:
@@ -1688,7 +1846,8 @@ def list_loan_repayments():
     
     # base query: only approved loans waiting repayment
     q = LoanApplication.query \
-        .filter_by(investor_id=investor_id, status='approved')
+        .filter_by(investor_id=investor_id) \
+        .filter(LoanApplication.status.in_(LOAN_ACTIVE_STATUSES))
     
     # optional server‑side search
     if search:
@@ -1755,8 +1914,7 @@ def submit_loan_repayment():
 
     # 3) Fetch and authorize
     loan = LoanApplication.query.get_or_404(loan_id)
-    app.logger.debug(f"JWT sub: {raw_sub} ({type(raw_sub)})")
-    app.logger.debug(f"Loan.investor_id: {loan.investor_id} ({type(loan.investor_id)})")
+    app.logger.debug("Repayment for loan %s: JWT sub %r, loan.investor_id %r", loan_id, raw_sub, loan.investor_id)
     if loan.investor_id != investor_id:
         return jsonify({'error': 'Unauthorized to repay this loan'}), 403
 
@@ -1809,6 +1967,8 @@ def submit_loan_repayment():
 # -------------------- Admin view repayments --------------------
 @app.route('/api/admin/pending-repayments', methods=['GET'])
 @jwt_required()
+@admin_required
+@versions.conditional(LoanRepayment, LoanApplication)
 def get_pending_repayments_admin():
     # -- Admin role check --
     claims = get_jwt()
@@ -1824,13 +1984,8 @@ def get_pending_repayments_admin():
     query = LoanRepayment.query.filter_by(status='pending')
 
     if search:
-        # Join LoanApplication to enable searching by investor name
-        query = query.join(LoanApplication).filter(
-            or_(
-                LoanApplication.full_name.ilike(f"%{search}%"),
-                LoanRepayment.status.ilike(f"%{search}%")
-            )
-        )
+        # Join LoanApplication to enable searching by borrower name, email or phone
+        query = fulltext.ranked(query.join(LoanApplication), LoanApplication, search)
 
     # -- Pagination --
     pagination = query \
@@ -1851,7 +2006,7 @@ def get_pending_repayments_admin():
         })
 
     return jsonify({
-        "repayments": result,
+        "repayments": json_provider.listing(result),
         "total": pagination.total,
         "page": pagination.page,
         "pages": pagination.pages
@@ -1860,28 +2015,20 @@ def get_pending_repayments_admin():
 @app.route('/api/admin/loan-repayments', methods=['GET'])
 @jwt_required()
 @admin_required
+@versions.conditional(LoanRepayment, LoanApplication)
 def admin_view_repayments():
     # --- query params ---
     status   = request.args.get('status', default='', type=str).strip()
     page     = request.args.get('page',   default=1,  type=int)
     per_page = request.args.get('per_page', default=10, type=int)
 
-    # --- base query on LoanRepayment ---
-    q = LoanRepayment.query
-    if status:
-        q = q.filter(LoanRepayment.status == status)
-
-    pag = q.order_by(LoanRepayment.date_paid.desc())\
-           .paginate(page=page, per_page=per_page, error_out=False)
+    # --- repayments with their loan terms and borrower name ---
+    pag = read_models.repayments(status, page, per_page)
 
     rows = []
     for r in pag.items:
-        # manually load loan and investor
-        loan = db.session.get(LoanApplication, r.loan_id)
-        inv  = db.session.get(Investor, loan.investor_id)
-
-        principal = float(loan.amount)
-        rate      = float(loan.interest_rate or 0)
+        principal = float(r.loan_amount)
+        rate      = float(r.loan_interest_rate or 0)
         expected  = round(principal * (1 + rate/100), 2)
 
         # build public URL for the proof file
@@ -1893,8 +2040,8 @@ def admin_view_repayments():
 
         rows.append({
             'repayment_id':    r.id,
-            'loan_id':         loan.id,
-            'investor_name':   f"{inv.first_name} {inv.surname}",
+            'loan_id':         r.loan_id,
+            'investor_name':   f"{r.investor_first_name} {r.investor_surname}",
             'amount_paid':     float(r.amount_paid),
             'interest_rate':   rate,
             'expected_amount': expected,
@@ -1904,7 +2051,7 @@ def admin_view_repayments():
         })
 
     return jsonify({
-        'repayments': rows,
+        'repayments': json_provider.listing(rows),
         'total':      pag.total,
         'page':       pag.page,
         'pages':      pag.pages
@@ -1965,6 +2112,8 @@ def download_loan_signed_docs(loan_id):
 @app.route('/api/admin/loan-stats', methods=['GET'])
 @jwt_required()
 @admin_required
+@versions.conditional(LoanApplication, LoanRepayment)
+@result_cache.cached(LoanApplication, LoanRepayment, ttl=300)
 def get_loan_stats():
     status_counts = dict(db.session.query(
         LoanApplication.status,
@@ -2022,14 +2171,21 @@ def approve_repayments():
         return jsonify(error="repayment_ids (non‑empty list) is required"), 400
 
     updated = []
+    claimed = []
     loans_to_check = set()
+    admin_id = get_jwt_identity()
 
     for rid in ids:
         rep = LoanRepayment.query.get(rid)
         if not rep:
             continue
-        if rep.status == "pending":
-            rep.status = "approved"
+        if work_queue.claimed_by_other(LoanRepayment, rid, admin_id):
+            claimed.append(rid)
+            continue
+        # Only the request that moves it out of pending posts it
+        if transition_status(LoanRepayment, rid, 'pending', status='approved'):
+            ledger.post_repayment_approved(rep, rep.loan)
+            portfolio.repayment_approved(rep, rep.loan)
             updated.append(rid)
             loans_to_check.add(rep.loan_id)
     db.session.commit()
@@ -2043,8 +2199,8 @@ def approve_repayments():
                             .scalar() or 0.0
         # total due = principal + (principal * interest_rate/100)
         due = loan.amount + (loan.amount * loan.interest_rate / 100)
-        if total_paid >= due and loan.status != "repaid":
-            loan.status = "repaid"
+        if total_paid >= due and transition_status(LoanApplication, loan.id, LOAN_ACTIVE_STATUSES, status='repaid'):
+            portfolio.loan_repaid(loan)
             db.session.commit()
         results[loan_id] = {
             "total_paid": total_paid,
@@ -2053,6 +2209,7 @@ def approve_repayments():
 
     return jsonify({
         "approved_ids": updated,
+        "claimed_by_other_admins": claimed,
         "loan_updates": results
     }), 200
 
@@ -2074,8 +2231,11 @@ def reject_repayment():
         return jsonify({"message": "Repayment already rejected"}), 400
     if repayment.status == "approved":
         return jsonify({"error": "Repayment was approved, cannot reject"}), 400
+    if work_queue.claimed_by_other(LoanRepayment, repayment.id, get_jwt_identity()):
+        return jsonify(error='This item is being reviewed by another admin'), 409
 
-    repayment.status = "rejected"
+    if not transition_status(LoanRepayment, repayment.id, 'pending', status='rejected'):
+        return jsonify(error='Repayment not pending approval'), 400
     db.session.commit()
 
     return jsonify({"message": "Repayment rejected"}), 200
@@ -2136,20 +2296,48 @@ def investment_rate():
 
     return jsonify(rate=rate), 200
 
+# -------------------- Batch Investment Quotes --------------------
+MAX_QUOTE_AMOUNTS = 500
+
+@app.route('/api/investment-quotes', methods=['POST'])
+@jwt_required()
+def investment_quotes():
+    data = request.get_json()
+    if not data:
+        return jsonify(error="Missing JSON body"), 400
+
+    amounts   = data.get('amounts')
+    durations = data.get('durations')
+    curves    = bool(data.get('curves', False))
+
+    if not isinstance(amounts, list) or not isinstance(durations, list) or not amounts or not durations:
+        return jsonify(error="'amounts' and 'durations' must be non-empty lists"), 400
+    if len(amounts) > MAX_QUOTE_AMOUNTS or len(durations) > rates.MAX_DURATION_MONTHS:
+        return jsonify(error=f"At most {MAX_QUOTE_AMOUNTS} amounts and {rates.MAX_DURATION_MONTHS} durations per request"), 400
+
+    try:
+        amounts   = [float(a) for a in amounts]
+        durations = [int(d) for d in durations]
+    except (ValueError, TypeError):
+        return jsonify(error="Invalid 'amounts' or 'durations'"), 400
+
+    if min(amounts) < rates.MIN_AMOUNT or min(durations) < 1 or max(durations) > rates.MAX_DURATION_MONTHS:
+        return jsonify(error="Amount must be at least $28 and duration between 1 and 24 months"), 400
+
+    return jsonify(rates.quote(amounts, durations, curves=curves)), 200
+
 # -------------------- Investor Summary --------------------
 @app.route('/api/investor/summary', methods=['GET'])
 @jwt_required()
 def investor_summary():
     investor_id = get_jwt_identity()
-    total_invested = db.session.query(func.sum(Investment.amount))\
-                      .filter_by(investor_id=investor_id, status='approved').scalar() or 0
-    active_loans = LoanApplication.query.filter_by(investor_id=investor_id, status='approved').count()
+    summary = portfolio.get_summary(investor_id)
     notifications = Notification.query.filter_by(investor_id=investor_id)\
                     .order_by(Notification.date.desc()).limit(5).all()
     notification_list = [{'message': n.message, 'date': n.date.isoformat()} for n in notifications]
     return jsonify({
-        'total_invested': total_invested,
-        'active_loans': active_loans,
+        'total_invested': summary.invested_principal,
+        'active_loans': summary.active_loans,
         'notifications': notification_list
     })
 
@@ -2160,59 +2348,176 @@ def investor_summary():
 def investor_dashboard():
     investor_id = get_jwt_identity()
 
-    # 1) Investments
-    approved_investments = Investment.query.filter_by(
-        investor_id=investor_id, status='approved'
-    ).all()
-    total_invested = sum(inv.amount for inv in approved_investments)
-    total_returns  = sum(inv.projected_value() for inv in approved_investments)
-
-    # 2) Loans & repayable calculation
-    loans = LoanApplication.query.filter_by(investor_id=investor_id).all()
-    total_loans    = len(loans)
-    active_loans   = len([ln for ln in loans if ln.status == 'approved'])
-
-    # sum principal + interest on all approved loans
-    total_repayable = sum(
-        loan.amount * (1 + loan.interest_rate / 100)
-        for loan in loans
-        if loan.status == 'approved'
-    )
-
-    # 3) Repayments received
-    repayments = LoanRepayment.query.join(LoanApplication).filter(
-        LoanApplication.investor_id == investor_id
-    ).all()
-    total_repaid = sum(r.amount_paid for r in repayments if r.status == 'approved')
-
-    # 4) Pending withdrawals
-    pending_withdrawals = WithdrawalRequest.query.filter_by(
-        investor_id=investor_id, status='pending'
-    ).count()
+    # Single primary-key read of the maintained summary row
+    summary = portfolio.get_summary(investor_id)
 
     return jsonify({
         "investment_summary": {
-            "count":           len(approved_investments),
-            "total_invested":  round(total_invested, 2),
-            "total_returns":   round(total_returns, 2)
+            "count":           summary.investment_count,
+            "total_invested":  round(summary.invested_principal, 2),
+            "total_returns":   round(summary.projected_returns, 2)
         },
         "loan_summary": {
-            "total_loans":     total_loans,
-            "active_loans":    active_loans,
-            "total_repayable": round(total_repayable, 2)
+            "total_loans":     summary.total_loans,
+            "active_loans":    summary.active_loans,
+            "total_repayable": round(summary.total_repayable, 2)
         },
         "repayment_summary": {
-            "total_repaid":    round(total_repaid, 2)
+            "total_repaid":    round(summary.total_repaid, 2)
         },
         "withdrawal_status": {
-            "pending_requests": pending_withdrawals
+            "pending_requests": summary.pending_withdrawals
         }
     })
 
+# -------------------- Investor Valuation History --------------------
+@app.route('/api/investor/valuations', methods=['GET'])
+@jwt_required()
+@investor_required
+def investor_valuations():
+    investor_id = int(get_jwt_identity())
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+        end   = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+    except ValueError:
+        return jsonify(error='Invalid start/end format'), 400
+
+    series = valuation.investor_series(investor_id, start, end)
+    return jsonify({
+        'series': [{'date': d.isoformat(), 'value': v} for d, v in series]
+    }), 200
+
+@app.cli.command('value-investments')
+@click.option('--date', 'on', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Valuation date (YYYY-MM-DD), defaults to today.')
+def value_investments_command(on):
+    """Snapshot the value of every live investment for one date."""
+    on = on.date() if on else date.today()
+    print(f'Valued {valuation.value_investments(on)} investments as of {on.isoformat()}')
+
+# -------------------- Rebuild Portfolio Summaries --------------------
+@app.route('/api/admin/portfolio/rebuild', methods=['POST'])
+@jwt_required()
+@admin_required
+def rebuild_portfolios():
+    data = request.get_json(silent=True) or {}
+    investor_id = data.get('investor_id')
+
+    if investor_id is not None:
+        try:
+            investor_id = int(investor_id)
+        except (TypeError, ValueError):
+            return jsonify(error='investor_id must be an integer'), 400
+        if db.session.get(Investor, investor_id) is None:
+            return jsonify(error="Investor not found"), 404
+        portfolio.rebuild(investor_id)
+        count = 1
+    else:
+        count = portfolio.rebuild()
+    db.session.commit()
+
+    audit_log(get_jwt_identity(), 'admin', f'Rebuilt {count} investor portfolio summaries')
+    return jsonify(msg='Portfolio summaries rebuilt', count=count), 200
+
+@app.cli.command('portfolio-rebuild')
+def portfolio_rebuild_command():
+    """Recompute every investor portfolio summary from the source tables."""
+    count = portfolio.rebuild()
+    db.session.commit()
+    print(f'Rebuilt {count} investor portfolios')
+
+@app.cli.command('search-rebuild')
+def search_rebuild_command():
+    """Create missing full-text search indexes and refill all of them."""
+    with db.engine.begin() as connection:
+        fulltext.install(connection)
+        fulltext.rebuild(connection)
+    print(f'Rebuilt search indexes for {", ".join(fulltext.INDEXES)}')
+
+@app.cli.command('bench-read-models')
+@click.option('--repeat', default=20, show_default=True, help='Timed runs per case.')
+def bench_read_models_command(repeat):
+    """Compare the Core read models with the ORM loads they replace."""
+    print(f'{"case":<12} {"rows":>6} {"orm ms":>9} {"core ms":>9} {"speedup":>8} {"orm KiB":>9} {"core KiB":>9}')
+    for r in read_models.benchmark(repeat):
+        print(f'{r["case"]:<12} {r["rows"]:>6} {r["orm_ms"]:>9} {r["core_ms"]:>9} {r["speedup"]:>8} '
+              f'{r["orm_peak_kib"]:>9} {r["core_peak_kib"]:>9}')
+
+@app.cli.command('seed-synthetic')
+@click.option('--investors', default=synthetic.DEFAULTS['investors'], show_default=True)
+@click.option('--investments', default=synthetic.DEFAULTS['investments'], show_default=True)
+@click.option('--loans', default=synthetic.DEFAULTS['loans'], show_default=True)
+@click.option('--seed', default=0, show_default=True, help='Same seed, same rows.')
+@click.option('--ledger/--no-ledger', 'backfill_ledger', default=True, show_default=True,
+              help='Backfill the ledger afterwards (only into an empty ledger).')
+def seed_synthetic_command(investors, investments, loans, seed, backfill_ledger):
+    """Fill the database with a seeded synthetic book for load tests."""
+    counts = synthetic.generate(investors, investments, loans, seed=seed, progress=click.echo)
+    for table, count in counts.items():
+        print(f'{table:<20} {count:>10}')
+    if backfill_ledger:
+        print(f'Posted {ledger.backfill_from_history()} ledger entries')
+
+@app.cli.command('bench-endpoints')
+@click.option('--repeat', default=20, show_default=True, help='Timed requests per endpoint.')
+@click.option('--warmup', default=2, show_default=True)
+@click.option('--cold', is_flag=True, help='Clear the result cache before every request.')
+@click.option('--only', default=None, help='Only routes containing this text.')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Save the run as JSON.')
+@click.option('--compare', 'baseline', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='A saved run to compare against.')
+def bench_endpoints_command(repeat, warmup, cold, only, output, baseline):
+    """Latency percentiles, query counts and peak memory of every GET endpoint."""
+    report = endpoint_bench.run(app, repeat=repeat, warmup=warmup, cold=cold, only=only)
+    print(f'{"route":<55} {"st":>3} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>7} {"peak KiB":>9}')
+    for r in report['results']:
+        print(f'{r["route"]:<55} {r["status"]:>3} {r["p50_ms"]:>9} {r["p95_ms"]:>9} {r["p99_ms"]:>9} '
+              f'{r["queries"]:>7} {r["peak_kib"]:>9}')
+    for s in report['skipped']:
+        print(f'skipped {s["route"]}: {s["reason"]}')
+    for f in report['failed']:
+        print(f'FAILED {f["route"]}: {f["reason"]}')
+    if output:
+        endpoint_bench.save(report, output)
+        print(f'Saved to {output}')
+    if baseline:
+        print(f'\n{"route":<55} {"p50 before":>10} {"p50 after":>10} {"change %":>9} {"queries":>9}')
+        for r in endpoint_bench.compare(endpoint_bench.load(baseline), report):
+            print(f'{r["route"]:<55} {r["p50_before"]:>10} {r["p50_after"]:>10} {str(r["change_pct"]):>9} '
+                  f'{r["queries_before"]:>4}→{r["queries_after"]:<4}')
+    if report['failed']:
+        raise click.ClickException(f'{len(report["failed"])} endpoints failed')
+
+@app.cli.command('replay-traffic')
+@click.argument('path', type=click.Path(exists=True))
+@click.option('--target', default='https://127.0.0.1:5000', show_default=True, help='Instance to replay against.')
+@click.option('--speed', default=1.0, show_default=True, help='Speed-up over the captured pace.')
+@click.option('--concurrency', default=8, show_default=True, help='Requests in flight at once.')
+@click.option('--reads-only', is_flag=True, help='Skip captured writes and uploads.')
+@click.option('--start', type=click.DateTime(), default=None, help='Only traffic captured from this time (UTC).')
+@click.option('--end', type=click.DateTime(), default=None, help='Only traffic captured before this time (UTC).')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Save the report as JSON.')
+def replay_traffic_command(path, target, speed, concurrency, reads_only, start, end, output):
+    """Re-issue captured traffic against a seeded instance and compare latencies."""
+    records = replay.load(path, start, end)
+    result = replay.run(app, records, target, speed=speed, concurrency=concurrency, reads_only=reads_only,
+                        progress=click.echo)
+    print(f"{result['requests']} requests in {result['elapsed_s']}s ({result['skipped']} skipped), "
+          f"schedule lag p50 {result['lag_ms']['p50']}ms p95 {result['lag_ms']['p95']}ms")
+    print(f'{"route":<60} {"n":>6} {"cap p50":>8} {"rep p50":>8} {"cap p95":>8} {"rep p95":>8} {"x p95":>6} {"st≠":>5}')
+    for r in result['routes']:
+        print(f'{r["method"] + " " + r["route"]:<60} {r["count"]:>6} {r["captured_p50_ms"]:>8} {r["replayed_p50_ms"]:>8} '
+              f'{r["captured_p95_ms"]:>8} {r["replayed_p95_ms"]:>8} {str(r["p95_ratio"]):>6} {r["status_mismatches"]:>5}')
+    if output:
+        replay.save(result, output)
+        print(f'Saved to {output}')
+
 # -------------------- Admin Dashboard Summary --------------------
 @app.route('/api/admin/dashboard-summary', methods=['GET'])
 @jwt_required()
 @admin_required
+@versions.conditional(Investor, Investment, LoanApplication, LoanRepayment, InvestmentValuation)
+@result_cache.cached(Investor, Investment, LoanApplication, LoanRepayment, InvestmentValuation, ttl=300)
 def admin_dashboard_summary():
     today = date.today()
 
@@ -2229,20 +2534,23 @@ def admin_dashboard_summary():
     window_start = datetime.combine(window_start_day, time.min)
     window_end   = datetime.combine(window_end_day,   time.max)
 
+    # Latest nightly valuation of the whole book
+    valued_on, book_value = valuation.book_value()
+
     # 1) Investors & approved-funds
     approved_investors = Investor.query.filter(Investor.is_approved).count()
     approved_funds     = db.session.query(
         func.coalesce(func.sum(Investment.amount), 0)
-    ).filter(Investment.status == 'approved').scalar() or 0
+    ).filter(Investment.status.in_(INVESTMENT_ACTIVE_STATUSES)).scalar() or 0
 
     # 2) Loan counts
-    active_loans  = LoanApplication.query.filter_by(status='approved').count()
+    active_loans  = LoanApplication.query.filter(LoanApplication.status.in_(LOAN_ACTIVE_STATUSES)).count()
     pending_loans = LoanApplication.query.filter_by(status='pending').count()
     total_loans   = LoanApplication.query.count()
 
     # 3) Loan‑repayable in window
     loan_repayable = 0.0
-    loans_due = LoanApplication.query.filter_by(status='approved') \
+    loans_due = LoanApplication.query.filter(LoanApplication.status.in_(LOAN_ACTIVE_STATUSES)) \
         .filter(
             LoanApplication.repayment_due_date.between(window_start_day, window_end_day)
         ).all()
@@ -2252,7 +2560,7 @@ def admin_dashboard_summary():
     # 4) Investment‑payouts in window via Python filter
     payouts_due  = 0.0
     matching_ids = []
-    investments = Investment.query.filter_by(status='approved') \
+    investments = Investment.query.filter(Investment.status.in_(INVESTMENT_ACTIVE_STATUSES)) \
                      .filter(Investment.approved_at != None).all()
     for inv in investments:
         ewd = inv.expected_withdrawal_date  # datetime or None
@@ -2268,7 +2576,9 @@ def admin_dashboard_summary():
             "pending_loans":                            pending_loans,
             "total_loans":                              total_loans,
             "loan_repayments_amount_due_this_month":     round(loan_repayable, 2),
-            "investment_payouts_amount_due_this_month": round(payouts_due,     2)
+            "investment_payouts_amount_due_this_month": round(payouts_due,     2),
+            "book_value":                               round(book_value, 2),
+            "book_valued_on":                           valued_on.isoformat() if valued_on else None
         },
         "debug": {
             "window_start":            window_start.isoformat(),
@@ -2296,15 +2606,103 @@ def admin_dashboard_summary():
                 "due_payout_amount_this_month": round(payouts_due, 2),
                 "total_invested_amount": float(
                     db.session.query(func.coalesce(func.sum(Investment.amount), 0))
-                        .filter_by(status='approved').scalar() or 0
+                        .filter(Investment.status.in_(INVESTMENT_ACTIVE_STATUSES)).scalar() or 0
                 )
             }
         }
     })
 
+# -------------------- Ledger Balances --------------------
+@app.route('/api/admin/ledger/balance', methods=['GET'])
+@jwt_required()
+@admin_required
+def ledger_balance():
+    account = request.args.get('account', '').strip()
+    as_of   = request.args.get('as_of')  # YYYY-MM-DD, end of day
+    if not account:
+        return jsonify(error='account is required'), 400
+
+    as_of_dt = None
+    if as_of:
+        try:
+            as_of_dt = datetime.combine(datetime.strptime(as_of, '%Y-%m-%d').date(), time.max)
+        except ValueError:
+            return jsonify(error='Invalid as_of format'), 400
+
+    return jsonify({
+        'account': account,
+        'as_of':   (as_of_dt or datetime.utcnow()).isoformat(),
+        'balance': ledger.balance_as_of(account, as_of_dt)
+    }), 200
+
+@app.cli.command('ledger-snapshot')
+def ledger_snapshot_command():
+    """Snapshot every ledger account that moved since the last run."""
+    print(f'Wrote {ledger.take_snapshots()} ledger snapshots')
+
+@app.cli.command('ledger-backfill')
+def ledger_backfill_command():
+    """Post opening ledger entries for pre-ledger history."""
+    print(f'Posted {ledger.backfill_from_history()} ledger entries')
+
+# -------------------- Cash-Flow Forecast --------------------
+@app.route('/api/admin/cash-flow-forecast', methods=['GET'])
+@jwt_required()
+@admin_required
+def cash_flow_forecast():
+    horizon = request.args.get('windows', default=forecast.HORIZON_WINDOWS, type=int)
+    if not 1 <= horizon <= 120:
+        return jsonify(error='windows must be between 1 and 120'), 400
+
+    book = forecast.get_book()
+    started = perf_counter()
+    result = forecast.forecast(book, horizon=horizon)
+    result['compute_ms'] = round((perf_counter() - started) * 1000, 3)
+    return jsonify(result), 200
+
+# -------------------- Liquidity Stress Test --------------------
+@app.route('/api/admin/liquidity-stress', methods=['POST'])
+@jwt_required()
+@admin_required
+def liquidity_stress():
+    data = request.get_json(silent=True) or {}
+
+    try:
+        params = {
+            'scenarios':         int(data.get('scenarios', stress.DEFAULTS['scenarios'])),
+            'default_rate':      float(data.get('default_rate', stress.DEFAULTS['default_rate'])),
+            'late_rate':         float(data.get('late_rate', stress.DEFAULTS['late_rate'])),
+            'max_delay_windows': int(data.get('max_delay_windows', stress.DEFAULTS['max_delay_windows'])),
+            'horizon':           int(data.get('windows', stress.DEFAULTS['horizon'])),
+            'seed':              int(data.get('seed', stress.DEFAULTS['seed'])),
+        }
+        # Default to the cash currently on the books
+        opening_cash = float(data['opening_cash']) if 'opening_cash' in data \
+            else ledger.balance_as_of(ledger.CASH)
+    except (ValueError, TypeError):
+        return jsonify(error='Invalid simulation parameters'), 400
+
+    if not 1 <= params['scenarios'] <= 100000:
+        return jsonify(error='scenarios must be between 1 and 100000'), 400
+    if not 1 <= params['horizon'] <= 120:
+        return jsonify(error='windows must be between 1 and 120'), 400
+    if params['default_rate'] < 0 or params['late_rate'] < 0 \
+            or params['default_rate'] + params['late_rate'] > 1:
+        return jsonify(error='default_rate and late_rate must be non-negative and sum to at most 1'), 400
+    if params['max_delay_windows'] < 1:
+        return jsonify(error='max_delay_windows must be at least 1'), 400
+
+    started = perf_counter()
+    result = stress.simulate(forecast.get_book(), opening_cash=opening_cash, **params)
+    result['elapsed_ms'] = round((perf_counter() - started) * 1000, 1)
+
+    audit_log(get_jwt_identity(), 'admin', 'Ran liquidity stress test', details=str(params))
+    return jsonify(result), 200
+
 # -------------------- Export Investments CSV --------------------
 @app.route('/api/admin/export-investments', methods=['GET'])
 @admin_required
+@compression.level(9)
 def export_investments_csv():
     investments = Investment.query.all()
 
@@ -2344,8 +2742,27 @@ def export_investments_csv():
 
 
 # Get loan applications with optional status filter
+LOAN_APPLICATION_FIELDS = fieldsets.Fieldset(dict(
+    LOAN_FIELDS.fields,
+    # Due dates are only meaningful once the loan is running
+    repayment_due_date=fieldsets.computed(
+        [LoanApplication.status, LoanApplication.repayment_due_date],
+        lambda loan: (
+            loan.repayment_due_date.isoformat()
+            if loan.status in LOAN_ACTIVE_STATUSES and loan.repayment_due_date
+            else None
+        )
+    ),
+))
+LOAN_APPLICATION_DEFAULT = (
+    'loan_id', 'investor_id', 'full_name', 'email', 'phone', 'amount', 'purpose', 'status', 'submitted_at',
+    'interest_rate', 'repayment_due_date', 'collateral', 'next_of_kin_details', 'other_details'
+)
+
 @app.route('/api/admin/loan-applications', methods=['GET'])
 @jwt_required()
+@admin_required
+@versions.conditional(LoanApplication)
 def get_loan_applications_admin():
     # -- Admin role check --
     claims = get_jwt()
@@ -2357,22 +2774,16 @@ def get_loan_applications_admin():
     search   = request.args.get('search',   default='',  type=str).strip()
     page     = request.args.get('page',     default=1,   type=int)
     per_page = request.args.get('per_page', default=10,  type=int)
+    fields   = LOAN_APPLICATION_FIELDS.parse(default=LOAN_APPLICATION_DEFAULT)
 
     # -- Build base query --
-    query = LoanApplication.query
+    query = LoanApplication.query.options(LOAN_APPLICATION_FIELDS.load_only(fields))
 
     if status:
-        query = query.filter_by(status=status)
+        query = query.filter(LoanApplication.status.in_(matching_statuses(status, LOAN_ACTIVE_STATUSES)))
 
     if search:
-        query = query.filter(
-            or_(
-                LoanApplication.full_name.ilike(f"%{search}%"),
-                LoanApplication.email.ilike(f"%{search}%"),
-                LoanApplication.phone.ilike(f"%{search}%"),
-                LoanApplication.purpose.ilike(f"%{search}%")
-            )
-        )
+        query = fulltext.ranked(query, LoanApplication, search)
 
     # -- Pagination --
     pagination = query \
@@ -2380,31 +2791,10 @@ def get_loan_applications_admin():
         .paginate(page=page, per_page=per_page, error_out=False)
 
     # -- Serialize results --
-    result = []
-    for loan in pagination.items:
-        result.append({
-            "loan_id": loan.id,
-            "investor_id": loan.investor_id,
-            "full_name": loan.full_name,
-            "email": loan.email,
-            "phone": loan.phone,
-            "amount": loan.amount,
-            "purpose": loan.purpose,
-            "status": loan.status,
-            "submitted_at": loan.submitted_at.isoformat() if loan.submitted_at else None,
-            "interest_rate": loan.interest_rate,
-            "repayment_due_date": (
-                loan.repayment_due_date.isoformat()
-                if loan.status == 'approved' and loan.repayment_due_date
-                else None
-            ),
-            "collateral": loan.collateral,
-            "next_of_kin_details": loan.next_of_kin_details,
-            "other_details": loan.other_details
-        })
+    result = [LOAN_APPLICATION_FIELDS.dump(loan, fields) for loan in pagination.items]
 
     return jsonify({
-        "loans": result,
+        "loans": json_provider.listing(result),
         "total": pagination.total,
         "page": pagination.page,
         "pages": pagination.pages
@@ -2413,6 +2803,7 @@ def get_loan_applications_admin():
 # Export loans CSV
 @app.route('/api/admin/export/loans', methods=['GET'])
 @jwt_required()
+@compression.level(9)
 def export_loans():
     claims = get_jwt()
     if claims.get('role') != 'admin':
@@ -2442,8 +2833,12 @@ def get_audit_logs():
     if claims.get('role') != 'admin':
         return jsonify({"msg": "Admins only!"}), 403
 
-    logs = AuditLog.query.order_by(AuditLog.timestamp.desc()).all()
-    return jsonify(logs=[{
+    search = request.args.get('search', default='', type=str).strip()
+    query = AuditLog.query
+    if search:
+        query = fulltext.ranked(query, AuditLog, search)
+    logs = query.order_by(AuditLog.timestamp.desc()).all()
+    return jsonify(logs=json_provider.listing([{
     'actor_id': l.actor_id,
     'role': l.role,
     'action': l.action,
@@ -2451,7 +2846,7 @@ def get_audit_logs():
     'details': l.details,
     'ip_address': l.ip_address,
     'user_agent': l.user_agent
-} for l in logs])
+} for l in logs]))
 
 # Get investor status
 @app.route('/api/investor/status', methods=['GET'])
@@ -2505,6 +2900,62 @@ def read_all_notifications():
 def ping():
     return jsonify({'message': 'pong', 'status': 'ok'})
 
+# Prometheus scrape endpoint (all workers' series, see metrics.py)
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    token = app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify(error='Invalid metrics token'), 401
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# -------------------- Admin: SQL inspector reports --------------------
+@app.route('/api/admin/sql-reports', methods=['GET'])
+@admin_required
+def list_sql_reports():
+    if not sql_inspector.enabled():
+        return jsonify(error='SQL inspector is off (set SQL_INSPECT=1)'), 404
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify(reports=sql_inspector.recent(limit)), 200
+
+@app.route('/api/admin/sql-reports/<string:report_id>', methods=['GET'])
+@admin_required
+def get_sql_report(report_id):
+    if not sql_inspector.enabled():
+        return jsonify(error='SQL inspector is off (set SQL_INSPECT=1)'), 404
+    report = sql_inspector.get_report(report_id)
+    if report is None:
+        return jsonify(error='Report not found'), 404
+    return jsonify(report), 200
+
+# -------------------- Admin: Request profiling --------------------
+@app.route('/api/admin/profiling/token', methods=['POST'])
+@admin_required
+def issue_profile_token():
+    data = request.get_json(silent=True) or {}
+    try:
+        token = profiler.issue_token(get_jwt_identity(), data.get('mode', 'cprofile'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    audit_log(get_jwt_identity(), 'admin', 'Issued a request profiling token')
+    return jsonify(
+        header=profiler.HEADER,
+        token=token,
+        expires_in=app.config.get('PROFILE_TOKEN_MAX_AGE', profiler.DEFAULT_TOKEN_MAX_AGE)
+    ), 201
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    return jsonify(profiles=profiler.list_profiles()), 200
+
+@app.route('/api/admin/profiles/<string:profile_id>', methods=['GET'])
+@admin_required
+def download_profile(profile_id):
+    path = profiler.profile_path(profile_id)
+    if path is None:
+        return jsonify(error='Profile not found'), 404
+    return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+
 # -------------------- Investor Email Resend Confirmation --------------------
 @app.route('/api/investor-resend-confirmation', methods=['POST'])
 def resend_confirmation():
@@ -2646,10 +3097,51 @@ def investor_reset_password(token):
     # GET → show form
     return render_template('reset_password_form.html'), 200
 
+# -------------------- Scheduled Jobs --------------------
+@app.route('/api/admin/jobs', methods=['GET'])
+@jwt_required()
+@admin_required
+def list_jobs():
+    locks = {l.name: l for l in SchedulerLock.query.all()}
+    jobs = []
+    for name, schedule in scheduler.registered_jobs().items():
+        lock = locks.get(name)
+        jobs.append({
+            'name':             name,
+            'schedule':         schedule,
+            'last_run_at':      lock.last_run_at.isoformat() if lock and lock.last_run_at else None,
+            'last_duration_ms': lock.last_duration_ms if lock else None,
+            'last_result':      lock.last_result if lock else None,
+            'running_on':       lock.holder if lock and lock.locked_until else None
+        })
+    return jsonify(jobs=jobs), 200
+
+@app.cli.command('run-job')
+@click.argument('name')
+def run_job_command(name):
+    """Run one scheduled job now (still takes the job's lock)."""
+    if name not in scheduler.registered_jobs():
+        raise click.BadParameter(f'Unknown job {name!r}; choose from {", ".join(scheduler.registered_jobs())}')
+    outcome = scheduler.run_job(name, logger=app.logger)
+    print(outcome if outcome is not None else f'{name} is already running on another worker')
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create missing tables, columns and search indexes; run once per deploy, not at startup."""
+    db.create_all()
+    with db.engine.begin() as connection:
+        for name in add_missing_columns(connection):
+            print(f'Added column {name}')
+    intake.create_tables()
+    print('Database schema is up to date')
+
 if __name__ == '__main__':
-    # Ensure all tables are created before first request
-    with app.app_context():
-        db.create_all()
+    # Development server; production runs serve.py. Create the schema first with `flask init-db`
+
+    # Lifecycle sweeps (maturity, overdue, reminders); DB locks keep them single-run
+    scheduler.start(app)
+    # Surge intake workers persist queued withdrawal requests at INTAKE_RATE per second
+    intake.start(app)
 
     # Run Flask with HTTPS so cookies marked Secure will be accepted
     app.run(
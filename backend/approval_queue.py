@@ -0,0 +1,137 @@
+"""
+Deferred loan approvals.
+
+Loans may only be approved while the withdrawal window is open (28th to
+8th). Outside it, admins queue the approval instead; the scheduler then
+applies everything queued in one batched transaction as soon as the
+window opens: one conditional UPDATE moves all still-pending loans to
+'approved', followed by their ledger entries, portfolio increments,
+notifications and audit rows. Every queued item records its outcome,
+the batch it ran in and how long the batch took.
+"""
+from datetime import date, datetime, timedelta
+from time import perf_counter
+from uuid import uuid4
+
+from sqlalchemy import insert, select, update
+
+import ledger
+import portfolio
+from forecast import WINDOW_CLOSE_DAY, WINDOW_OPEN_DAY
+from models import db, AuditLog, LoanApplication, Notification, QueuedApproval
+
+LOAN_REPAYMENT_DAYS = 30
+
+
+def window_is_open(today=None):
+    day = (today or date.today()).day
+    return day >= WINDOW_OPEN_DAY or day <= WINDOW_CLOSE_DAY
+
+
+def queue_loan_approval(loan_id, admin_id):
+    """
+    Queue approval of a pending loan. Returns (item, created); an item that
+    is already queued for the loan is returned as is. Not committed.
+    """
+    existing = db.session.execute(
+        select(QueuedApproval).where(
+            QueuedApproval.kind == 'loan',
+            QueuedApproval.target_id == loan_id,
+            QueuedApproval.status == 'queued',
+        )
+    ).scalar()
+    if existing:
+        return existing, False
+    item = QueuedApproval(kind='loan', target_id=loan_id, queued_by=int(admin_id))
+    db.session.add(item)
+    db.session.flush()
+    return item, True
+
+
+def cancel(item_id):
+    """Cancel a queued item; returns False if it already ran. Not committed."""
+    return db.session.execute(
+        update(QueuedApproval)
+        .where(QueuedApproval.id == item_id, QueuedApproval.status == 'queued')
+        .values(status='cancelled', outcome='Cancelled before the window opened')
+    ).rowcount == 1
+
+
+def apply_queued(now=None):
+    """
+    Apply every queued loan approval in a single transaction. Returns a
+    summary with the batch id, counts and timing. Commits.
+    """
+    now = now or datetime.utcnow()
+    started = perf_counter()
+    batch_id = uuid4().hex
+
+    items = db.session.execute(
+        select(QueuedApproval.id, QueuedApproval.target_id, QueuedApproval.queued_by)
+        .where(QueuedApproval.kind == 'loan', QueuedApproval.status == 'queued')
+        .order_by(QueuedApproval.id)
+        .with_for_update()
+    ).all()
+    if not items:
+        db.session.commit()
+        return {'batch_id': None, 'applied': 0, 'failed': 0, 'duration_ms': 0.0}
+
+    # The first queued item for a loan wins; later duplicates are reported as failed
+    target_ids = sorted({target_id for _, target_id, _ in items})
+    pending = {
+        row.id: row
+        for row in db.session.execute(
+            select(LoanApplication.id, LoanApplication.investor_id,
+                   LoanApplication.amount, LoanApplication.interest_rate)
+            .where(LoanApplication.id.in_(target_ids), LoanApplication.status == 'pending')
+            .with_for_update()
+        )
+    }
+    if pending:
+        db.session.execute(
+            update(LoanApplication)
+            .where(LoanApplication.id.in_(list(pending)), LoanApplication.status == 'pending')
+            .values(
+                status='approved',
+                approved_at=now,
+                repayment_due_date=now + timedelta(days=LOAN_REPAYMENT_DAYS),
+                version=LoanApplication.version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    outcomes, notifications, audits, done = [], [], [], set()
+    for item_id, loan_id, admin_id in items:
+        loan = pending.get(loan_id)
+        if loan is None or loan_id in done:
+            outcomes.append({'id': item_id, 'status': 'failed', 'outcome': 'Loan not pending approval'})
+            continue
+        done.add(loan_id)
+        ledger.post_loan_approved(loan)
+        portfolio.loan_approved(loan)
+        if loan.investor_id is not None:
+            notifications.append({'investor_id': loan.investor_id, 'message': f'Loan {loan_id} approved',
+                                  'date': now, 'read': False})
+        audits.append({'actor_id': admin_id, 'role': 'admin', 'timestamp': now,
+                       'action': f'Approved loan {loan_id}',
+                       'details': f'Queued approval {item_id}, batch {batch_id}'})
+        outcomes.append({'id': item_id, 'status': 'applied', 'outcome': 'Loan approved'})
+
+    if notifications:
+        db.session.execute(insert(Notification), notifications)
+    if audits:
+        db.session.execute(insert(AuditLog), audits)
+
+    duration_ms = round((perf_counter() - started) * 1000, 1)
+    db.session.execute(update(QueuedApproval), [
+        dict(o, batch_id=batch_id, applied_at=now, batch_duration_ms=duration_ms) for o in outcomes
+    ])
+    db.session.commit()
+
+    applied = sum(o['status'] == 'applied' for o in outcomes)
+    return {
+        'batch_id': batch_id,
+        'applied': applied,
+        'failed': len(outcomes) - applied,
+        'duration_ms': duration_ms,
+    }
@@ -0,0 +1,191 @@
+"""
+Opt-in traffic capture for load replay (see replay.py).
+
+With CAPTURE_DIR set, requests under /api/ are appended to
+CAPTURE_DIR/capture-<pid>.jsonl, one compact JSON object per request:
+
+    t   start time (epoch seconds)        m   method
+    r   URL rule, /api/admin/loans/<int:loan_id>
+    a   route arguments                   q   query parameters
+    b   body: {'json': ...} or {'form': ..., 'files': {field: [bytes, ext]}}
+    u   [role, user key]                  s   status
+    d   duration (ms)                     n   response bytes
+
+Nothing identifying is kept. IDs become ':<kind>' markers (':loan',
+':investor') that the replay fills from its own database; values of
+password, token, secret and OTP fields become SECRET, whatever their
+type or length; other strings are replaced by 'x' repeated to their
+length rounded up to a power of two (capped) unless the parameter is in
+SAFE_PARAMS; other numbers, numeric form and query strings included,
+are rounded to two significant digits; the user is a keyed hash of the
+JWT identity, so one user's requests stay together without naming them.
+CAPTURE_SAMPLE keeps a share of requests. Records are buffered and
+written in batches of CAPTURE_BATCH.
+"""
+import atexit
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+
+# Paging, sorting and filter values that say nothing about a person
+SAFE_PARAMS = {
+    'page', 'per_page', 'limit', 'status', 'sort_by', 'order', 'fields', 'windows', 'kind', 'field',
+    'start', 'end', 'start_date', 'end_date', 'as_of', 'expected_withdrawal_date', 'ready_for_withdrawal',
+    'min_amount', 'max_amount', 'count', 'mode', 'duration_months', 'durations',
+}
+MAX_STRING = 64
+SECRET = '[secret]'
+MAX_ITEMS = 50
+DEFAULT_BATCH = 100
+
+_ID_KEY = re.compile(r'^(?:(\w+?)_)?ids?$')
+_SECRET_KEY = re.compile(r'password|passwd|token|secret|otp', re.IGNORECASE)
+_NUMBER = re.compile(r'^-?\d{1,15}(?:\.\d+)?$')
+
+_buffer = []
+_lock = threading.Lock()
+_path = None
+
+
+# -------------------- Redaction --------------------
+
+def id_kind(key):
+    """'loan_id' -> 'loan', 'repayment_ids' -> 'repayment'; None when `key` is not an id."""
+    match = _ID_KEY.match(key)
+    if match is None:
+        return None
+    return match.group(1) or 'id'
+
+
+def _round(number):
+    if isinstance(number, int) and abs(number) < 100:
+        return number
+    rounded = float(f'{number:.2g}')
+    return int(rounded) if isinstance(number, int) else rounded
+
+
+def _masked(length):
+    """'x' repeated to `length` rounded up to a power of two, so lengths fall into a few buckets."""
+    return 'x' * min(1 << (length - 1).bit_length(), MAX_STRING) if length else ''
+
+
+def redact(value, key=''):
+    """Copy of a parameter or JSON value with identifying content replaced."""
+    if key and _SECRET_KEY.search(key):
+        return SECRET
+    kind = id_kind(key)
+    if isinstance(value, dict):
+        return {k: redact(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v, key) for v in value[:MAX_ITEMS]]
+    if kind and (isinstance(value, int) or (isinstance(value, str) and value.isdigit())):
+        return f':{kind}'
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return _round(value)
+    value = str(value)
+    if key in SAFE_PARAMS and len(value) <= MAX_STRING:
+        return value
+    if _NUMBER.match(value):  # form and query numbers arrive as strings
+        return str(_round(float(value) if '.' in value else int(value)))
+    return _masked(len(value))
+
+
+def _multidict(values):
+    return {key: redact(items[0] if len(items) == 1 else items, key) for key, items in values.lists()}
+
+
+def _body():
+    if request.is_json:
+        body = request.get_json(silent=True)
+        return {'json': redact(body)} if body is not None else None
+    if not (request.form or request.files):
+        return None
+    files = {}
+    for field, storage in request.files.items():
+        storage.stream.seek(0, os.SEEK_END)
+        files[field] = [storage.stream.tell(), os.path.splitext(storage.filename or '')[1].lower()[:10]]
+    return {'form': _multidict(request.form), 'files': files}
+
+
+def _user():
+    try:
+        verify_jwt_in_request(optional=True)
+        claims = get_jwt()
+    except Exception:  # expired or malformed tokens were already answered by the view
+        return None
+    if not claims:
+        return None
+    key = hmac.new(current_app.config['JWT_SECRET_KEY'].encode(), str(claims.get('sub')).encode(),
+                   hashlib.sha256).hexdigest()[:12]
+    return [claims.get('role'), key]
+
+
+# -------------------- Request hooks --------------------
+
+def _before_request():
+    if not request.path.startswith('/api/') or request.method == 'OPTIONS':
+        return
+    if random.random() >= current_app.config.get('CAPTURE_SAMPLE', 1.0):
+        return
+    g.capture = (time.time(), time.perf_counter())
+
+
+def _after_request(response):
+    started = g.pop('capture', None)
+    if started is None:
+        return response
+    rule = request.url_rule
+    view_args = request.view_args or {}
+    record = {
+        't': round(started[0], 3),
+        'm': request.method,
+        'r': rule.rule if rule is not None else None,
+        'a': {key: redact(value, key) for key, value in view_args.items()},
+        'q': _multidict(request.args),
+        'b': _body(),
+        'u': _user(),
+        's': response.status_code,
+        'd': round((time.perf_counter() - started[1]) * 1000, 2),
+        'n': response.calculate_content_length(),
+    }
+    line = json.dumps(record, separators=(',', ':'))
+    with _lock:
+        _buffer.append(line)
+        full = len(_buffer) >= current_app.config.get('CAPTURE_BATCH', DEFAULT_BATCH)
+    if full:
+        flush()
+    return response
+
+
+def flush():
+    """Append buffered records to this process's capture file."""
+    with _lock:
+        lines = _buffer[:]
+        del _buffer[:]
+        if not lines or _path is None:
+            return
+        with open(_path.format(pid=os.getpid()), 'a') as fh:
+            fh.write('\n'.join(lines) + '\n')
+
+
+def init_app(app):
+    """Start capturing when CAPTURE_DIR is set; a no-op otherwise."""
+    global _path
+    directory = app.config.get('CAPTURE_DIR')
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _path = os.path.join(directory, 'capture-{pid}.jsonl')
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    atexit.register(flush)
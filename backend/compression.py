@@ -0,0 +1,117 @@
+"""
+Response compression.
+
+An after_request hook that negotiates brotli (when the `brotli` package
+is installed) or gzip from Accept-Encoding and compresses responses with
+a compressible content type (JSON, CSV, text) above COMPRESS_MIN_SIZE.
+Images, PDFs and other already-compressed files pass through untouched.
+Streamed responses are compressed chunk by chunk as they are sent, so
+generator exports never have to be held in memory.
+
+Routes can override the level with @compression.level(n) (0 disables).
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+from flask import current_app, request
+
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+}
+DEFAULT_LEVEL = 6
+DEFAULT_MIN_SIZE = 1024
+
+
+def level(n):
+    """Set the compression level (1-9, 0 to disable) for one view."""
+    def decorator(fn):
+        fn.compress_level = n
+        return fn
+    return decorator
+
+
+def _route_level():
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'compress_level', current_app.config.get('COMPRESS_LEVEL', DEFAULT_LEVEL))
+
+
+def _negotiate():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+class _Compressor:
+    def __init__(self, encoding, n):
+        if encoding == 'br':
+            obj = brotli.Compressor(quality=min(n, 11))
+            self.compress, self.finish = obj.process, obj.finish
+        else:
+            obj = zlib.compressobj(n, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+            self.compress, self.finish = obj.compress, obj.flush
+
+
+def _stream(chunks, compressor):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            out = compressor.compress(chunk)
+            if out:
+                yield out
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response):
+    if (
+        request.method == 'HEAD'
+        or response.status_code < 200 or response.status_code in (204, 206, 304)
+        or 'Content-Encoding' in response.headers
+        or not _compressible(response)
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    n = _route_level()
+    encoding = _negotiate()
+    if not n or encoding is None:
+        return response
+
+    compressor = _Compressor(encoding, n)
+    if response.is_streamed or response.direct_passthrough:
+        response.direct_passthrough = False
+        response.response = _stream(response.response, compressor)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE):
+            return response
+        response.set_data(compressor.compress(data) + compressor.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    tag, weak = response.get_etag()
+    if tag and not weak:
+        response.set_etag(f'{tag}-{encoding}')  # a strong ETag names exact bytes
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -0,0 +1,238 @@
+"""
+Endpoint benchmark.
+
+run() drives every GET route under /api/ (plus /metrics) through the
+Flask test client, authenticated with an admin or investor JWT cookie
+depending on the route, and records per endpoint:
+
+    p50/p95/p99/mean latency   over `repeat` timed requests after a warm-up
+    queries                    SQL statements per request (median)
+    peak_kib                   tracemalloc peak of one extra, traced request
+
+Route arguments are filled from the data: the investor with the most
+investments is the one whose pages are read, and its latest investment,
+loan and repayment (or the latest of anyone's) fill the detail routes. Routes whose arguments
+cannot be filled (file names, tokens, report ids) are listed as skipped;
+routes that answer 5xx or raise are listed as failed and left out of the
+timings (`flask bench-endpoints` exits non-zero when there are any).
+Write endpoints are not driven, so runs leave the database as they found
+it and stay comparable.
+
+Results are plain JSON (see save() / load()); compare() lines two runs
+up by route.
+"""
+import json
+import subprocess
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Engine
+
+import result_cache
+from models import db, AdminUser, Investment, Investor, LoanApplication, LoanRepayment
+
+PERCENTILES = (50, 95, 99)
+BASE_URL = 'https://localhost'  # access cookies are Secure
+
+# Query strings for routes that need one to do real work
+QUERY_STRINGS = {
+    '/api/admin/ledger/balance': 'account=cash',
+}
+
+_query_count = [0]
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    _query_count[0] += 1
+
+
+# -------------------- Routes --------------------
+
+def _sample_args(investor_id):
+    """Values for route arguments, from the benchmarked investor's own rows where it has any."""
+    def latest(column, *where):
+        own = db.session.scalar(select(column).where(*where).order_by(column.desc()).limit(1))
+        return own if own is not None else db.session.scalar(select(func.max(column)))
+
+    loan_id = latest(LoanApplication.id, LoanApplication.investor_id == investor_id)
+    return {
+        'investor_id': investor_id,
+        'investment_id': latest(Investment.id, Investment.investor_id == investor_id),
+        'loan_id': loan_id,
+        'repayment_id': latest(LoanRepayment.id, LoanRepayment.loan_id == loan_id),
+        'kind': 'investments',
+        'field': 'face_photo',
+    }
+
+
+def routes(app, investor_id):
+    """(rule, role, path) for every benchmarked route and (rule, reason) for the skipped ones."""
+    args = _sample_args(investor_id)
+    planned, skipped = [], []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if 'GET' not in rule.methods or not (rule.rule.startswith('/api/') or rule.rule == '/metrics'):
+            continue
+        missing = [name for name in rule.arguments if args.get(name) is None]
+        if missing:
+            skipped.append((rule.rule, f'no value for {", ".join(sorted(missing))}'))
+            continue
+        path = rule.build({name: args[name] for name in rule.arguments}, append_unknown=False)[1]
+        if rule.rule in QUERY_STRINGS:
+            path = f'{path}?{QUERY_STRINGS[rule.rule]}'
+        role = 'investor' if rule.rule.startswith('/api/investor/') else 'admin'
+        planned.append((rule.rule, role, path))
+    return planned, skipped
+
+
+def _client(app, role, identity, email):
+    client = app.test_client()
+    token = create_access_token(identity=str(identity), additional_claims={'role': role, 'email': email})
+    client.set_cookie(app.config.get('JWT_ACCESS_COOKIE_NAME', 'access_token_cookie'), token,
+                      domain='localhost', path=app.config.get('JWT_ACCESS_COOKIE_PATH', '/'))
+    return client
+
+
+# -------------------- Measuring --------------------
+
+def _measure(client, path, repeat, warmup, cold):
+    def get():
+        if cold:
+            result_cache.get_backend().clear()
+        return client.get(path, base_url=BASE_URL)
+
+    for _ in range(warmup):
+        get()
+
+    timings, queries, statuses, size = [], [], Counter(), 0
+    for _ in range(repeat):
+        _query_count[0] = 0
+        started = time.perf_counter()
+        response = get()
+        timings.append((time.perf_counter() - started) * 1000)
+        queries.append(_query_count[0])
+        statuses[response.status_code] += 1
+        size = len(response.get_data())
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        get()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    ms = np.percentile(timings, PERCENTILES)
+    result = {f'p{p}_ms': round(float(v), 3) for p, v in zip(PERCENTILES, ms)}
+    result.update(
+        mean_ms=round(float(np.mean(timings)), 3),
+        queries=int(np.median(queries)),
+        peak_kib=round(peak / 1024, 1),
+        bytes=size,
+        status=statuses.most_common(1)[0][0],
+    )
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(app, repeat=20, warmup=2, cold=False, only=None, progress=None):
+    """
+    Benchmark the GET endpoints; `only` limits the run to rules containing
+    that text. With `cold` the result cache is cleared before every
+    request. Call inside an app context.
+    """
+    progress = progress or (lambda message: None)
+    admin = db.session.scalar(select(AdminUser).order_by(AdminUser.id).limit(1))
+    investor_id = db.session.scalar(
+        select(Investment.investor_id).group_by(Investment.investor_id)
+        .order_by(func.count().desc(), Investment.investor_id).limit(1)
+    ) or db.session.scalar(select(func.min(Investor.id)).where(Investor.is_approved.is_(True)))
+    if admin is None or investor_id is None:
+        raise LookupError('Benchmarking needs an admin and an approved investor; seed the database first')
+    investor = db.session.get(Investor, investor_id)
+
+    clients = {
+        'admin': _client(app, 'admin', admin.id, admin.email),
+        'investor': _client(app, 'investor', investor.id, investor.email),
+    }
+    planned, skipped = routes(app, investor_id)
+    if only:
+        planned = [route for route in planned if only in route[0]]
+        skipped = [route for route in skipped if only in route[0]]
+    db.session.remove()  # requests get their own sessions, as in a server
+
+    results, failed = [], []
+    event.listen(Engine, 'before_cursor_execute', _count_query)
+    try:
+        for rule, role, path in planned:
+            try:
+                measured = _measure(clients[role], path, repeat, warmup, cold)
+            except Exception as exc:  # propagated in debug/testing mode; one broken route shouldn't end the run
+                db.session.remove()
+                failed.append({'route': rule, 'path': path, 'reason': f'raised {exc!r}'})
+                progress(f'{rule}: raised {exc!r}')
+                continue
+            if measured['status'] >= 500:
+                failed.append({'route': rule, 'path': path, 'reason': f"answered {measured['status']}"})
+                progress(f"{rule}: answered {measured['status']}")
+                continue
+            results.append({'route': rule, 'role': role, 'path': path, **measured})
+            progress(f"{rule}: p50 {measured['p50_ms']}ms, {measured['queries']} queries")
+    finally:
+        event.remove(Engine, 'before_cursor_execute', _count_query)
+
+    return {
+        'started_at': datetime.utcnow().isoformat(),
+        'revision': _git_revision(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].rsplit('@', 1)[-1],
+        'rows': {model.__tablename__: db.session.scalar(select(func.count()).select_from(model))
+                 for model in (Investor, Investment, LoanApplication, LoanRepayment)},
+        'investor_id': investor_id,
+        'repeat': repeat,
+        'cold_cache': cold,
+        'results': results,
+        'failed': failed,
+        'skipped': [{'route': rule, 'reason': reason} for rule, reason in skipped],
+    }
+
+
+# -------------------- Saved runs --------------------
+
+def save(report, path):
+    with open(path, 'w') as fh:
+        json.dump(report, fh, indent=2)
+
+
+def load(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def compare(baseline, current):
+    """Per-route p50/p95 and query count of `current` next to `baseline`, slowest change first."""
+    before = {r['route']: r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = before.get(result['route'])
+        if old is None:
+            continue
+        rows.append({
+            'route': result['route'],
+            'p50_before': old['p50_ms'], 'p50_after': result['p50_ms'],
+            'p95_before': old['p95_ms'], 'p95_after': result['p95_ms'],
+            'change_pct': round((result['p50_ms'] / old['p50_ms'] - 1) * 100, 1) if old['p50_ms'] else None,
+            'queries_before': old['queries'], 'queries_after': result['queries'],
+        })
+    rows.sort(key=lambda row: row['change_pct'] or 0, reverse=True)
+    return rows
@@ -0,0 +1,78 @@
+"""
+Sparse fieldsets.
+
+A Fieldset declares which fields a serializer may return and the columns
+each one reads. Endpoints parse the `fields=` query parameter against it,
+load only those columns (`load_only` on ORM queries, or the column list
+for Core selects) and dump only those keys, so a table view that needs a
+name and an amount no longer pulls addresses, notes and file names.
+"""
+from datetime import date, datetime
+
+from flask import request
+from sqlalchemy.orm import load_only
+
+
+class InvalidFields(ValueError):
+    def __init__(self, unknown, allowed):
+        super().__init__(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+
+
+class computed:
+    """A field derived from one or more columns."""
+
+    def __init__(self, columns, fn):
+        self.columns = tuple(columns)
+        self.fn = fn
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+class Fieldset:
+    def __init__(self, fields):
+        self.fields = fields
+
+    @property
+    def names(self):
+        return tuple(self.fields)
+
+    def parse(self, default=None):
+        """
+        Field names requested by `?fields=a,b`, in declaration order; `default`
+        (or every field) when the parameter is absent. Raises InvalidFields.
+        """
+        raw = request.args.get('fields', '').strip()
+        if not raw:
+            return tuple(default or self.fields)
+        wanted = {name.strip() for name in raw.split(',') if name.strip()}
+        unknown = sorted(wanted - set(self.fields))
+        if unknown:
+            raise InvalidFields(unknown, self.fields)
+        return tuple(name for name in self.fields if name in wanted)
+
+    def columns(self, names, *extra):
+        """Columns needed to render `names`, plus any `extra` the caller reads itself."""
+        cols = list(extra)
+        for name in names:
+            spec = self.fields[name]
+            for col in (spec.columns if isinstance(spec, computed) else (spec,)):
+                if not any(col is c for c in cols):  # column == column builds SQL, so compare identity
+                    cols.append(col)
+        return cols
+
+    def load_only(self, names, *extra):
+        """ORM loader option restricting a query to the columns of `names` (the primary key is always loaded)."""
+        return load_only(*self.columns(names, *extra))
+
+    def dump(self, obj, names=None, **context):
+        """`names` (or every field) of `obj`; `context` is passed on to computed fields."""
+        data = {}
+        for name in names or self.fields:
+            spec = self.fields[name]
+            if isinstance(spec, computed):
+                data[name] = spec.fn(obj, **context)
+            else:
+                data[name] = _plain(getattr(obj, spec.key))
+        return data
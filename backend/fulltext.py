@@ -0,0 +1,149 @@
+"""
+Full-text search for the admin list endpoints.
+
+Each searchable table gets an index kept in sync by database triggers:
+an external-content FTS5 table on SQLite, a trigger-maintained tsvector
+column with a GIN index on PostgreSQL. `ranked()` restricts a query to
+rows where every word of the search term matches as a prefix and orders
+them best match first, replacing leading-wildcard ILIKE scans.
+"""
+import re
+
+from sqlalchemy import column, event, func, literal_column, or_, select, table, text
+
+from models import db
+
+# table -> indexed columns
+INDEXES = {
+    'investor': ('first_name', 'surname', 'username', 'email', 'phone'),
+    'loan_application': ('full_name', 'email', 'phone', 'purpose'),
+    'audit_log': ('action', 'details'),
+}
+
+
+# -------------------- Index DDL --------------------
+
+def _sqlite_ddl(name, cols):
+    fts = f'{name}_fts'
+    col_list = ', '.join(cols)
+    new_vals = ', '.join(f'new.{c}' for c in cols)
+    old_vals = ', '.join(f'old.{c}' for c in cols)
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});"
+    insert_new = f"INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({col_list}, content='{name}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_fts_ai AFTER INSERT ON {name} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_fts_ad AFTER DELETE ON {name} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_fts_au AFTER UPDATE OF {col_list} ON {name} "
+        f"BEGIN {delete_old} {insert_new} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _postgres_document(cols, prefix):
+    return " || ' ' || ".join(f"coalesce({prefix}{c}, '')" for c in cols)
+
+
+def _postgres_ddl(name, cols):
+    return [
+        f"ALTER TABLE {name} ADD COLUMN search_vector tsvector",
+        f"CREATE INDEX ix_{name}_search_vector ON {name} USING GIN (search_vector)",
+        f"CREATE OR REPLACE FUNCTION {name}_search_vector_update() RETURNS trigger AS $$ "
+        f"BEGIN NEW.search_vector := to_tsvector('simple', {_postgres_document(cols, 'NEW.')}); "
+        f"RETURN NEW; END $$ LANGUAGE plpgsql",
+        f"CREATE TRIGGER {name}_search_vector BEFORE INSERT OR UPDATE OF {', '.join(cols)} "
+        f"ON {name} FOR EACH ROW EXECUTE FUNCTION {name}_search_vector_update()",
+        f"UPDATE {name} SET search_vector = to_tsvector('simple', {_postgres_document(cols, '')})",
+    ]
+
+
+def _installed(connection, name):
+    if connection.dialect.name == 'sqlite':
+        stmt = text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :n")
+        return connection.execute(stmt, {'n': f'{name}_fts'}).first() is not None
+    stmt = text("SELECT 1 FROM information_schema.columns WHERE table_name = :n AND column_name = 'search_vector'")
+    return connection.execute(stmt, {'n': name}).first() is not None
+
+
+def install(connection):
+    """Create any missing search indexes and their triggers, filling them from existing rows."""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        ddl = _sqlite_ddl
+    elif dialect == 'postgresql':
+        ddl = _postgres_ddl
+    else:
+        return
+    for name, cols in INDEXES.items():
+        if not _installed(connection, name):
+            for statement in ddl(name, cols):
+                connection.execute(text(statement))
+
+
+def rebuild(connection):
+    """Re-fill every search index from its source table."""
+    for name, cols in INDEXES.items():
+        if connection.dialect.name == 'sqlite':
+            connection.execute(text(f"INSERT INTO {name}_fts({name}_fts) VALUES ('rebuild')"))
+        elif connection.dialect.name == 'postgresql':
+            connection.execute(text(
+                f"UPDATE {name} SET search_vector = to_tsvector('simple', {_postgres_document(cols, '')})"
+            ))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _install_after_create(target, connection, **kw):
+    install(connection)
+
+
+# -------------------- Queries --------------------
+
+def terms(search):
+    return re.findall(r'\w+', search.lower())
+
+
+def matches(name, search):
+    """
+    Subquery of (id, rank) for rows of table `name` where every word of
+    `search` is a prefix of an indexed word. Lower rank is a better match.
+    """
+    words = terms(search)
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        fts = table(f'{name}_fts', column('rowid'), column('rank'))
+        expr = ' '.join(f'"{w}"*' for w in words)
+        return (
+            select(fts.c.rowid.label('id'), fts.c.rank.label('rank'))
+            .where(literal_column(f'{name}_fts').op('MATCH')(expr))
+            .subquery()
+        )
+
+    if dialect == 'postgresql':
+        source = table(name, column('id'), column('search_vector'))
+        query = func.to_tsquery('simple', ' & '.join(f'{w}:*' for w in words))
+        return (
+            select(source.c.id, (-func.ts_rank(source.c.search_vector, query)).label('rank'))
+            .where(source.c.search_vector.op('@@')(query))
+            .subquery()
+        )
+
+    # Other databases fall back to substring matching, unranked
+    source = table(name, column('id'), *(column(c) for c in INDEXES[name]))
+    return (
+        select(source.c.id, literal_column('0').label('rank'))
+        .where(*(or_(*(source.c[c].ilike(f'%{w}%') for c in INDEXES[name])) for w in words))
+        .subquery()
+    )
+
+
+def ranked(query, model, search):
+    """
+    Restrict an ORM query to `model` rows matching `search`, best match
+    first; ordering added later by the caller only breaks ties. A term with
+    no words leaves the query unchanged.
+    """
+    if not terms(search):
+        return query
+    hits = matches(model.__tablename__, search)
+    return query.join(hits, hits.c.id == model.id).order_by(hits.c.rank)
@@ -0,0 +1,307 @@
+"""
+Surge intake for withdrawal requests.
+
+Withdrawal requests can only be made from the 28th to the 8th, so they
+arrive in bursts. In surge mode the endpoint only appends the request to
+a separate, durable intake database (SQLite in WAL mode by default) and
+answers 202 with a request id; it never touches the main database's
+write lock. Background workers in every process lease batches of
+accepted requests, validate and persist them in the main database at a
+bounded rate, and record the outcome for investors to poll.
+
+Requests are idempotent on their intake id: a batch that is re-leased
+after a worker died finds the WithdrawalRequest it already created. A
+request whose batch keeps failing is given up after MAX_ATTEMPTS leases
+and marked 'failed' with the last error. The intake table is created by
+`flask init-db` (create_tables), not at startup.
+"""
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from time import monotonic
+from uuid import uuid4
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    bindparam,
+    create_engine,
+    event,
+    func,
+    insert,
+    or_,
+    select,
+    update
+)
+
+from models import db, AuditLog, ConcurrentUpdateError, WithdrawalRequest
+from withdrawals import WithdrawalRefused, open_withdrawal
+
+BATCH_SIZE = 50
+LEASE = timedelta(seconds=60)
+MAX_ATTEMPTS = 5
+IDLE_SECONDS = 0.5
+DEFAULT_RATE = 200  # requests persisted per second, per worker
+
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+metadata = MetaData()
+
+intake_request = Table(
+    'intake_request', metadata,
+    Column('id', String(32), primary_key=True),
+    Column('kind', String(20), nullable=False, default='withdrawal'),
+    Column('investor_id', Integer, nullable=False, index=True),
+    Column('target_id', Integer, nullable=False),
+    Column('status', String(20), nullable=False, default='accepted', index=True),  # accepted, processing, completed, rejected, failed
+    Column('error', String(255)),
+    Column('result_id', Integer),
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('holder', String(100)),
+    Column('leased_until', DateTime),
+    Column('received_at', DateTime, nullable=False),
+    Column('processed_at', DateTime),
+)
+
+_engine = None
+_threads = []
+_stop = threading.Event()
+
+
+def _sqlite_pragmas(dbapi_conn, _):
+    cursor = dbapi_conn.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.close()
+
+
+def init_app(app):
+    """Create the intake engine from INTAKE_DATABASE_URI; connects lazily."""
+    global _engine
+    _engine = create_engine(app.config['INTAKE_DATABASE_URI'])
+    if _engine.dialect.name == 'sqlite':
+        event.listen(_engine, 'connect', _sqlite_pragmas)
+    return _engine
+
+
+def create_tables():
+    """Create the intake table if it is missing (`flask init-db`)."""
+    metadata.create_all(_engine)
+
+
+def surge_enabled(app, window_open):
+    """WITHDRAWAL_SURGE_MODE is 'on', 'off' or 'window' (only while the window is open)."""
+    mode = app.config.get('WITHDRAWAL_SURGE_MODE', 'off')
+    return mode == 'on' or (mode == 'window' and window_open)
+
+
+# -------------------- Hot path --------------------
+
+def submit_withdrawal(investor_id, investment_id):
+    """Durably accept a withdrawal request and return its id. One small insert, no validation."""
+    request_id = uuid4().hex
+    with _engine.begin() as conn:
+        conn.execute(insert(intake_request).values(
+            id=request_id,
+            kind='withdrawal',
+            investor_id=int(investor_id),
+            target_id=investment_id,
+            status='accepted',
+            attempts=0,
+            received_at=datetime.utcnow(),
+        ))
+    return request_id
+
+
+def get_status(request_id, investor_id):
+    with _engine.connect() as conn:
+        row = conn.execute(
+            select(intake_request).where(
+                intake_request.c.id == request_id,
+                intake_request.c.investor_id == int(investor_id),
+            )
+        ).mappings().first()
+    if row is None:
+        return None
+    return {
+        'request_id': row['id'],
+        'investment_id': row['target_id'],
+        'status': row['status'],
+        'error': row['error'],
+        'withdrawal_id': row['result_id'],
+        'received_at': row['received_at'].isoformat(),
+        'processed_at': row['processed_at'].isoformat() if row['processed_at'] else None,
+    }
+
+
+def backlog():
+    """Count of intake requests per status."""
+    with _engine.connect() as conn:
+        return dict(conn.execute(
+            select(intake_request.c.status, func.count()).group_by(intake_request.c.status)
+        ).all())
+
+
+# -------------------- Workers --------------------
+
+def _lease(limit):
+    """Claim up to `limit` accepted (or abandoned) requests for this worker."""
+    now = datetime.utcnow()
+    token = f'{WORKER_ID}:{uuid4().hex[:8]}'
+    abandoned = (intake_request.c.status == 'processing') & (intake_request.c.leased_until < now)
+    claimable = or_(
+        intake_request.c.status == 'accepted',
+        abandoned & (intake_request.c.attempts < MAX_ATTEMPTS),
+    )
+    with _engine.begin() as conn:
+        # Requests whose every lease ended without an outcome are given up on
+        conn.execute(
+            update(intake_request)
+            .where(abandoned, intake_request.c.attempts >= MAX_ATTEMPTS)
+            .values(status='failed', processed_at=now, leased_until=None,
+                    error=func.coalesce(intake_request.c.error, f'Abandoned after {MAX_ATTEMPTS} attempts'))
+        )
+        ids = select(intake_request.c.id).where(claimable).order_by(intake_request.c.received_at).limit(limit)
+        conn.execute(
+            update(intake_request)
+            .where(intake_request.c.id.in_(ids.scalar_subquery()), claimable)
+            .values(status='processing', holder=token, leased_until=now + LEASE,
+                    attempts=intake_request.c.attempts + 1)
+        )
+        return conn.execute(
+            select(intake_request.c.id, intake_request.c.investor_id, intake_request.c.target_id)
+            .where(intake_request.c.status == 'processing', intake_request.c.holder == token)
+            .order_by(intake_request.c.received_at)
+        ).all()
+
+
+def _record_failure(request_ids, exc):
+    """Note why a batch failed; requests out of attempts become 'failed', the rest wait for their lease to end."""
+    error = f'{type(exc).__name__}: {exc}'[:255]
+    ours = intake_request.c.id.in_(request_ids)
+    with _engine.begin() as conn:
+        conn.execute(update(intake_request).where(ours).values(error=error))
+        conn.execute(
+            update(intake_request)
+            .where(ours, intake_request.c.attempts >= MAX_ATTEMPTS)
+            .values(status='failed', processed_at=datetime.utcnow(), leased_until=None)
+        )
+
+
+def process_batch(limit=BATCH_SIZE):
+    """
+    Validate and persist one leased batch in a single main-database
+    transaction, then record each outcome. Returns the batch size.
+    """
+    leased = _lease(limit)
+    if not leased:
+        return 0
+    try:
+        outcomes = _persist(leased)
+    except Exception as exc:
+        db.session.rollback()
+        _record_failure([r.id for r in leased], exc)
+        raise
+
+    processed_at = datetime.utcnow()
+    with _engine.begin() as conn:
+        conn.execute(
+            update(intake_request)
+            .where(intake_request.c.id == bindparam('request_id'))
+            .values(status=bindparam('new_status'), error=bindparam('new_error'),
+                    result_id=bindparam('new_result_id'), processed_at=processed_at, leased_until=None),
+            [
+                {'request_id': o['id'], 'new_status': o['status'], 'new_error': o['error'],
+                 'new_result_id': o['result_id']}
+                for o in outcomes
+            ]
+        )
+    return len(leased)
+
+
+def _persist(leased):
+    """Create the batch's withdrawal requests and commit; returns one outcome per request."""
+    existing = dict(db.session.execute(
+        select(WithdrawalRequest.intake_id, WithdrawalRequest.id)
+        .where(WithdrawalRequest.intake_id.in_([r.id for r in leased]))
+    ).all())
+
+    outcomes, created = [], []
+    for request_id, investor_id, investment_id in leased:
+        if request_id in existing:
+            outcomes.append({'id': request_id, 'status': 'completed', 'error': None, 'result_id': existing[request_id]})
+            continue
+        try:
+            withdrawal = open_withdrawal(investment_id, investor_id, intake_id=request_id)
+        except ConcurrentUpdateError:
+            # Nothing was written; hand it back to the queue for the next batch
+            outcomes.append({'id': request_id, 'status': 'accepted', 'error': None, 'result_id': None})
+            continue
+        except LookupError:
+            outcomes.append({'id': request_id, 'status': 'rejected', 'error': 'Investment not found', 'result_id': None})
+            continue
+        except WithdrawalRefused as exc:
+            outcomes.append({'id': request_id, 'status': 'rejected', 'error': str(exc), 'result_id': None})
+            continue
+        created.append((request_id, withdrawal))
+        db.session.add(AuditLog(
+            actor_id=investor_id,
+            role='investor',
+            action=f'Requested withdrawal for investment {investment_id}',
+            details=f'Surge intake request {request_id}',
+        ))
+    db.session.flush()
+    outcomes += [
+        {'id': request_id, 'status': 'completed', 'error': None, 'result_id': withdrawal.id}
+        for request_id, withdrawal in created
+    ]
+    db.session.commit()
+    return outcomes
+
+
+def _loop(app, rate):
+    while not _stop.is_set():
+        started = monotonic()
+        with app.app_context():
+            try:
+                processed = process_batch(min(BATCH_SIZE, rate))
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Withdrawal intake batch failed')
+                processed = 0
+            finally:
+                db.session.remove()
+        # Pace to `rate` requests per second; back off when the queue is empty
+        wait = processed / rate - (monotonic() - started) if processed else IDLE_SECONDS
+        if wait > 0:
+            _stop.wait(wait)
+
+
+def start(app, workers=None, rate=None):
+    """Start the intake worker threads for this process (idempotent)."""
+    if _engine is None:
+        init_app(app)
+    if any(t.is_alive() for t in _threads):
+        return _threads
+    _stop.clear()
+    workers = workers or int(app.config.get('INTAKE_WORKERS', 1))
+    rate = rate or int(app.config.get('INTAKE_RATE', DEFAULT_RATE))
+    _threads[:] = [
+        threading.Thread(target=_loop, args=(app, rate), name=f'intake-{i}', daemon=True)
+        for i in range(workers)
+    ]
+    for thread in _threads:
+        thread.start()
+    return _threads
+
+
+def stop(timeout=None):
+    _stop.set()
+    for thread in _threads:
+        thread.join(timeout)
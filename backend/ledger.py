@@ -0,0 +1,228 @@
+"""
+Double-entry ledger.
+
+Every money-moving state transition appends a balanced journal entry
+(postings summing to zero). Balances are read from the latest
+LedgerSnapshot for an account plus the short tail of postings dated
+after it, so no query ever has to scan an account's full history.
+
+Accounts:
+    cash                          money held by AC Finance
+    investor_capital:<investor>   principal owed back to an investor
+    loans_receivable:<investor>   principal + interest owed by a borrower
+    interest_income               interest earned on loans
+    interest_expense              returns paid out on investments
+"""
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import func, select
+
+from models import (
+    db,
+    Investment,
+    LoanApplication,
+    LoanRepayment,
+    WithdrawalRequest,
+    LedgerPosting,
+    LedgerSnapshot,
+    INVESTMENT_ACTIVE_STATUSES,
+    LOAN_ACTIVE_STATUSES
+)
+
+CASH = 'cash'
+INTEREST_INCOME = 'interest_income'
+INTEREST_EXPENSE = 'interest_expense'
+
+# How far snapshots stay behind now, so postings of transactions still
+# open when a snapshot is taken are dated after it
+SETTLE_TIME = timedelta(minutes=5)
+
+
+def investor_capital(investor_id):
+    return f'investor_capital:{investor_id}'
+
+
+def loans_receivable(investor_id):
+    return f'loans_receivable:{investor_id}'
+
+
+def to_cents(amount):
+    return int(round(float(amount) * 100))
+
+
+def post_entry(legs, reference_type=None, reference_id=None, memo=None, created_at=None, balancing_account=None):
+    """
+    Append one journal entry. `legs` is a list of (account, amount) pairs
+    where debits are positive and credits negative. Each amount is
+    converted to cents once; with `balancing_account` that account gets
+    the negative sum of the other legs, otherwise the legs must balance.
+    Added to the current session, not committed.
+    """
+    cents = [(account, to_cents(amount)) for account, amount in legs if amount]
+    if balancing_account is not None:
+        cents.append((balancing_account, -sum(c for _, c in cents)))
+    cents = [(account, c) for account, c in cents if c]
+    if sum(c for _, c in cents) != 0:
+        raise ValueError(f'Unbalanced ledger entry: {legs!r}')
+
+    entry_id = uuid4().hex
+    created_at = created_at or datetime.utcnow()
+    postings = [
+        LedgerPosting(
+            entry_id=entry_id,
+            account=account,
+            amount_cents=amount_cents,
+            reference_type=reference_type,
+            reference_id=reference_id,
+            memo=memo,
+            created_at=created_at,
+        )
+        for account, amount_cents in cents
+    ]
+    db.session.add_all(postings)
+    return entry_id
+
+
+# -------------------- Transition postings --------------------
+# `created_at` is only passed by backfill_from_history, to date entries
+# when the money actually moved.
+
+def post_investment_approved(investment, created_at=None):
+    post_entry(
+        [(investor_capital(investment.investor_id), -investment.amount)],
+        'investment', investment.id, 'Investment approved', created_at, balancing_account=CASH,
+    )
+
+
+def post_loan_approved(loan, created_at=None):
+    interest = round(loan.amount * (loan.interest_rate or 0) / 100, 2)
+    post_entry(
+        [(CASH, -loan.amount), (INTEREST_INCOME, -interest)],
+        'loan', loan.id, 'Loan disbursed', created_at, balancing_account=loans_receivable(loan.investor_id),
+    )
+
+
+def post_repayment_approved(repayment, loan, created_at=None):
+    post_entry(
+        [(loans_receivable(loan.investor_id), -repayment.amount_paid)],
+        'repayment', repayment.id, f'Repayment for loan {loan.id}', created_at, balancing_account=CASH,
+    )
+
+
+def post_withdrawal_paid(withdrawal, investment, created_at=None):
+    post_entry(
+        [(investor_capital(investment.investor_id), investment.amount), (CASH, -investment.projected_value())],
+        'withdrawal', withdrawal.id, f'Withdrawal paid for investment {investment.id}', created_at,
+        balancing_account=INTEREST_EXPENSE,
+    )
+
+
+# -------------------- Balances --------------------
+
+def balance_as_of(account, as_of=None):
+    """Balance in currency units: latest snapshot at or before `as_of` plus the postings dated after it."""
+    as_of = as_of or datetime.utcnow()
+    snap = db.session.execute(
+        select(LedgerSnapshot.balance_cents, LedgerSnapshot.as_of)
+        .where(LedgerSnapshot.account == account, LedgerSnapshot.as_of <= as_of)
+        .order_by(LedgerSnapshot.as_of.desc(), LedgerSnapshot.id.desc())
+        .limit(1)
+    ).first()
+    tail = [LedgerPosting.account == account, LedgerPosting.created_at <= as_of]
+    if snap is not None:
+        tail.append(LedgerPosting.created_at > snap.as_of)
+
+    tail_cents = db.session.execute(
+        select(func.coalesce(func.sum(LedgerPosting.amount_cents), 0)).where(*tail)
+    ).scalar()
+    return ((snap.balance_cents if snap else 0) + tail_cents) / 100
+
+
+def take_snapshots(as_of=None):
+    """
+    Write a snapshot for every account with postings dated since the
+    previous snapshot run, up to `as_of`. Returns the number of snapshot
+    rows written. Commits.
+
+    Snapshots cover postings by date, not id: backfilled entries are
+    inserted out of date order, and ids aren't committed in order either.
+    `as_of` is held SETTLE_TIME behind now so transactions still in flight
+    (postings are dated when flushed, committed later) land after it.
+    """
+    as_of = min(as_of or datetime.utcnow(), datetime.utcnow() - SETTLE_TIME)
+    previous = db.session.execute(
+        select(func.max(LedgerSnapshot.as_of)).where(LedgerSnapshot.as_of <= as_of)
+    ).scalar()
+
+    window = [LedgerPosting.created_at <= as_of]
+    if previous is not None:
+        window.append(LedgerPosting.created_at > previous)
+    deltas = db.session.execute(
+        select(LedgerPosting.account, func.sum(LedgerPosting.amount_cents), func.max(LedgerPosting.id))
+        .where(*window)
+        .group_by(LedgerPosting.account)
+    ).all()
+    if not deltas:
+        return 0
+
+    # Latest snapshot balance for each moved account, in one query
+    accounts = [account for account, _, _ in deltas]
+    latest = (
+        select(LedgerSnapshot.account, func.max(LedgerSnapshot.as_of).label('as_of'))
+        .where(LedgerSnapshot.account.in_(accounts), LedgerSnapshot.as_of <= as_of)
+        .group_by(LedgerSnapshot.account)
+        .subquery()
+    )
+    prior = {
+        account: (balance_cents, last_posting_id)
+        for account, balance_cents, last_posting_id in db.session.execute(
+            select(LedgerSnapshot.account, LedgerSnapshot.balance_cents, LedgerSnapshot.last_posting_id)
+            .join(latest, (LedgerSnapshot.account == latest.c.account) & (LedgerSnapshot.as_of == latest.c.as_of))
+        ).all()
+    }
+
+    db.session.add_all([
+        LedgerSnapshot(
+            account=account,
+            as_of=as_of,
+            last_posting_id=max(last_id, prior.get(account, (0, 0))[1]),
+            balance_cents=prior.get(account, (0, 0))[0] + delta,
+        )
+        for account, delta, last_id in deltas
+    ])
+    db.session.commit()
+    return len(deltas)
+
+
+def backfill_from_history():
+    """
+    Post opening entries for money that moved before the ledger existed,
+    dated when it moved (approval, payment or request time), so
+    balance_as_of() answers for past dates too. Only runs against an
+    empty ledger. Returns the number of entries posted.
+    """
+    if db.session.query(LedgerPosting.id).first() is not None:
+        return 0
+
+    posted = 0
+    for inv in Investment.query.filter(
+        Investment.status.in_(INVESTMENT_ACTIVE_STATUSES + ('withdrawal_requested', 'withdrawn'))
+    ).yield_per(1000):
+        post_investment_approved(inv, inv.approved_at or inv.created_at)
+        posted += 1
+    for loan in LoanApplication.query.filter(
+        LoanApplication.status.in_(LOAN_ACTIVE_STATUSES + ('repaid',))
+    ).yield_per(1000):
+        post_loan_approved(loan, loan.approved_at or loan.submitted_at)
+        posted += 1
+    for rep in LoanRepayment.query.filter_by(status='approved').yield_per(1000):
+        post_repayment_approved(rep, rep.loan, rep.date_paid)
+        posted += 1
+    for wr in WithdrawalRequest.query.filter(
+        WithdrawalRequest.status.in_(('paid', 'completed'))
+    ).yield_per(1000):
+        post_withdrawal_paid(wr, wr.investment, wr.created_at)
+        posted += 1
+    db.session.commit()
+    return posted
@@ -0,0 +1,247 @@
+"""
+Structured, non-blocking logging.
+
+Every logger feeds one QueueHandler on the root logger; a QueueListener
+thread formats the records as JSON lines and writes them to stderr (and
+LOG_FILE), so request threads never wait on I/O. Records are stamped with
+the request ID before they are queued, which ties together the access
+log ('access'), SQL logging ('sqlalchemy.engine', the SQL inspector) and
+audit entries (AuditLog.request_id) for one request. The ID comes from a
+well-formed X-Request-ID header or is generated, and is echoed back.
+
+Configuration:
+    LOG_LEVEL        root level (INFO)
+    LOG_LEVELS       per-logger levels, "access=WARNING,sqlalchemy.engine=INFO"
+    LOG_FORMAT       'json' or 'text'
+    LOG_FILE         also append to this file
+    LOG_RATE_LIMIT   same warning (logger + message template) at most N times
+                     per LOG_RATE_WINDOW seconds; the next one after the
+                     window reports how many were suppressed. 0 disables
+    LOG_SAMPLE       keep only a share of a logger's records below ERROR,
+                     "access=0.1"
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+from uuid import uuid4
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+# Attributes every LogRecord has; anything else was passed in `extra=`
+_STANDARD = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+_handler = None
+_listener = None
+_outputs = []
+
+
+# -------------------- Request IDs --------------------
+
+def request_id():
+    """The current request's ID, or None outside a request."""
+    if has_request_context():
+        return g.get('request_id')
+    return None
+
+
+def _before_request():
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if _REQUEST_ID.match(incoming) else uuid4().hex
+    g.log_started = time.perf_counter()
+
+
+def _after_request(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+        logging.getLogger('access').info(
+            '%s %s %s', request.method, request.path, response.status_code,
+            extra={
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - g.log_started) * 1000, 3),
+                'remote_addr': request.remote_addr,
+            },
+        )
+    return response
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id()
+        return True
+
+
+# -------------------- Throttling --------------------
+
+class ThrottleFilter(logging.Filter):
+    """
+    Sample a logger's records below ERROR and rate-limit repeats of one
+    warning (or lower) per logger and message template.
+    """
+
+    def __init__(self, limit=0, window=60.0, sample=None):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.sample = sample or {}
+        self._seen = {}   # key -> [window start, count in window, suppressed]
+        self._lock = threading.Lock()
+
+    def _sampled_out(self, record):
+        if record.levelno >= logging.ERROR:
+            return False
+        name = record.name
+        while name:
+            if name in self.sample:
+                return random.random() >= self.sample[name]
+            name = name.rpartition('.')[0]
+        return False
+
+    def filter(self, record):
+        if self._sampled_out(record):
+            return False
+        if not self.limit or record.levelno > logging.WARNING or record.name == 'access':
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is None or now - seen[0] >= self.window:
+                suppressed = seen[2] if seen else 0
+                self._seen[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                if len(self._seen) > 10_000:  # forget keys from long-gone bursts
+                    self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.window}
+                return True
+            if seen[1] < self.limit:
+                seen[1] += 1
+                return True
+            seen[2] += 1
+            return False
+
+
+# -------------------- Formatting --------------------
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD:
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('[%(asctime)s] %(levelname)s %(name)s [%(request_id)s]: %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        return f"{text} (suppressed {record.suppressed} similar)" if getattr(record, 'suppressed', 0) else text
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Merge args now (they may not be safe to read later) but keep the traceback as its own field
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+        return record
+
+
+# -------------------- Setup --------------------
+
+def _parse_pairs(value, cast):
+    """'a=1,b.c=2' (or a dict) -> {'a': cast('1'), 'b.c': cast('2')}."""
+    if isinstance(value, dict):
+        return {k: cast(v) for k, v in value.items()}
+    pairs = (item.split('=', 1) for item in (value or '').split(',') if '=' in item)
+    return {name.strip(): cast(level.strip()) for name, level in pairs}
+
+
+def _output_handlers(config):
+    formatter = TextFormatter() if config.get('LOG_FORMAT') == 'text' else JsonFormatter()
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if config.get('LOG_FILE'):
+        handlers.append(WatchedFileHandler(config['LOG_FILE']))
+    for h in handlers:
+        h.setFormatter(formatter)
+    return handlers
+
+
+def _start_listener():
+    global _listener
+    _listener = QueueListener(_handler.queue, *_outputs, respect_handler_level=True)
+    _listener.start()
+
+
+def _after_fork():
+    # The listener thread does not survive fork; give the child its own queue and thread
+    if _handler is not None:
+        _handler.queue = queue.SimpleQueue()
+        _start_listener()
+
+
+def _stop():
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # drains what is queued
+        _listener = None
+
+
+def init_app(app):
+    """Route all logging through the queue, set levels and start the writer thread."""
+    global _handler, _outputs
+    config = app.config
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+        _stop()
+    _handler = _QueueHandler(queue.SimpleQueue())
+    _handler.addFilter(RequestIdFilter())
+    _handler.addFilter(ThrottleFilter(
+        limit=config.get('LOG_RATE_LIMIT', 0),
+        window=config.get('LOG_RATE_WINDOW', 60.0),
+        sample=_parse_pairs(config.get('LOG_SAMPLE'), float),
+    ))
+    root.addHandler(_handler)
+    root.setLevel(config.get('LOG_LEVEL', 'INFO'))
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(logging.NOTSET)  # defer to LOG_LEVEL / LOG_LEVELS
+    for name, level in _parse_pairs(config.get('LOG_LEVELS'), str.upper).items():
+        logging.getLogger(app.logger.name if name == 'app' else name).setLevel(level)
+
+    _outputs = _output_handlers(config)
+    _start_listener()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+
+atexit.register(_stop)
+os.register_at_fork(after_in_child=_after_fork)
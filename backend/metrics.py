@@ -0,0 +1,293 @@
+"""
+Request and database metrics in Prometheus text format.
+
+Every request is timed into a per-route latency histogram (the route is
+the URL rule, e.g. /api/admin/loans/<int:loan_id>, so IDs never become
+labels), counted by status and tracked in an in-flight gauge. Cursor
+events on every engine count the SQL statements a request runs and the
+time spent in them. Queue depths and cache hit ratios are read when
+/metrics is scraped.
+
+Each process keeps its own series. With METRICS_DIR set, every worker
+writes a snapshot of them to METRICS_DIR/metrics-<pid>.json at most
+every METRICS_FLUSH_SECONDS, and a scrape of any worker adds up the
+snapshots of all of them: counters and histograms of exited workers
+still count, in-flight gauges only for live ones. Clear the directory
+when the server starts (see clear_dir()).
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Engine
+
+import intake
+import result_cache
+import work_queue
+from models import db, QueuedApproval
+
+COUNTER, GAUGE, HISTOGRAM = 'counter', 'gauge', 'histogram'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+METRICS = {
+    'http_requests_total': (COUNTER, 'Requests served, by route, method and status.', None),
+    'http_request_duration_seconds': (HISTOGRAM, 'Request latency, by route and method.', LATENCY_BUCKETS),
+    'http_requests_in_progress': (GAUGE, 'Requests being served, by route and method.', None),
+    'http_request_db_queries': (HISTOGRAM, 'SQL statements run per request, by route.', QUERY_COUNT_BUCKETS),
+    'http_request_db_seconds': (HISTOGRAM, 'Time spent in SQL per request, by route.', DB_TIME_BUCKETS),
+    'db_queries_total': (COUNTER, 'SQL statements run, in and outside requests.', None),
+    'db_query_seconds_total': (COUNTER, 'Time spent in SQL statements.', None),
+    'result_cache_requests_total': (COUNTER, 'Result cache lookups, by result.', None),
+}
+
+_values = {}   # (name, labels) -> float, or [bucket counts..., +Inf count, sum] for histograms
+_lock = threading.Lock()
+_last_flush = 0.0
+
+
+# -------------------- Recording --------------------
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    key = (name, _labels(**labels))
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    buckets = METRICS[name][2]
+    key = (name, _labels(**labels))
+    with _lock:
+        series = _values.get(key)
+        if series is None:
+            series = _values[key] = [0] * (len(buckets) + 2)
+        series[bisect_left(buckets, value)] += 1  # counts per bucket; made cumulative on output
+        series[-1] += value
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def _before_request():
+    g.metrics = {'started': time.perf_counter(), 'route': _route(), 'queries': 0, 'db_seconds': 0.0}
+    inc('http_requests_in_progress', route=g.metrics['route'], method=request.method)
+
+
+def _after_request(response):
+    if 'metrics' in g:
+        g.metrics['status'] = response.status_code
+    return response
+
+
+def _teardown_request(error):
+    state = g.pop('metrics', None)
+    if state is None:
+        return
+    route, method = state['route'], request.method
+    status = state.get('status', 500)  # no response means an unhandled exception
+    inc('http_requests_in_progress', -1, route=route, method=method)
+    inc('http_requests_total', route=route, method=method, status=str(status))
+    observe('http_request_duration_seconds', time.perf_counter() - state['started'], route=route, method=method)
+    observe('http_request_db_queries', state['queries'], route=route)
+    observe('http_request_db_seconds', state['db_seconds'], route=route)
+    _maybe_flush()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+    inc('db_queries_total')
+    inc('db_query_seconds_total', elapsed)
+    if has_request_context() and 'metrics' in g:
+        g.metrics['queries'] += 1
+        g.metrics['db_seconds'] += elapsed
+
+
+# -------------------- Worker snapshots --------------------
+
+def _metrics_dir():
+    return current_app.config.get('METRICS_DIR')
+
+
+def snapshot():
+    """This process's series, including the result cache counters."""
+    with _lock:
+        for result, count in result_cache.stats().items():
+            _values[('result_cache_requests_total', _labels(result=result))] = count
+        return {key: (list(value) if isinstance(value, list) else value) for key, value in _values.items()}
+
+
+def _write(directory):
+    path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+    data = [[name, list(labels), value] for (name, labels), value in snapshot().items()]
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+def _maybe_flush():
+    global _last_flush
+    directory = _metrics_dir()
+    now = time.monotonic()
+    if directory and now - _last_flush >= current_app.config.get('METRICS_FLUSH_SECONDS', 1.0):
+        _last_flush = now
+        _write(directory)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(total, name, labels, value):
+    key = (name, labels)
+    if isinstance(value, list):
+        series = total.setdefault(key, [0] * len(value))
+        for i, v in enumerate(value):
+            series[i] += v
+    else:
+        total[key] = total.get(key, 0) + value
+
+
+def collect():
+    """Series of every worker added together (just this process without METRICS_DIR)."""
+    total = {}
+    for key, value in snapshot().items():
+        _merge(total, *key, value)
+    directory = _metrics_dir()
+    if not directory:
+        return total
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+        if pid == os.getpid():
+            continue
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            continue  # worker file removed while reading
+        alive = _alive(pid)
+        for name, labels, value in data:
+            if METRICS.get(name, (None,))[0] == GAUGE and not alive:
+                continue
+            _merge(total, name, tuple(tuple(pair) for pair in labels), value)
+    return total
+
+
+def clear_dir(directory):
+    """Remove snapshots left by a previous server run."""
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json*')):
+        os.remove(path)
+
+
+# -------------------- Exposition --------------------
+
+def _queue_depths():
+    """Gauges read from the database at scrape time: intake, queued approvals and review queues."""
+    lines = []
+    if intake._engine is not None:
+        lines += [('intake_requests', _labels(status=status), count) for status, count in intake.backlog().items()]
+    lines += [
+        ('queued_approvals', _labels(status=status), count)
+        for status, count in db.session.execute(
+            select(QueuedApproval.status, func.count()).group_by(QueuedApproval.status)
+        ).all()
+    ]
+    for kind, model in work_queue.KINDS.items():
+        for state, count in work_queue.backlog(model).items():
+            if state != 'pending':
+                lines.append(('review_queue_items', _labels(kind=kind, state=state), count))
+    return lines
+
+
+DEPTH_HELP = {
+    'intake_requests': 'Withdrawal intake requests, by status.',
+    'queued_approvals': 'Loan approvals queued for the next window, by status.',
+    'review_queue_items': 'Pending items awaiting review, by kind and claimed/unclaimed.',
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Prometheus text exposition (format 0.0.4) of all workers' series plus queue depths."""
+    series = collect()
+    out = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        rows = sorted((labels, value) for (n, labels), value in series.items() if n == name)
+        out.append(f'# HELP {name} {help_text}')
+        out.append(f'# TYPE {name} {kind}')
+        for labels, value in rows:
+            if kind != HISTOGRAM:
+                out.append(f'{name}{_format_labels(labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, float('inf')), value):
+                cumulative += count
+                out.append(f'{name}_bucket{_format_labels(labels, le=_number(float(bound)))} {cumulative}')
+            out.append(f'{name}_sum{_format_labels(labels)} {_number(value[-1])}')
+            out.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    cache = {dict(labels)['result']: value for (n, labels), value in series.items()
+             if n == 'result_cache_requests_total'}
+    lookups = sum(cache.values())
+    out.append('# HELP result_cache_hit_ratio Share of result cache lookups served without computing.')
+    out.append('# TYPE result_cache_hit_ratio gauge')
+    out.append(f'result_cache_hit_ratio {_number((cache.get("hits", 0) + cache.get("coalesced", 0)) / lookups if lookups else 0.0)}')
+
+    depths = _queue_depths()
+    for name, help_text in DEPTH_HELP.items():
+        out.append(f'# HELP {name} {help_text}')
+        out.append(f'# TYPE {name} gauge')
+        out += [f'{name}{_format_labels(labels)} {count}' for n, labels, count in depths if n == name]
+    return '\n'.join(out) + '\n'
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    directory = app.config.get('METRICS_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(_write, directory)
@@ -1,11 +1,65 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, update
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from math import pow
 from dateutil.relativedelta import relativedelta
 
+import rates
+from fieldsets import Fieldset
+
 db = SQLAlchemy()
 
+# ------------------- Optimistic Versioning -------------------
+
+TRANSITION_RETRIES = 3
+
+# Statuses that still count as a live investment / outstanding loan. The
+# scheduler moves rows between them (see scheduler.py) without taking them
+# off the book.
+INVESTMENT_ACTIVE_STATUSES = ('approved', 'matured')
+LOAN_ACTIVE_STATUSES = ('approved', 'overdue')
+
+
+def matching_statuses(status, active_statuses):
+    """Statuses a `?status=` filter selects: 'approved' keeps covering rows the scheduler moved on."""
+    return active_statuses if status == 'approved' else (status,)
+
+
+class ConcurrentUpdateError(Exception):
+    """A row kept changing underneath a conditional transition."""
+
+
+def transition_status(model, row_id, expected_status, retries=TRANSITION_RETRIES, **values):
+    """
+    Move a row out of `expected_status` (a status or tuple of statuses) with
+    a conditional UPDATE ... WHERE status = :expected AND version = :v.
+    Returns True if this caller won the transition, False if the row is
+    missing or no longer in `expected_status`. Nothing is committed here.
+    """
+    if isinstance(expected_status, str):
+        expected_status = (expected_status,)
+    for _ in range(retries + 1):
+        current = db.session.execute(
+            select(model.status, model.version).where(model.id == row_id)
+        ).first()
+        if current is None or current.status not in expected_status:
+            return False
+
+        result = db.session.execute(
+            update(model)
+            .where(
+                model.id == row_id,
+                model.status == current.status,
+                model.version == current.version,
+            )
+            .values(version=model.version + 1, **values)
+        )
+        if result.rowcount == 1:
+            return True
+        # Another worker bumped the version (but maybe not the status): re-read and retry
+    raise ConcurrentUpdateError(f'{model.__tablename__} {row_id} is being updated concurrently')
+
 # ------------------- Admin User -------------------
 
 class AdminUser(db.Model):
@@ -67,6 +121,9 @@ class Investor(db.Model):
     is_rejected = db.Column(db.Boolean, default=False, nullable=False) 
     is_confirmed = db.Column(db.Boolean, nullable=False, default=False)
     balance = db.Column(db.Float, default=0.0)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    claimed_by = db.Column(db.Integer)      # admin reviewing it while pending, see work_queue.py
+    claimed_until = db.Column(db.DateTime)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -82,30 +139,29 @@ class Investor(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-    def update_balance(self, amount_change, commit=True):
-        self.balance = (self.balance or 0) + amount_change
-        if commit:
-            db.session.commit()
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'first_name': self.first_name,
-            'surname': self.surname,
-            'username': self.username,
-            'email': self.email,
-            'phone': self.phone,
-            'id_number': self.id_number,
-            'address': self.address,
-            'next_of_kin': self.next_of_kin,
-            'phone_of_kin': self.phone_of_kin,
-            'proof_of_residence': self.proof_of_residence,
-            'id_document': self.id_document,
-            'face_photo': self.face_photo,
-            'is_approved': self.is_approved,
-            'balance': self.balance,
-            'created_at': self.created_at.isoformat(),
-        }
+    def to_dict(self, fields=None):
+        return INVESTOR_FIELDS.dump(self, fields)
+
+
+# Fields the API may return for an investor; `fields=` picks a subset
+INVESTOR_FIELDS = Fieldset({
+    'id': Investor.id,
+    'first_name': Investor.first_name,
+    'surname': Investor.surname,
+    'username': Investor.username,
+    'email': Investor.email,
+    'phone': Investor.phone,
+    'id_number': Investor.id_number,
+    'address': Investor.address,
+    'next_of_kin': Investor.next_of_kin,
+    'phone_of_kin': Investor.phone_of_kin,
+    'proof_of_residence': Investor.proof_of_residence,
+    'id_document': Investor.id_document,
+    'face_photo': Investor.face_photo,
+    'is_approved': Investor.is_approved,
+    'balance': Investor.balance,
+    'created_at': Investor.created_at,
+})
 
 
 # ------------------- Investment -------------------
@@ -123,9 +179,13 @@ class Investment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     approved_at = db.Column(db.DateTime, nullable=True)
+    maturity_date = db.Column(db.Date, nullable=True, index=True)  # set on approval, see maturity_for()
 
-    status = db.Column(db.String(50), default='pending')  # pending, approved, withdrawal_requested, paid, completed
+    status = db.Column(db.String(50), default='pending', index=True)  # pending, approved, matured, withdrawal_requested, withdrawn
     is_authorized = db.Column(db.Boolean, default=False)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    claimed_by = db.Column(db.Integer)      # admin reviewing it while pending, see work_queue.py
+    claimed_until = db.Column(db.DateTime)
 
     proof_of_payment = db.Column(db.String(200))  # → uploads/investments/proofs_of_payment/
 
@@ -147,6 +207,10 @@ class Investment(db.Model):
             return None
         return self.approved_at + relativedelta(months=self.duration_months)
     
+    @staticmethod
+    def maturity_for(approved_at, duration_months):
+        return (approved_at + relativedelta(months=duration_months)).date()
+
     @property
     def expected_maturity_date(self):
         """Return a date object (not datetime) for when the term ends."""
@@ -189,12 +253,7 @@ class Investment(db.Model):
 
     @staticmethod
     def calculate_rate(amount, months):
-        if amount < 100:
-            return 8 if months <= 3 else 10 if months <= 6 else 12
-        elif amount < 200:
-            return 10 if months <= 3 else 12 if months <= 6 else 13
-        else:
-            return 12 if months <= 3 else 14 if months <= 6 else 15
+        return rates.rate_for(max(amount, rates.MIN_AMOUNT), months)
 
     def to_dict(self):
         return {
@@ -222,7 +281,7 @@ class LoanApplication(db.Model):
     phone = db.Column(db.String(30))
     amount = db.Column(db.Float, nullable=False)
     purpose = db.Column(db.String(255))
-    status = db.Column(db.String(20), default='pending')
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, approved, overdue, repaid, rejected
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     interest_rate = db.Column(db.Float)
     repayment_due_date = db.Column(db.DateTime)
@@ -232,6 +291,9 @@ class LoanApplication(db.Model):
     next_of_kin_details = db.Column(db.String(255))
     other_details = db.Column(db.Text)
     signed_documents = db.Column(db.String(255))
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    claimed_by = db.Column(db.Integer)      # admin reviewing it while pending, see work_queue.py
+    claimed_until = db.Column(db.DateTime)
 
     repayments = db.relationship('LoanRepayment', backref='loan', lazy=True)
 
@@ -244,6 +306,27 @@ class LoanApplication(db.Model):
             self.interest_rate = 17.0
 
 
+# Fields the API may return for a loan application; `fields=` picks a subset
+LOAN_FIELDS = Fieldset({
+    'loan_id': LoanApplication.id,
+    'investor_id': LoanApplication.investor_id,
+    'full_name': LoanApplication.full_name,
+    'email': LoanApplication.email,
+    'phone': LoanApplication.phone,
+    'amount': LoanApplication.amount,
+    'purpose': LoanApplication.purpose,
+    'status': LoanApplication.status,
+    'interest_rate': LoanApplication.interest_rate,
+    'submitted_at': LoanApplication.submitted_at,
+    'approved_at': LoanApplication.approved_at,
+    'repayment_due_date': LoanApplication.repayment_due_date,
+    'collateral': LoanApplication.collateral,
+    'next_of_kin_details': LoanApplication.next_of_kin_details,
+    'other_details': LoanApplication.other_details,
+    'signed_documents': LoanApplication.signed_documents,
+})
+
+
 # ------------------- Notification -------------------
 
 class Notification(db.Model):
@@ -277,6 +360,9 @@ class LoanRepayment(db.Model):
     proof = db.Column(db.String(200))
     method = db.Column(db.String(50))
     status = db.Column(db.String(20), default="pending")
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    claimed_by = db.Column(db.Integer)      # admin reviewing it while pending, see work_queue.py
+    claimed_until = db.Column(db.DateTime)
 
 
 # ------------------- Audit Log -------------------
@@ -292,6 +378,7 @@ class AuditLog(db.Model):
     details = db.Column(db.Text)
     ip_address = db.Column(db.String(45))
     user_agent = db.Column(db.String(255))
+    request_id = db.Column(db.String(64), index=True)  # ties the entry to the request's log lines, see logs.py
 
 
 # ------------------- Withdrawal Request -------------------
@@ -308,5 +395,180 @@ class WithdrawalRequest(db.Model):
 
     proof_of_payment = db.Column(db.String(200))  # → uploads/withdrawals/
     admin_comment = db.Column(db.String(255))     # Optional
+    intake_id = db.Column(db.String(32), unique=True)  # surge intake request that created it, see intake.py
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ------------------- Ledger -------------------
+
+class LedgerPosting(db.Model):
+    """One leg of a double-entry journal entry. Rows are never updated or deleted."""
+    __tablename__ = 'ledger_posting'
+    __table_args__ = (
+        db.Index('ix_ledger_posting_account_created_at', 'account', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entry_id = db.Column(db.String(32), nullable=False, index=True)
+    account = db.Column(db.String(64), nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)  # debit > 0, credit < 0
+    reference_type = db.Column(db.String(30))
+    reference_id = db.Column(db.Integer)
+    memo = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class LedgerSnapshot(db.Model):
+    """Balance of one account covering every posting dated at or before `as_of`."""
+    __tablename__ = 'ledger_snapshot'
+    __table_args__ = (
+        db.Index('ix_ledger_snapshot_account_as_of', 'account', 'as_of'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    account = db.Column(db.String(64), nullable=False)
+    as_of = db.Column(db.DateTime, nullable=False)
+    last_posting_id = db.Column(db.Integer, nullable=False)  # highest posting id folded in, for audits only
+    balance_cents = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ------------------- Investor Portfolio -------------------
+
+class InvestorPortfolio(db.Model):
+    """Denormalised dashboard totals, maintained by state transitions (see portfolio.py)."""
+    __tablename__ = 'investor_portfolio'
+
+    investor_id = db.Column(db.Integer, db.ForeignKey('investor.id'), primary_key=True)
+
+    investment_count = db.Column(db.Integer, nullable=False, default=0)
+    invested_principal = db.Column(db.Float, nullable=False, default=0.0)
+    projected_returns = db.Column(db.Float, nullable=False, default=0.0)
+
+    total_loans = db.Column(db.Integer, nullable=False, default=0)
+    active_loans = db.Column(db.Integer, nullable=False, default=0)
+    total_repayable = db.Column(db.Float, nullable=False, default=0.0)
+    total_repaid = db.Column(db.Float, nullable=False, default=0.0)
+
+    pending_withdrawals = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# ------------------- Investment Valuation -------------------
+
+class InvestmentValuation(db.Model):
+    """Value of one approved investment on one date, written by the accrual job (see valuation.py)."""
+    __tablename__ = 'investment_valuation'
+    __table_args__ = (
+        db.Index('ix_investment_valuation_investor_date', 'investor_id', 'valuation_date'),
+    )
+
+    investment_id = db.Column(db.Integer, db.ForeignKey('investment.id'), primary_key=True)
+    valuation_date = db.Column(db.Date, primary_key=True, index=True)
+    investor_id = db.Column(db.Integer, nullable=False)
+    elapsed_months = db.Column(db.SmallInteger, nullable=False)
+    value = db.Column(db.Float, nullable=False)
+
+
+# ------------------- Scheduler Lock -------------------
+
+class SchedulerLock(db.Model):
+    """One row per scheduled job; claiming it elects the worker that runs the job (see scheduler.py)."""
+    __tablename__ = 'scheduler_lock'
+
+    name = db.Column(db.String(64), primary_key=True)
+    holder = db.Column(db.String(100))
+    locked_until = db.Column(db.DateTime)
+    last_run_at = db.Column(db.DateTime)
+    last_duration_ms = db.Column(db.Float)
+    last_result = db.Column(db.String(255))
+
+
+# ------------------- Queued Approval -------------------
+
+class QueuedApproval(db.Model):
+    """An approval requested outside the 28th→8th window, applied in bulk when it opens (see approval_queue.py)."""
+    __tablename__ = 'queued_approval'
+    __table_args__ = (
+        db.Index('ix_queued_approval_kind_target', 'kind', 'target_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False, default='loan')
+    target_id = db.Column(db.Integer, nullable=False)
+    queued_by = db.Column(db.Integer, nullable=False)
+    queued_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    status = db.Column(db.String(20), default='queued', nullable=False, index=True)  # queued, applied, failed, cancelled
+    outcome = db.Column(db.String(255))
+    batch_id = db.Column(db.String(32), index=True)
+    applied_at = db.Column(db.DateTime)
+    batch_duration_ms = db.Column(db.Float)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'target_id': self.target_id,
+            'queued_by': self.queued_by,
+            'queued_at': self.queued_at.isoformat(),
+            'status': self.status,
+            'outcome': self.outcome,
+            'batch_id': self.batch_id,
+            'applied_at': self.applied_at.isoformat() if self.applied_at else None,
+            'wait_seconds': round((self.applied_at - self.queued_at).total_seconds(), 1) if self.applied_at else None,
+            'batch_duration_ms': self.batch_duration_ms,
+        }
+
+
+# ------------------- Table Versions -------------------
+
+class TableVersion(db.Model):
+    """Write counter per table, bumped after each committing transaction (see versions.py)."""
+    __tablename__ = 'table_version'
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+# ------------------- Schema Upgrades -------------------
+
+def add_missing_columns(connection):
+    """
+    Add model columns that existing tables lack, with their indexes.
+
+    create_all() only creates whole tables, so columns added to a model
+    after its table exists (version, claimed_by, maturity_date, ...) are
+    added here with ALTER TABLE. New NOT NULL columns need a
+    server_default for the rows already there. Returns 'table.column'
+    for each column added.
+    """
+    inspector = db.inspect(connection)
+    compiler = connection.dialect.ddl_compiler(connection.dialect, None)
+    preparer = connection.dialect.identifier_preparer
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            connection.execute(db.text(
+                f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {compiler.get_column_specification(col)}'
+            ))
+            if col.unique:
+                # ADD COLUMN can't carry a UNIQUE constraint on SQLite; an index enforces the same
+                connection.execute(db.text(
+                    f'CREATE UNIQUE INDEX uq_{table.name}_{col.name} '
+                    f'ON {preparer.format_table(table)} ({preparer.format_column(col)})'
+                ))
+            added.append(f'{table.name}.{col.name}')
+        indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(connection)
+    return added
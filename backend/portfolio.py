@@ -0,0 +1,215 @@
+"""
+Per-investor portfolio summary.
+
+One InvestorPortfolio row per investor holds the totals the investor
+dashboard shows. State transitions apply SQL-side increments to it, so
+the dashboard is a single primary-key read. `rebuild()` recomputes a row
+(or every row) from the source tables whenever it drifts or is missing.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+
+from models import (
+    db,
+    Investment,
+    LoanApplication,
+    LoanRepayment,
+    WithdrawalRequest,
+    InvestorPortfolio,
+    INVESTMENT_ACTIVE_STATUSES,
+    LOAN_ACTIVE_STATUSES
+)
+
+SUMMARY_FIELDS = (
+    'investment_count',
+    'invested_principal',
+    'projected_returns',
+    'total_loans',
+    'active_loans',
+    'total_repayable',
+    'total_repaid',
+    'pending_withdrawals',
+)
+
+
+def projected_value(amount, rate, duration_months):
+    return round(amount * ((1 + rate / 100) ** duration_months), 2)
+
+
+def loan_repayable(amount, interest_rate):
+    return amount * (1 + (interest_rate or 0) / 100)
+
+
+def record(investor_id, **deltas):
+    """
+    Apply increments to an investor's summary row in SQL. If the row does
+    not exist yet it is rebuilt from the source tables instead (the caller's
+    change must already be visible to this session). Not committed.
+    """
+    if investor_id is None:
+        return
+    investor_id = int(investor_id)
+    result = db.session.execute(
+        update(InvestorPortfolio)
+        .where(InvestorPortfolio.investor_id == investor_id)
+        .values(
+            updated_at=datetime.utcnow(),
+            **{name: getattr(InvestorPortfolio, name) + delta for name, delta in deltas.items()}
+        )
+    )
+    if result.rowcount == 0:
+        rebuild(investor_id)
+
+
+# -------------------- Transition hooks --------------------
+
+def _investment_deltas(investment, sign):
+    return {
+        'investment_count': sign,
+        'invested_principal': sign * investment.amount,
+        'projected_returns': sign * projected_value(
+            investment.amount, investment.rate, investment.duration_months),
+    }
+
+
+def investment_opened(investment):
+    record(investment.investor_id, **_investment_deltas(investment, 1))
+
+
+def withdrawal_requested(investment):
+    # A requested withdrawal leaves the approved book until it is rejected
+    record(investment.investor_id, pending_withdrawals=1, **_investment_deltas(investment, -1))
+
+
+def withdrawal_rejected(investment):
+    record(investment.investor_id, pending_withdrawals=-1, **_investment_deltas(investment, 1))
+
+
+def withdrawal_paid(investor_id):
+    record(investor_id, pending_withdrawals=-1)
+
+
+def loan_submitted(loan):
+    record(loan.investor_id, total_loans=1)
+
+
+def loan_approved(loan):
+    record(loan.investor_id, active_loans=1, total_repayable=loan_repayable(loan.amount, loan.interest_rate))
+
+
+def loan_repaid(loan):
+    record(loan.investor_id, active_loans=-1, total_repayable=-loan_repayable(loan.amount, loan.interest_rate))
+
+
+def repayment_approved(repayment, loan):
+    record(loan.investor_id, total_repaid=repayment.amount_paid)
+
+
+# -------------------- Reads & rebuilds --------------------
+
+def get_summary(investor_id):
+    """Return the investor's summary row, building it on first access."""
+    investor_id = int(investor_id)
+    row = db.session.get(InvestorPortfolio, investor_id)
+    if row is None:
+        row = rebuild(investor_id)
+        db.session.commit()
+    return row
+
+
+def _aggregate(investor_id=None):
+    """Compute summary totals from the source tables, keyed by investor id."""
+    totals = defaultdict(lambda: dict.fromkeys(SUMMARY_FIELDS, 0))
+
+    def scoped(stmt, column):
+        return stmt if investor_id is None else stmt.where(column == investor_id)
+
+    investments = scoped(
+        select(Investment.investor_id, Investment.amount, Investment.rate, Investment.duration_months)
+        .where(Investment.status.in_(INVESTMENT_ACTIVE_STATUSES)),
+        Investment.investor_id,
+    )
+    for inv_id, amount, rate, months in db.session.execute(investments).yield_per(5000):
+        row = totals[inv_id]
+        row['investment_count'] += 1
+        row['invested_principal'] += amount
+        row['projected_returns'] += projected_value(amount, rate, months)
+
+    loans = scoped(
+        select(LoanApplication.investor_id, LoanApplication.status, LoanApplication.amount,
+               LoanApplication.interest_rate),
+        LoanApplication.investor_id,
+    )
+    for inv_id, status, amount, rate in db.session.execute(loans).yield_per(5000):
+        row = totals[inv_id]
+        row['total_loans'] += 1
+        if status in LOAN_ACTIVE_STATUSES:
+            row['active_loans'] += 1
+            row['total_repayable'] += loan_repayable(amount, rate)
+
+    repaid = scoped(
+        select(LoanApplication.investor_id, func.sum(LoanRepayment.amount_paid))
+        .join(LoanApplication, LoanRepayment.loan_id == LoanApplication.id)
+        .where(LoanRepayment.status == 'approved')
+        .group_by(LoanApplication.investor_id),
+        LoanApplication.investor_id,
+    )
+    for inv_id, total in db.session.execute(repaid):
+        totals[inv_id]['total_repaid'] = total or 0.0
+
+    pending = scoped(
+        select(WithdrawalRequest.investor_id, func.count())
+        .where(WithdrawalRequest.status == 'pending')
+        .group_by(WithdrawalRequest.investor_id),
+        WithdrawalRequest.investor_id,
+    )
+    for inv_id, count in db.session.execute(pending):
+        totals[inv_id]['pending_withdrawals'] = count
+
+    totals.pop(None, None)  # loans submitted without an investor
+    return totals
+
+
+def _insert_ignore(investor_id, values):
+    """INSERT ... ON CONFLICT DO NOTHING for one summary row."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return db.session.execute(
+        insert(InvestorPortfolio)
+        .values(investor_id=investor_id, **values)
+        .on_conflict_do_nothing(index_elements=[InvestorPortfolio.investor_id])
+    )
+
+
+def rebuild(investor_id=None):
+    """
+    Recompute summary rows from the source tables. With an investor id the
+    rebuilt row is returned; without one every investor is rebuilt and the
+    number of rows written is returned. Not committed.
+    """
+    if investor_id is not None:
+        investor_id = int(investor_id)
+    totals = _aggregate(investor_id)
+    now = datetime.utcnow()
+
+    if investor_id is not None:
+        values = dict(totals.get(investor_id) or dict.fromkeys(SUMMARY_FIELDS, 0), updated_at=now)
+        # Two first reads may build the same row at once: the loser's insert
+        # is ignored and it overwrites the winner's row with the same totals
+        if _insert_ignore(investor_id, values).rowcount == 0:
+            db.session.execute(
+                update(InvestorPortfolio).where(InvestorPortfolio.investor_id == investor_id).values(**values)
+            )
+        return db.session.get(InvestorPortfolio, investor_id, populate_existing=True)
+
+    db.session.execute(InvestorPortfolio.__table__.delete())
+    if totals:
+        db.session.execute(
+            InvestorPortfolio.__table__.insert(),
+            [dict(values, investor_id=inv_id, updated_at=now) for inv_id, values in totals.items()],
+        )
+    return len(totals)
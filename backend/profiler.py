@@ -0,0 +1,208 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries a valid X-Profile-Token header
+(signed tokens are handed out to admins by /api/admin/profiling/token)
+or is picked by PROFILE_SAMPLE_RATE. Two modes:
+
+    cprofile  deterministic cProfile, saved as <id>.pstats
+              (python -m pstats, snakeviz)
+    sample    a thread that snapshots the request thread's stack every
+              PROFILE_INTERVAL_MS, saved as collapsed stacks <id>.collapsed
+              (flamegraph.pl, speedscope)
+
+cProfile can only run in one thread at a time, so a concurrent cprofile
+request falls back to sampling. Profiles land in PROFILE_DIR with a
+<id>.json summary; the oldest are pruned past PROFILE_KEEP. With no
+token and a zero sample rate a request costs one header lookup.
+"""
+import cProfile
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from uuid import uuid4
+
+from flask import current_app, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+MODES = ('cprofile', 'sample')
+HEADER = 'X-Profile-Token'
+DEFAULT_INTERVAL_MS = 5
+DEFAULT_KEEP = 100
+DEFAULT_TOKEN_MAX_AGE = 3600
+
+_cprofile_lock = threading.Lock()
+_prune_lock = threading.Lock()
+
+
+# -------------------- Tokens --------------------
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['JWT_SECRET_KEY'], salt='profile-token')
+
+
+def issue_token(admin_id, mode='cprofile'):
+    """Signed header value that makes the bearer's requests profiled in `mode`."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    return _serializer().dumps({'admin': admin_id, 'mode': mode})
+
+
+def _token_mode(token):
+    try:
+        payload = _serializer().loads(
+            token, max_age=current_app.config.get('PROFILE_TOKEN_MAX_AGE', DEFAULT_TOKEN_MAX_AGE)
+        )
+    except BadSignature:  # includes expired tokens
+        return None
+    return payload.get('mode') if payload.get('mode') in MODES else None
+
+
+# -------------------- Sampler --------------------
+
+class Sampler:
+    """Collapsed stacks of one thread, sampled from a helper thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+# -------------------- Request hooks --------------------
+
+def _requested_mode():
+    token = request.headers.get(HEADER)
+    if token:
+        return _token_mode(token)
+    rate = current_app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    if rate and random.random() < rate:
+        return current_app.config.get('PROFILE_SAMPLE_MODE', 'sample')
+    return None
+
+
+def _before_request():
+    mode = _requested_mode()
+    if mode is None:
+        return
+    state = {'id': uuid4().hex[:12], 'started': time.perf_counter(), 'at': datetime.utcnow().isoformat()}
+    if mode == 'cprofile' and _cprofile_lock.acquire(blocking=False):
+        state['profile'] = cProfile.Profile()
+        state['profile'].enable()
+    else:
+        interval = current_app.config.get('PROFILE_INTERVAL_MS', DEFAULT_INTERVAL_MS) / 1000
+        state['sampler'] = Sampler(threading.get_ident(), interval)
+        state['sampler'].start()
+    g.profile = state
+
+
+def _after_request(response):
+    if 'profile' in g:
+        g.profile['status'] = response.status_code
+        response.headers['X-Profile-Id'] = g.profile['id']
+    return response
+
+
+def _teardown_request(error):
+    state = g.pop('profile', None)
+    if state is None:
+        return
+    duration_ms = round((time.perf_counter() - state['started']) * 1000, 3)
+    directory = current_app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, state['id'])
+
+    if 'profile' in state:
+        state['profile'].disable()
+        _cprofile_lock.release()
+        state['profile'].dump_stats(base + '.pstats')
+        mode, filename = 'cprofile', state['id'] + '.pstats'
+    else:
+        state['sampler'].stop()
+        with open(base + '.collapsed', 'w') as fh:
+            fh.write(state['sampler'].collapsed())
+        mode, filename = 'sample', state['id'] + '.collapsed'
+
+    with open(base + '.json', 'w') as fh:
+        json.dump({
+            'id': state['id'],
+            'request_id': g.get('request_id'),
+            'mode': mode,
+            'file': filename,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': state.get('status', 500),
+            'duration_ms': duration_ms,
+            'at': state['at'],
+        }, fh)
+    _prune(directory, current_app.config.get('PROFILE_KEEP', DEFAULT_KEEP))
+
+
+# -------------------- Stored profiles --------------------
+
+def _prune(directory, keep):
+    with _prune_lock:
+        summaries = sorted(glob.glob(os.path.join(directory, '*.json')), key=os.path.getmtime)
+        for path in summaries[:max(len(summaries) - keep, 0)]:
+            for leftover in glob.glob(path[:-len('.json')] + '.*'):
+                os.remove(leftover)
+
+
+def list_profiles():
+    """Summaries of stored profiles, newest first."""
+    directory = current_app.config['PROFILE_DIR']
+    profiles = []
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path) as fh:
+                profiles.append(json.load(fh))
+        except (OSError, ValueError):
+            continue  # pruned or still being written
+    return sorted(profiles, key=lambda p: p['at'], reverse=True)
+
+
+def profile_path(profile_id):
+    """Path of a stored profile's output file, or None."""
+    if not profile_id.isalnum():
+        return None
+    directory = current_app.config['PROFILE_DIR']
+    for ext in ('.pstats', '.collapsed'):
+        path = os.path.join(directory, profile_id + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
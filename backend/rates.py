@@ -0,0 +1,80 @@
+"""
+Investment rate table.
+
+The single source of truth for monthly investment rates. The table is
+compiled once at import into NumPy lookup arrays, so pricing a whole
+grid of (amount, duration) pairs is two `searchsorted` calls and one
+fancy-index instead of a Python loop over bracket dicts.
+"""
+import numpy as np
+
+MIN_AMOUNT = 28
+MAX_DURATION_MONTHS = 24
+
+# (amount from, {duration from: monthly rate %}) — each bracket runs until the next one starts
+RATE_TABLE = (
+    (28,  {1: 8,  4: 10, 7: 12}),
+    (100, {1: 10, 4: 12, 7: 13}),
+    (200, {1: 12, 4: 14, 7: 15}),
+)
+
+# -------------------- Compiled lookup arrays --------------------
+_AMOUNT_BOUNDS = np.array([lo for lo, _ in RATE_TABLE], dtype=np.float64)
+_DURATION_BOUNDS = np.array(sorted(RATE_TABLE[0][1]), dtype=np.int64)
+_RATES = np.array(
+    [[rates[d] for d in _DURATION_BOUNDS.tolist()] for _, rates in RATE_TABLE],
+    dtype=np.float64,
+)
+for _array in (_AMOUNT_BOUNDS, _DURATION_BOUNDS, _RATES):
+    _array.setflags(write=False)
+
+
+def rate_grid(amounts, durations):
+    """
+    Monthly rate (%) for every amount × duration, shape (len(amounts), len(durations)).
+    Amounts below MIN_AMOUNT or durations below one month price at 0.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    durations = np.asarray(durations, dtype=np.int64)
+
+    a_idx = np.searchsorted(_AMOUNT_BOUNDS, amounts, side='right') - 1
+    d_idx = np.searchsorted(_DURATION_BOUNDS, durations, side='right') - 1
+
+    grid = _RATES[np.clip(a_idx, 0, None)[:, None], np.clip(d_idx, 0, None)[None, :]]
+    valid = (a_idx >= 0)[:, None] & (d_idx >= 0)[None, :]
+    return np.where(valid, grid, 0.0)
+
+
+def rate_for(amount, duration_months):
+    """Monthly rate (%) for a single investment; 0 when no bracket applies."""
+    rate = rate_grid([amount], [duration_months])[0, 0]
+    return int(rate) if rate.is_integer() else float(rate)
+
+
+def quote(amounts, durations, curves=False):
+    """
+    Price every amount × duration in one vectorised pass. Returns a dict of
+    nested lists: rates, projected values (monthly compounding) and, if
+    requested, month-by-month growth curves trimmed to each duration.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    durations = np.asarray(durations, dtype=np.int64)
+    rates = rate_grid(amounts, durations)
+    growth = 1 + rates / 100
+
+    result = {
+        'amounts': amounts.tolist(),
+        'durations': durations.tolist(),
+        'rates': rates.tolist(),
+        'projected_values': np.round(amounts[:, None] * growth ** durations[None, :], 2).tolist(),
+    }
+
+    if curves:
+        months = np.arange(1, int(durations.max()) + 1)
+        values = np.round(amounts[:, None, None] * growth[:, :, None] ** months[None, None, :], 2)
+        result['curves'] = [
+            [values[i, j, :durations[j]].tolist() for j in range(len(durations))]
+            for i in range(len(amounts))
+        ]
+
+    return result
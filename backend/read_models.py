@@ -0,0 +1,288 @@
+"""
+Read models for list endpoints.
+
+Listings that go straight to JSON don't need the ORM: building mapped
+objects, registering them in the identity map and instrumenting their
+attributes costs more than the query itself, and relationship access
+turns into one lazy load per row. The functions here run lambda
+statements over the plain tables — each statement is built and compiled
+once per code location and reused with fresh bound parameters — on the
+session's connection, and map the rows onto namedtuples.
+
+Lambda statements are cached by their code, not their values: anything
+that varies between calls must be a closure variable used as a value
+(it becomes a bound parameter), never a column list or a clause that
+changes shape. Endpoints with `fields=` keep their load_only ORM queries
+for that reason.
+
+`benchmark()` times each read model against the equivalent ORM load
+(`flask bench-read-models`).
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from math import ceil
+
+from sqlalchemy import func, lambda_stmt, select
+from sqlalchemy.orm import joinedload
+
+from models import (
+    db, Investment, Investor, LoanApplication, LoanRepayment, WithdrawalRequest,
+    INVESTMENT_ACTIVE_STATUSES, LOAN_ACTIVE_STATUSES, matching_statuses
+)
+
+investment = Investment.__table__
+investor = Investor.__table__
+loan_application = LoanApplication.__table__
+loan_repayment = LoanRepayment.__table__
+withdrawal_request = WithdrawalRequest.__table__
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+Page = namedtuple('Page', 'items total page per_page pages')
+
+InvestmentRow = namedtuple('InvestmentRow', [
+    'id', 'investor_id', 'amount', 'duration_months', 'rate', 'status', 'proof_of_payment',
+    'created_at', 'approved_at', 'investor_first_name', 'investor_surname', 'investor_phone',
+])
+WithdrawalRow = namedtuple('WithdrawalRow', [
+    'id', 'investment_id', 'investor_id', 'amount', 'status', 'proof_of_payment', 'created_at',
+    'investment_amount', 'investment_rate', 'investment_duration_months',
+    'investor_first_name', 'investor_surname',
+])
+RepaymentRow = namedtuple('RepaymentRow', [
+    'id', 'loan_id', 'amount_paid', 'date_paid', 'status', 'method',
+    'loan_amount', 'loan_interest_rate', 'investor_first_name', 'investor_surname',
+])
+LoanRow = namedtuple('LoanRow', [
+    'id', 'investor_id', 'full_name', 'amount', 'purpose', 'status', 'interest_rate',
+    'submitted_at', 'approved_at', 'repayment_due_date', 'collateral',
+    'next_of_kin_details', 'other_details', 'signed_documents',
+])
+InvestorRow = namedtuple('InvestorRow', [
+    'id', 'first_name', 'surname', 'username', 'email', 'phone', 'id_number', 'address',
+    'next_of_kin', 'phone_of_kin', 'proof_of_residence', 'id_document', 'face_photo',
+    'is_approved', 'balance', 'created_at',
+])
+
+
+def _rows(dto, stmt):
+    return list(map(dto._make, db.session.connection().execute(stmt)))
+
+
+def _count(stmt):
+    return db.session.connection().execute(stmt).scalar_one()
+
+
+def _page_args(page, per_page):
+    # Same clamping as Flask-SQLAlchemy's paginate(error_out=False)
+    page = page if page and page > 0 else 1
+    per_page = per_page if per_page and per_page > 0 else DEFAULT_PER_PAGE
+    return page, min(per_page, MAX_PER_PAGE)
+
+
+def _page(items, total, page, per_page):
+    return Page(items, total, page, per_page, ceil(total / per_page) if total else 0)
+
+
+# -------------------- Investments --------------------
+
+def investments(status=None):
+    """Every investment with its investor's name and phone, optionally one status ('approved' includes matured)."""
+    stmt = lambda_stmt(lambda: select(
+        investment.c.id, investment.c.investor_id, investment.c.amount, investment.c.duration_months,
+        investment.c.rate, investment.c.status, investment.c.proof_of_payment,
+        investment.c.created_at, investment.c.approved_at,
+        investor.c.first_name, investor.c.surname, investor.c.phone,
+    ).outerjoin(investor, investor.c.id == investment.c.investor_id))
+    if status:
+        statuses = matching_statuses(status, INVESTMENT_ACTIVE_STATUSES)
+        stmt += lambda s: s.where(investment.c.status.in_(statuses))
+    return _rows(InvestmentRow, stmt)
+
+
+# -------------------- Withdrawals --------------------
+
+def _withdrawal_select():
+    return lambda_stmt(lambda: select(
+        withdrawal_request.c.id, withdrawal_request.c.investment_id, investment.c.investor_id,
+        withdrawal_request.c.amount, withdrawal_request.c.status, withdrawal_request.c.proof_of_payment,
+        withdrawal_request.c.created_at,
+        investment.c.amount, investment.c.rate, investment.c.duration_months,
+        investor.c.first_name, investor.c.surname,
+    ).join(investment, investment.c.id == withdrawal_request.c.investment_id)
+     .join(investor, investor.c.id == investment.c.investor_id))
+
+
+def withdrawals(status=None, page=1, per_page=DEFAULT_PER_PAGE):
+    """One page of withdrawal requests, newest first, with investment terms and investor name."""
+    page, per_page = _page_args(page, per_page)
+    offset = (page - 1) * per_page
+
+    stmt = _withdrawal_select()
+    count = lambda_stmt(lambda: select(func.count()).select_from(
+        withdrawal_request.join(investment, investment.c.id == withdrawal_request.c.investment_id)
+    ))
+    if status:
+        stmt += lambda s: s.where(withdrawal_request.c.status == status)
+        count += lambda s: s.where(withdrawal_request.c.status == status)
+    stmt += lambda s: s.order_by(withdrawal_request.c.created_at.desc(), withdrawal_request.c.id.desc()) \
+        .limit(per_page).offset(offset)
+    return _page(_rows(WithdrawalRow, stmt), _count(count), page, per_page)
+
+
+def investor_withdrawals(investor_id):
+    """All of one investor's withdrawal requests, newest first."""
+    stmt = _withdrawal_select()
+    stmt += lambda s: s.where(withdrawal_request.c.investor_id == investor_id) \
+        .order_by(withdrawal_request.c.created_at.desc())
+    return _rows(WithdrawalRow, stmt)
+
+
+# -------------------- Repayments --------------------
+
+def repayments(status=None, page=1, per_page=DEFAULT_PER_PAGE):
+    """One page of loan repayments, latest payment first, with loan terms and borrower name."""
+    page, per_page = _page_args(page, per_page)
+    offset = (page - 1) * per_page
+
+    stmt = lambda_stmt(lambda: select(
+        loan_repayment.c.id, loan_repayment.c.loan_id, loan_repayment.c.amount_paid,
+        loan_repayment.c.date_paid, loan_repayment.c.status, loan_repayment.c.method,
+        loan_application.c.amount, loan_application.c.interest_rate,
+        investor.c.first_name, investor.c.surname,
+    ).join(loan_application, loan_application.c.id == loan_repayment.c.loan_id)
+     .join(investor, investor.c.id == loan_application.c.investor_id))
+    count = lambda_stmt(lambda: select(func.count()).select_from(loan_repayment))
+    if status:
+        stmt += lambda s: s.where(loan_repayment.c.status == status)
+        count += lambda s: s.where(loan_repayment.c.status == status)
+    stmt += lambda s: s.order_by(loan_repayment.c.date_paid.desc(), loan_repayment.c.id.desc()) \
+        .limit(per_page).offset(offset)
+    return _page(_rows(RepaymentRow, stmt), _count(count), page, per_page)
+
+
+# -------------------- Loans --------------------
+
+def investor_loans(investor_id, status=None):
+    """One investor's loan applications, newest first ('approved' includes overdue)."""
+    stmt = lambda_stmt(lambda: select(
+        loan_application.c.id, loan_application.c.investor_id, loan_application.c.full_name,
+        loan_application.c.amount, loan_application.c.purpose, loan_application.c.status,
+        loan_application.c.interest_rate, loan_application.c.submitted_at, loan_application.c.approved_at,
+        loan_application.c.repayment_due_date, loan_application.c.collateral,
+        loan_application.c.next_of_kin_details, loan_application.c.other_details,
+        loan_application.c.signed_documents,
+    ).where(loan_application.c.investor_id == investor_id))
+    if status:
+        statuses = matching_statuses(status, LOAN_ACTIVE_STATUSES)
+        stmt += lambda s: s.where(loan_application.c.status.in_(statuses))
+    stmt += lambda s: s.order_by(loan_application.c.submitted_at.desc())
+    return _rows(LoanRow, stmt)
+
+
+# -------------------- Investors --------------------
+
+def investors(approved=True, page=1, per_page=DEFAULT_PER_PAGE):
+    """One page of approved (or not yet approved) investors, newest first."""
+    page, per_page = _page_args(page, per_page)
+    offset = (page - 1) * per_page
+
+    stmt = lambda_stmt(lambda: select(
+        investor.c.id, investor.c.first_name, investor.c.surname, investor.c.username,
+        investor.c.email, investor.c.phone, investor.c.id_number, investor.c.address,
+        investor.c.next_of_kin, investor.c.phone_of_kin, investor.c.proof_of_residence,
+        investor.c.id_document, investor.c.face_photo, investor.c.is_approved,
+        investor.c.balance, investor.c.created_at,
+    ).where(investor.c.is_approved == approved)
+     .order_by(investor.c.created_at.desc(), investor.c.id.desc())
+     .limit(per_page).offset(offset))
+    count = lambda_stmt(lambda: select(func.count()).select_from(investor).where(investor.c.is_approved == approved))
+    return _page(_rows(InvestorRow, stmt), _count(count), page, per_page)
+
+
+# -------------------- Benchmark --------------------
+
+def _orm_investments():
+    return Investment.query.options(joinedload(Investment.investor)).all()
+
+
+def _orm_withdrawals():
+    return WithdrawalRequest.query \
+        .options(joinedload(WithdrawalRequest.investment).joinedload(Investment.investor)) \
+        .order_by(WithdrawalRequest.created_at.desc()) \
+        .paginate(page=1, per_page=DEFAULT_PER_PAGE, error_out=False).items
+
+
+def _orm_repayments():
+    return LoanRepayment.query \
+        .options(joinedload(LoanRepayment.loan).joinedload(LoanApplication.investor)) \
+        .order_by(LoanRepayment.date_paid.desc()) \
+        .paginate(page=1, per_page=DEFAULT_PER_PAGE, error_out=False).items
+
+
+def _orm_loans(investor_id):
+    return LoanApplication.query.filter_by(investor_id=investor_id) \
+        .order_by(LoanApplication.submitted_at.desc()).all()
+
+
+def _orm_investors():
+    return Investor.query.filter_by(is_approved=True).order_by(Investor.created_at.desc()) \
+        .paginate(page=1, per_page=DEFAULT_PER_PAGE, error_out=False).items
+
+
+def _measure(fn, repeat):
+    """(median ms, peak KiB allocated) for `fn`, starting each run from an empty identity map."""
+    timings, peaks = [], []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    for _ in range(min(repeat, 5)):
+        db.session.expunge_all()
+        tracemalloc.start()
+        fn()
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    return statistics.median(timings), statistics.median(peaks)
+
+
+def benchmark(repeat=20):
+    """
+    Time every read model against the ORM load it replaces, on the current
+    database. Returns one dict per case with rows, median latency (ms) and
+    peak allocation (KiB) for both paths.
+    """
+    busiest = db.session.execute(
+        select(loan_application.c.investor_id).group_by(loan_application.c.investor_id)
+        .order_by(func.count().desc()).limit(1)
+    ).scalar()
+    cases = [
+        ('investments', _orm_investments, investments),
+        ('withdrawals', _orm_withdrawals, lambda: withdrawals().items),
+        ('repayments', _orm_repayments, lambda: repayments().items),
+        ('loans', lambda: _orm_loans(busiest), lambda: investor_loans(busiest)),
+        ('investors', _orm_investors, lambda: investors().items),
+    ]
+    results = []
+    for name, orm_fn, core_fn in cases:
+        core_fn()  # the first call builds and compiles the lambda statements
+        orm_fn()
+        orm_ms, orm_kib = _measure(orm_fn, repeat)
+        core_ms, core_kib = _measure(core_fn, repeat)
+        results.append({
+            'case': name,
+            'rows': len(core_fn()),
+            'orm_ms': round(orm_ms, 3),
+            'core_ms': round(core_ms, 3),
+            'speedup': round(orm_ms / core_ms, 2) if core_ms else None,
+            'orm_peak_kib': round(orm_kib, 1),
+            'core_peak_kib': round(core_kib, 1),
+        })
+    db.session.expunge_all()
+    return results
@@ -0,0 +1,305 @@
+"""
+Replay captured traffic (see capture.py) against a running instance.
+
+Records are re-issued over HTTP in their captured order and spacing,
+divided by `speed`, from a pool of `concurrency` threads. The target
+should be a local instance seeded with synthetic data (synthetic.py):
+captured users are mapped onto local ones, the busiest captured
+investors onto the local investors with the most investments, and the
+':<kind>' id markers are filled with ids from the local tables (the
+user's own rows for investor requests). Uploads are replayed with files
+of the captured size.
+
+The report compares replayed with captured latency per route (p50/p95
+and their ratio), counts status mismatches and shows how far the
+replayer fell behind its schedule (`lag`), which is the sign that more
+concurrency is needed to reproduce the captured rate.
+"""
+import glob
+import http.client
+import json
+import os
+import random
+import ssl
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+from flask import current_app
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func, select
+
+from capture import id_kind
+from models import db, AdminUser, Investment, Investor, LoanApplication, LoanRepayment, WithdrawalRequest
+
+MODELS = {
+    'investor': Investor,
+    'investment': Investment,
+    'loan': LoanApplication,
+    'repayment': LoanRepayment,
+    'withdrawal': WithdrawalRequest,
+}
+OWNED = {'investment': Investment, 'loan': LoanApplication, 'withdrawal': WithdrawalRequest}
+POOL_SIZE = 10_000
+READ_METHODS = ('GET', 'HEAD')
+
+
+def load(path, start=None, end=None):
+    """Records from a capture file or directory, oldest first; `start`/`end` are naive UTC datetimes."""
+    start = start.replace(tzinfo=timezone.utc).timestamp() if start else None
+    end = end.replace(tzinfo=timezone.utc).timestamp() if end else None
+    paths = sorted(glob.glob(os.path.join(path, 'capture-*.jsonl'))) if os.path.isdir(path) else [path]
+    records = []
+    for name in paths:
+        with open(name) as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get('r') and (start is None or record['t'] >= start) and (end is None or record['t'] < end):
+                    records.append(record)
+    records.sort(key=lambda r: r['t'])
+    return records
+
+
+# -------------------- Local users and ids --------------------
+
+class _Local:
+    """Captured users and id markers mapped onto the local database."""
+
+    def __init__(self, records, seed):
+        self.rng = random.Random(seed)
+        self.pools = {
+            kind: db.session.scalars(select(model.id).order_by(model.id.desc()).limit(POOL_SIZE)).all()
+            for kind, model in MODELS.items()
+        }
+        self.owned = {}
+        admin = db.session.execute(select(AdminUser.id, AdminUser.email).order_by(AdminUser.id).limit(1)).first()
+
+        # Busiest captured investors get the local investors with the most investments
+        activity = Counter(tuple(r['u']) for r in records if r.get('u'))
+        investors = db.session.execute(
+            select(Investor.id, Investor.email)
+            .join(Investment, Investment.investor_id == Investor.id)
+            .where(Investor.is_approved.is_(True))
+            .group_by(Investor.id, Investor.email)
+            .order_by(func.count().desc(), Investor.id)
+            .limit(sum(1 for role, _ in activity if role == 'investor'))
+        ).all()
+        self.users = {}
+        mapped_investors = 0
+        for user, _ in activity.most_common():
+            role = user[0]
+            if role == 'admin' and admin is not None:
+                self.users[user] = (role, admin.id, admin.email)
+            elif role == 'investor' and investors:
+                inv_id, email = investors[mapped_investors % len(investors)]
+                self.users[user] = (role, inv_id, email)
+                mapped_investors += 1
+
+        cookie_name = current_app.config.get('JWT_ACCESS_COOKIE_NAME', 'access_token_cookie')
+        self.cookies = {
+            user: f'{cookie_name}=' + create_access_token(
+                identity=str(local_id), additional_claims={'role': role, 'email': email},
+                expires_delta=timedelta(hours=12),
+            )
+            for user, (role, local_id, email) in self.users.items()
+        }
+
+    def investor_of(self, user):
+        local = self.users.get(tuple(user)) if user else None
+        return local[1] if local and local[0] == 'investor' else None
+
+    def pick(self, kind, investor_id=None):
+        if investor_id is not None and kind == 'investor':
+            return investor_id
+        if investor_id is not None and kind in OWNED:
+            key = (kind, investor_id)
+            if key not in self.owned:
+                model = OWNED[kind]
+                self.owned[key] = db.session.scalars(
+                    select(model.id).where(model.investor_id == investor_id).limit(POOL_SIZE)
+                ).all()
+            if self.owned[key]:
+                return self.rng.choice(self.owned[key])
+        pool = self.pools.get(kind)
+        return self.rng.choice(pool) if pool else 1
+
+    def fill(self, value, investor_id):
+        """Replace ':<kind>' markers in a redacted value with local ids."""
+        if isinstance(value, dict):
+            return {k: self.fill(v, investor_id) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.fill(v, investor_id) for v in value]
+        if isinstance(value, str) and value.startswith(':') and value[1:].isidentifier():
+            return self.pick(value[1:], investor_id)
+        return value
+
+
+# -------------------- Requests --------------------
+
+def _multipart(form, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in form.items():
+        for item in value if isinstance(value, list) else [value]:
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{item}\r\n'.encode())
+    for name, (size, ext) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="replay{ext}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + b'\0' * size + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def prepare(record, local, rules):
+    """(method, path, body, headers) for a record, or None when its route no longer exists."""
+    rule = rules.get((record['r'], record['m']))
+    if rule is None:
+        return None
+    investor_id = local.investor_of(record.get('u'))
+    args = {}
+    for name, value in record.get('a', {}).items():
+        kind = id_kind(name)
+        args[name] = local.pick(kind, investor_id) if kind else value
+    path = rule.build(args, append_unknown=False)[1]
+    query = local.fill(record.get('q') or {}, investor_id)
+    if query:
+        path += '?' + urlencode(query, doseq=True)
+
+    headers = {'X-Request-ID': f'replay-{uuid.uuid4().hex[:16]}'}
+    cookie = local.cookies.get(tuple(record['u'])) if record.get('u') else None
+    if cookie:
+        headers['Cookie'] = cookie
+    body = None
+    shape = record.get('b') or {}
+    if 'json' in shape:
+        body = json.dumps(local.fill(shape['json'], investor_id)).encode()
+        headers['Content-Type'] = 'application/json'
+    elif 'form' in shape:
+        form = local.fill(shape['form'], investor_id)
+        if shape.get('files'):
+            body, headers['Content-Type'] = _multipart(form, shape['files'])
+        else:
+            body = urlencode(form, doseq=True).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    return record['m'], path, body, headers
+
+
+class _Connections(threading.local):
+    """One keep-alive connection per replay thread."""
+
+    def __init__(self, target):
+        url = urlsplit(target)
+        if url.scheme == 'https':
+            self.conn = http.client.HTTPSConnection(url.hostname, url.port or 443, timeout=60,
+                                                    context=ssl._create_unverified_context())
+        else:
+            self.conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+
+    def send(self, method, path, body, headers):
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()  # reconnects on the next request
+            return 0
+
+
+# -------------------- Replay --------------------
+
+def run(app, records, target, speed=1.0, concurrency=8, reads_only=False, seed=0, progress=None):
+    """Replay `records` against `target` (e.g. https://127.0.0.1:5000). Call inside an app context."""
+    progress = progress or (lambda message: None)
+    if reads_only:
+        records = [r for r in records if r['m'] in READ_METHODS]
+    if not records:
+        raise ValueError('Nothing to replay')
+    local = _Local(records, seed)
+    rules = {(rule.rule, method): rule for rule in app.url_map.iter_rules() for method in rule.methods}
+    prepared = [(record, prepare(record, local, rules)) for record in records]
+    skipped = sum(1 for _, req in prepared if req is None)
+    db.session.remove()
+
+    connections = _Connections(target)
+    results = []
+    results_lock = threading.Lock()
+
+    def issue(record, req, scheduled):
+        started = time.perf_counter()
+        status = connections.send(*req)
+        latency = (time.perf_counter() - started) * 1000
+        with results_lock:
+            results.append((record, status, latency, (started - scheduled) * 1000))
+
+    first = records[0]['t']
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='replay') as pool:
+        for i, (record, req) in enumerate(prepared):
+            if req is None:
+                continue
+            scheduled = begin + (record['t'] - first) / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(issue, record, req, scheduled)
+            if (i + 1) % 1000 == 0:
+                progress(f'issued {i + 1}/{len(prepared)}')
+    elapsed = time.perf_counter() - begin
+    return report(results, skipped, elapsed, speed, concurrency, target)
+
+
+def _percentiles(values):
+    p50, p95 = np.percentile(values, (50, 95))
+    return round(float(p50), 2), round(float(p95), 2)
+
+
+def report(results, skipped, elapsed, speed, concurrency, target):
+    """Per-route captured vs replayed latency, status mismatches and schedule lag."""
+    by_route = defaultdict(list)
+    for record, status, latency, lag in results:
+        by_route[(record['m'], record['r'])].append((record, status, latency))
+
+    routes = []
+    for (method, rule), rows in by_route.items():
+        captured_p50, captured_p95 = _percentiles([r['d'] for r, _, _ in rows])
+        replayed_p50, replayed_p95 = _percentiles([latency for _, _, latency in rows])
+        routes.append({
+            'method': method,
+            'route': rule,
+            'count': len(rows),
+            'captured_p50_ms': captured_p50,
+            'captured_p95_ms': captured_p95,
+            'replayed_p50_ms': replayed_p50,
+            'replayed_p95_ms': replayed_p95,
+            'p50_ratio': round(replayed_p50 / captured_p50, 2) if captured_p50 else None,
+            'p95_ratio': round(replayed_p95 / captured_p95, 2) if captured_p95 else None,
+            'status_mismatches': sum(1 for r, status, _ in rows if status != r['s']),
+            'errors': sum(1 for _, status, _ in rows if status == 0),
+        })
+    routes.sort(key=lambda r: r['p95_ratio'] or 0, reverse=True)
+
+    lags = [lag for _, _, _, lag in results] or [0.0]
+    return {
+        'target': target,
+        'speed': speed,
+        'concurrency': concurrency,
+        'requests': len(results),
+        'skipped': skipped,
+        'elapsed_s': round(elapsed, 2),
+        'lag_ms': {'p50': round(float(np.percentile(lags, 50)), 2),
+                   'p95': round(float(np.percentile(lags, 95)), 2),
+                   'max': round(float(max(lags)), 2)},
+        'routes': routes,
+    }
+
+
+def save(result, path):
+    with open(path, 'w') as fh:
+        json.dump(result, fh, indent=2)
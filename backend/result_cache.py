@@ -0,0 +1,268 @@
+"""
+Result cache for expensive read endpoints.
+
+Cache keys include the versions of the tables a response reads (see
+versions.py), so any committed write to those tables invalidates the
+entry everywhere at once; TTL bounds staleness from time-dependent
+output and LRU eviction bounds size. Concurrent misses for the same key
+are coalesced: one request computes, the others wait for its result —
+within a process through an in-flight table, across processes through a
+lease row in the shared backend.
+
+Backends (RESULT_CACHE_BACKEND):
+    memory   per-process OrderedDict
+    sqlite   a local SQLite file (RESULT_CACHE_PATH) shared by every worker
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import Response, current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+import versions
+
+DEFAULT_TTL = 60
+MAX_ENTRIES = 512
+FLIGHT_TIMEOUT = 30.0
+POLL_SECONDS = 0.05
+
+_backend = None
+_backend_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+
+# -------------------- Backends --------------------
+
+class MemoryBackend:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def acquire(self, key, timeout):
+        return True  # coalescing inside one process is done by the in-flight table
+
+    def release(self, key):
+        pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """Entries and in-flight leases in one SQLite file, so every worker process shares them."""
+
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript('''
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS cache_entry (
+                    key TEXT PRIMARY KEY, value BLOB NOT NULL,
+                    expires_at REAL NOT NULL, last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_cache_entry_last_used ON cache_entry (last_used);
+                CREATE TABLE IF NOT EXISTS cache_flight (key TEXT PRIMARY KEY, expires_at REAL NOT NULL);
+            ''')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            'SELECT value FROM cache_entry WHERE key = ? AND expires_at >= ?', (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute('UPDATE cache_entry SET last_used = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entry (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)',
+                (key, value, now + ttl, now),
+            )
+            conn.execute('DELETE FROM cache_entry WHERE expires_at < ?', (now,))
+            conn.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                ' SELECT key FROM cache_entry ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,),
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def acquire(self, key, timeout):
+        """Take the compute lease for `key`; False if another live process holds it."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('DELETE FROM cache_flight WHERE key = ? AND expires_at < ?', (key, now))
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO cache_flight (key, expires_at) VALUES (?, ?)', (key, now + timeout)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, key):
+        self._connect().execute('DELETE FROM cache_flight WHERE key = ?', (key,))
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('DELETE FROM cache_entry')
+        conn.execute('DELETE FROM cache_flight')
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            config = current_app.config
+            max_entries = config.get('RESULT_CACHE_MAX_ENTRIES', MAX_ENTRIES)
+            if config.get('RESULT_CACHE_BACKEND', 'memory') == 'sqlite':
+                _backend = SQLiteBackend(config['RESULT_CACHE_PATH'], max_entries)
+            else:
+                _backend = MemoryBackend(max_entries)
+        return _backend
+
+
+def stats():
+    return dict(_stats)
+
+
+# -------------------- Single-flight lookups --------------------
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+def get_or_compute(key, compute, ttl=DEFAULT_TTL):
+    """
+    Return the cached bytes for `key`, or run `compute()` once for all
+    concurrent callers and cache its result. `compute` may return None to
+    skip caching (e.g. error responses); waiters then compute their own.
+    """
+    backend = get_backend()
+    value = backend.get(key)
+    if value is not None:
+        _stats['hits'] += 1
+        return value
+
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+    if not leader:
+        _stats['coalesced'] += 1
+        flight.done.wait(FLIGHT_TIMEOUT)
+        return flight.value if flight.value is not None else compute()
+
+    try:
+        flight.value = _compute_shared(backend, key, compute, ttl)
+        return flight.value
+    finally:
+        flight.done.set()
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _compute_shared(backend, key, compute, ttl):
+    # Another process may already be computing this key; wait for its result instead
+    deadline = time.monotonic() + FLIGHT_TIMEOUT
+    acquired = backend.acquire(key, FLIGHT_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        value = backend.get(key)
+        if value is not None:
+            _stats['coalesced'] += 1
+            return value
+        acquired = backend.acquire(key, FLIGHT_TIMEOUT)
+    try:
+        _stats['misses'] += 1
+        value = compute()
+        if value is not None:
+            backend.set(key, value, ttl)
+        return value
+    finally:
+        if acquired:
+            backend.release(key)
+
+
+# -------------------- Endpoint decorator --------------------
+
+def cached(*models, ttl=DEFAULT_TTL, per_user=False):
+    """
+    Cache a GET endpoint's 200 responses, keyed by path, query parameters,
+    date and the versions of `models`' tables. Goes below the auth decorators.
+    """
+    names = [m.__tablename__ for m in models]
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            state = (
+                request.path,
+                sorted(request.args.items(multi=True)),
+                get_jwt_identity() if per_user else None,
+                date.today().isoformat(),
+                sorted(versions.current(names).items()),
+            )
+            key = hashlib.blake2b(repr(state).encode(), digest_size=16).hexdigest()
+            response = None
+
+            def compute():
+                nonlocal response
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return None
+                return response.mimetype.encode() + b'\n' + response.get_data()
+
+            value = get_or_compute(key, compute, ttl)
+            if value is None:
+                return response
+            mimetype, _, body = value.partition(b'\n')
+            return Response(body, status=200, mimetype=mimetype.decode())
+        return wrapper
+    return decorator
@@ -0,0 +1,325 @@
+"""
+In-process job scheduler.
+
+Every worker runs a small background thread that wakes up each
+POLL_SECONDS and checks the registered jobs against their cron
+schedules. Before running a job for a given minute the worker has to
+claim that job's SchedulerLock row with a conditional UPDATE, so exactly
+one worker runs each scheduled slot no matter how many are up.
+
+Jobs are set-based: they move rows with single UPDATE statements and
+insert notifications with INSERT ... SELECT rather than loading objects.
+"""
+import os
+import socket
+import threading
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import String, cast, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+
+import approval_queue
+import ledger
+import valuation
+from models import (
+    db,
+    Investment,
+    LoanApplication,
+    Notification,
+    SchedulerLock,
+    INVESTMENT_ACTIVE_STATUSES,
+    LOAN_ACTIVE_STATUSES
+)
+
+POLL_SECONDS = 20
+LEASE = timedelta(minutes=30)
+REMINDER_DAYS_BEFORE_WINDOW = 3
+
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+_jobs = {}
+_thread = None
+_stop = threading.Event()
+
+
+# -------------------- Cron schedules --------------------
+
+class Cron:
+    """Five-field cron expression (minute hour day month weekday) with *, lists, ranges and steps."""
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f'Invalid cron expression: {expr!r}')
+        self.expr = expr
+        self.fields = [self._parse(f, lo, hi) for f, (lo, hi) in zip(fields, self.RANGES)]
+
+    @staticmethod
+    def _parse(field, lo, hi):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step = part.split('/')
+                step = int(step)
+            if part == '*':
+                start, end = lo, hi
+            elif '-' in part:
+                start, end = map(int, part.split('-'))
+            else:
+                start = end = int(part)
+            values.update(range(start, end + 1, step))
+        return values
+
+    def matches(self, dt):
+        minute, hour, day, month, weekday = self.fields
+        # cron counts Sunday as 0, Python's weekday() counts Monday as 0
+        return (dt.minute in minute and dt.hour in hour and dt.day in day
+                and dt.month in month and (dt.weekday() + 1) % 7 in weekday)
+
+
+def job(name, schedule):
+    """Register a function as a scheduled job."""
+    def decorator(fn):
+        _jobs[name] = (Cron(schedule), fn)
+        return fn
+    return decorator
+
+
+def registered_jobs():
+    return {name: cron.expr for name, (cron, _) in _jobs.items()}
+
+
+# -------------------- Leader election --------------------
+
+def _claim(name, slot):
+    """Try to become the worker that runs `name` for `slot`. Commits."""
+    try:
+        if db.session.get(SchedulerLock, name) is None:
+            db.session.add(SchedulerLock(name=name))
+            db.session.commit()
+    except IntegrityError:
+        db.session.rollback()  # another worker created it first
+
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(SchedulerLock)
+        .where(
+            SchedulerLock.name == name,
+            (SchedulerLock.last_run_at.is_(None)) | (SchedulerLock.last_run_at < slot),
+            (SchedulerLock.locked_until.is_(None)) | (SchedulerLock.locked_until < now),
+        )
+        .values(holder=WORKER_ID, locked_until=now + LEASE, last_run_at=slot)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _release(name, duration_ms, outcome):
+    db.session.execute(
+        update(SchedulerLock)
+        .where(SchedulerLock.name == name, SchedulerLock.holder == WORKER_ID)
+        .values(locked_until=None, last_duration_ms=duration_ms, last_result=str(outcome)[:255])
+    )
+    db.session.commit()
+
+
+def run_job(name, slot=None, logger=None):
+    """Claim and run one job; returns its result, or None if another worker holds it."""
+    _, fn = _jobs[name]
+    slot = slot or datetime.utcnow().replace(second=0, microsecond=0)
+    if not _claim(name, slot):
+        return None
+
+    started = perf_counter()
+    try:
+        outcome = fn()
+    except Exception as exc:
+        db.session.rollback()
+        outcome = f'failed: {exc}'
+        if logger:
+            logger.exception('Scheduled job %s failed', name)
+    duration_ms = round((perf_counter() - started) * 1000, 1)
+    _release(name, duration_ms, outcome)
+    if logger:
+        logger.info('Scheduled job %s finished in %sms: %s', name, duration_ms, outcome)
+    return outcome
+
+
+def _loop(app):
+    last_slot = None
+    while not _stop.is_set():
+        slot = datetime.utcnow().replace(second=0, microsecond=0)
+        if slot != last_slot:
+            last_slot = slot
+            for name, (cron, _) in list(_jobs.items()):
+                if cron.matches(slot):
+                    with app.app_context():
+                        try:
+                            run_job(name, slot, app.logger)
+                        except Exception:
+                            app.logger.exception('Scheduler could not run %s', name)
+                        finally:
+                            db.session.remove()
+        _stop.wait(POLL_SECONDS)
+
+
+def start(app):
+    """Start the scheduler thread for this worker (idempotent)."""
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _stop.clear()
+        _thread = threading.Thread(target=_loop, args=(app,), name='scheduler', daemon=True)
+        _thread.start()
+    return _thread
+
+
+def stop(timeout=None):
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
+
+
+# -------------------- Lifecycle sweeps --------------------
+
+@job('fill_maturity_dates', '0 * * * *')
+def fill_maturity_dates():
+    """Store maturity_date for approved investments that predate the column."""
+    rows = db.session.execute(
+        select(Investment.id, Investment.approved_at, Investment.duration_months)
+        .where(Investment.maturity_date.is_(None), Investment.approved_at.isnot(None))
+    ).all()
+    if rows:
+        db.session.execute(update(Investment), [
+            {'id': inv_id, 'maturity_date': Investment.maturity_for(approved_at, months)}
+            for inv_id, approved_at, months in rows
+        ])
+    db.session.commit()
+    return {'filled': len(rows)}
+
+
+@job('mark_matured_investments', '5 0 * * *')
+def mark_matured_investments(today=None):
+    """Move approved investments whose term has ended to 'matured' and notify their investors."""
+    today = today or date.today()
+    fill_maturity_dates()
+
+    due = (Investment.status == 'approved') & (Investment.maturity_date <= today)
+    notified = db.session.execute(
+        insert(Notification).from_select(
+            ['investor_id', 'message', 'date', 'read'],
+            select(
+                Investment.investor_id,
+                literal('Investment ') + cast(Investment.id, String)
+                + literal(' has matured and can be withdrawn in the next window'),
+                literal(datetime.utcnow()),
+                literal(False),
+            ).where(due),
+        )
+    ).rowcount
+    matured = db.session.execute(
+        update(Investment)
+        .where(due)
+        .values(status='matured', version=Investment.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return {'matured': matured, 'notified': notified}
+
+
+@job('mark_overdue_loans', '10 0 * * *')
+def mark_overdue_loans(now=None):
+    """Move approved loans past their repayment due date to 'overdue' and notify the borrowers."""
+    now = now or datetime.utcnow()
+    due = (LoanApplication.status == 'approved') & (LoanApplication.repayment_due_date < now)
+    notified = db.session.execute(
+        insert(Notification).from_select(
+            ['investor_id', 'message', 'date', 'read'],
+            select(
+                LoanApplication.investor_id,
+                literal('Loan ') + cast(LoanApplication.id, String)
+                + literal(' is overdue, please submit your repayment'),
+                literal(now),
+                literal(False),
+            ).where(due, LoanApplication.investor_id.isnot(None)),
+        )
+    ).rowcount
+    overdue = db.session.execute(
+        update(LoanApplication)
+        .where(due)
+        .values(status='overdue', version=LoanApplication.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return {'overdue': overdue, 'notified': notified}
+
+
+@job('window_reminders', f'0 8 {28 - REMINDER_DAYS_BEFORE_WINDOW} * *')
+def window_reminders(today=None):
+    """
+    A few days before the 28th, remind investors whose investments will be
+    withdrawable in the coming window and borrowers with repayments due in it.
+    Each run covers the month since the previous window closed, so every
+    investment and loan is reminded once rather than every month after.
+    """
+    today = today or date.today()
+    window_end = (today + relativedelta(months=1)).replace(day=8)
+    window_start = window_end - relativedelta(months=1)  # the previous run's window_end
+    sent_at = datetime.utcnow()
+
+    investments = db.session.execute(
+        insert(Notification).from_select(
+            ['investor_id', 'message', 'date', 'read'],
+            select(
+                Investment.investor_id,
+                literal('Reminder: the withdrawal window opens on the 28th. Investment ')
+                + cast(Investment.id, String) + literal(' can be withdrawn'),
+                literal(sent_at),
+                literal(False),
+            ).where(
+                Investment.status.in_(INVESTMENT_ACTIVE_STATUSES),
+                Investment.maturity_date > window_start,
+                Investment.maturity_date <= window_end,
+            ),
+        )
+    ).rowcount
+    loans = db.session.execute(
+        insert(Notification).from_select(
+            ['investor_id', 'message', 'date', 'read'],
+            select(
+                LoanApplication.investor_id,
+                literal('Reminder: repayment for loan ') + cast(LoanApplication.id, String)
+                + literal(' is due before the window closes on the 8th'),
+                literal(sent_at),
+                literal(False),
+            ).where(
+                LoanApplication.status.in_(LOAN_ACTIVE_STATUSES),
+                LoanApplication.investor_id.isnot(None),
+                LoanApplication.repayment_due_date > datetime.combine(window_start, time.max),
+                LoanApplication.repayment_due_date <= datetime.combine(window_end, time.max),
+            ),
+        )
+    ).rowcount
+    db.session.commit()
+    return {'investment_reminders': investments, 'loan_reminders': loans}
+
+
+@job('ledger_snapshot', '30 0 * * *')
+def ledger_snapshot():
+    return {'snapshots': ledger.take_snapshots()}
+
+
+@job('value_investments', '45 0 * * *')
+def value_investments():
+    return {'valued': valuation.value_investments()}
+
+
+@job('apply_queued_approvals', '0 * 28-31,1-8 * *')
+def apply_queued_approvals():
+    """Apply approvals queued outside the window; runs at midnight on the 28th, then hourly while it is open."""
+    if not approval_queue.window_is_open():
+        return {'skipped': 'window closed'}
+    return approval_queue.apply_queued()
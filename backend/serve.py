@@ -0,0 +1,308 @@
+"""
+Production server: prefork worker processes, each serving from a pool
+of threads.
+
+    python serve.py --bind 127.0.0.1:5000 --workers 4 --threads 8 \\
+                    --certfile cert.pem --keyfile key.pem
+
+The master imports the app once and opens the listening socket, then
+forks the workers, so the loaded code and data are shared copy-on-write.
+Each worker accepts on the shared socket, hands connections to its
+threads (and stops accepting while all of them are busy, leaving the
+connection to an idle worker), and runs the scheduler and withdrawal
+intake threads; both take database locks or leases, so every worker can
+run them. The schema is not touched here: run `flask --app app init-db`
+once per deploy.
+
+Signals to the master:
+    TERM, INT   graceful stop: workers stop accepting, finish in-flight
+                requests within --graceful-timeout, stop the scheduler and
+                intake threads and flush the log, metrics and capture
+                buffers; stragglers are killed
+    HUP         restart the workers: a new set starts before the old one
+                is stopped gracefully
+    USR2        upgrade: start a new master from the code on disk on the
+                same socket; it stops this one once its workers are up
+    TTIN, TTOU  one worker more / fewer
+Workers that die are replaced. Every option can also be set in the
+environment (SERVE_BIND, SERVE_WORKERS, SERVE_THREADS, ...).
+"""
+import argparse
+import atexit
+import os
+import select
+import signal
+import socket
+import ssl
+import subprocess
+import sys
+import threading
+import time
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+LISTEN_FD = 'SERVE_LISTEN_FD'
+PARENT_PID = 'SERVE_PARENT_PID'
+
+
+# -------------------- Worker --------------------
+
+class _Handler(WSGIRequestHandler):
+    def log_request(self, code='-', size='-'):
+        pass  # logs.py writes the access log
+
+
+class _Server(BaseWSGIServer):
+    """Werkzeug server handing connections to at most `threads` threads."""
+
+    multithread = True  # turns on HTTP/1.1 keep-alive in the handler
+
+    def __init__(self, app, sock, threads, ssl_context):
+        super().__init__(sock.getsockname()[0], 0, app, handler=_Handler, fd=sock.fileno())
+        self.socket.setblocking(False)  # another worker may win the accept
+        if ssl_context is not None:
+            # Handshakes happen on the request thread, not in the accept loop
+            self.socket = ssl_context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+            self.ssl_context = ssl_context
+        self.slots = threading.BoundedSemaphore(threads)
+        self.threads = threads
+
+    def get_request(self):
+        conn, addr = self.socket.accept()
+        conn.setblocking(True)
+        return conn, addr
+
+    def process_request(self, request, client_address):
+        self.slots.acquire()  # blocks accepting while every thread is busy
+        threading.Thread(target=self._handle, args=(request, client_address), daemon=True).start()
+
+    def _handle(self, request, client_address):
+        try:
+            request.settimeout(self.RequestHandlerClass.timeout)
+            if isinstance(request, ssl.SSLSocket):
+                request.do_handshake()
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionError, ssl.SSLError, socket.timeout)):
+            super().handle_error(request, client_address)
+
+    def drain(self, timeout):
+        """Wait until in-flight requests finish; False if `timeout` ran out first."""
+        deadline = time.monotonic() + timeout
+        for _ in range(self.threads):
+            if not self.slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                return False
+        return True
+
+
+def _run_worker(app, sock, options, ssl_context):
+    """Body of a forked worker; never returns."""
+    import intake
+    import scheduler
+    from models import db
+
+    status = 0
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        for sig in (signal.SIGINT, signal.SIGHUP, signal.SIGUSR2, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_IGN)  # the master decides
+        # Pooled connections opened by the master must not be shared with it
+        with app.app_context():
+            db.engine.dispose(close=False)
+        if intake._engine is not None:
+            intake._engine.dispose(close=False)
+
+        _Handler.timeout = options.keep_alive
+        server = _Server(app, sock, options.threads, ssl_context)
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+        scheduler.start(app)
+        intake.start(app)
+
+        server.serve_forever(poll_interval=0.5)  # until SIGTERM
+        if not server.drain(options.graceful_timeout):
+            app.logger.warning('Worker %s stopped with requests still running', os.getpid())
+        scheduler.stop(options.graceful_timeout)
+        intake.stop(options.graceful_timeout)
+    except BaseException:
+        status = 1
+        sys.excepthook(*sys.exc_info())
+    finally:
+        atexit._run_exitfuncs()  # flush logs, metrics and capture buffers
+        os._exit(status)
+
+
+# -------------------- Master --------------------
+
+class Master:
+    def __init__(self, app, sock, options, ssl_context):
+        self.app = app
+        self.sock = sock
+        self.options = options
+        self.ssl_context = ssl_context
+        self.size = options.workers
+        self.generation = 0
+        self.workers = {}   # pid -> generation
+        self.retiring = set()
+        self.signals = []
+        self.stopping = False
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)  # the loop drains it after select() times out too
+        os.set_blocking(self._wake_w, False)
+
+    def log(self, message, *args):
+        self.app.logger.info('[master %s] ' + message, os.getpid(), *args)
+
+    def _on_signal(self, sig, frame):
+        self.signals.append(sig)
+        try:
+            os.write(self._wake_w, b'.')
+        except BlockingIOError:
+            pass
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            _run_worker(self.app, self.sock, self.options, self.ssl_context)
+        self.workers[pid] = self.generation
+        return pid
+
+    def stop_workers(self, pids, sig=signal.SIGTERM):
+        for pid in pids:
+            if sig == signal.SIGTERM:
+                if pid in self.retiring:
+                    continue
+                self.retiring.add(pid)
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation = self.workers.pop(pid, None)
+            self.retiring.discard(pid)
+            if generation == self.generation and not self.stopping and status:
+                self.log('worker %s exited with status %s; replacing it', pid, os.waitstatus_to_exitcode(status))
+
+    def maintain(self):
+        """Bring the current generation to `size` workers and retire extra ones."""
+        current = [pid for pid, gen in self.workers.items() if gen == self.generation and pid not in self.retiring]
+        for _ in range(self.size - len(current)):
+            self.spawn()
+        if len(current) > self.size:
+            self.stop_workers(sorted(current)[self.size:])
+
+    def handle(self, sig):
+        if sig in (signal.SIGTERM, signal.SIGINT):
+            self.stopping = True
+        elif sig == signal.SIGHUP:
+            old = list(self.workers)
+            self.generation += 1
+            self.maintain()
+            self.log('restarted workers (generation %s)', self.generation)
+            self.stop_workers(old)
+        elif sig == signal.SIGUSR2:
+            self.upgrade()
+        elif sig == signal.SIGTTIN:
+            self.size += 1
+        elif sig == signal.SIGTTOU and self.size > 1:
+            self.size -= 1
+
+    def upgrade(self):
+        env = dict(os.environ, **{LISTEN_FD: str(self.sock.fileno()), PARENT_PID: str(os.getpid())})
+        child = subprocess.Popen([sys.executable, *sys.argv], env=env, pass_fds=(self.sock.fileno(),))
+        self.log('started new master %s from the code on disk', child.pid)
+
+    def run(self):
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR2, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, self._on_signal)
+        self.maintain()
+        self.log('serving on %s with %s workers x %s threads',
+                 self.sock.getsockname(), self.size, self.options.threads)
+        if os.environ.get(PARENT_PID):
+            os.kill(int(os.environ[PARENT_PID]), signal.SIGTERM)  # the old master drains and exits
+
+        while not self.stopping:
+            select.select([self._wake_r], [], [], 1.0)
+            try:
+                os.read(self._wake_r, 1024)
+            except BlockingIOError:
+                pass
+            while self.signals:
+                self.handle(self.signals.pop(0))
+            self.reap()
+            if not self.stopping:
+                self.maintain()
+
+        self.log('stopping %s workers', len(self.workers))
+        self.stop_workers(list(self.workers))
+        deadline = time.monotonic() + self.options.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        self.stop_workers(list(self.workers), signal.SIGKILL)
+        self.reap()
+
+
+# -------------------- Entry point --------------------
+
+def _listen(bind, backlog):
+    if LISTEN_FD in os.environ:  # upgraded master: reuse the old master's socket
+        return socket.socket(fileno=int(os.environ.pop(LISTEN_FD)))
+    host, _, port = bind.rpartition(':')
+    sock = socket.create_server((host.strip('[]') or '0.0.0.0', int(port)), backlog=backlog,
+                                family=socket.AF_INET6 if ':' in host else socket.AF_INET)
+    sock.set_inheritable(True)
+    return sock
+
+
+def parse_args(argv=None):
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description='Serve the AC Finance API with prefork workers.')
+    parser.add_argument('--bind', default=env('SERVE_BIND', '127.0.0.1:5000'), help='host:port to listen on')
+    parser.add_argument('--workers', type=int, default=int(env('SERVE_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int, default=int(env('SERVE_THREADS', 8)), help='threads per worker')
+    parser.add_argument('--backlog', type=int, default=int(env('SERVE_BACKLOG', 1024)))
+    parser.add_argument('--keep-alive', type=float, default=float(env('SERVE_KEEP_ALIVE', 5)),
+                        help='seconds an idle connection (or a stalled read) may hold a thread')
+    parser.add_argument('--graceful-timeout', type=float, default=float(env('SERVE_GRACEFUL_TIMEOUT', 30)),
+                        help='seconds workers get to finish in-flight requests when stopping')
+    parser.add_argument('--certfile', default=env('SERVE_CERTFILE'))
+    parser.add_argument('--keyfile', default=env('SERVE_KEYFILE'))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    ssl_context = None
+    if options.certfile:
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ssl_context.load_cert_chain(options.certfile, options.keyfile)
+
+    sock = _listen(options.bind, options.backlog)
+    upgrading = PARENT_PID in os.environ
+
+    from app import app  # preload: workers inherit the imported app
+    import metrics
+
+    if app.config.get('METRICS_DIR') and not upgrading:
+        metrics.clear_dir(app.config['METRICS_DIR'])
+    Master(app, sock, options, ssl_context).run()
+
+
+if __name__ == '__main__':
+    main()
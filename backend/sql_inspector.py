@@ -0,0 +1,276 @@
+"""
+SQL inspector for development and staging (SQL_INSPECT=1).
+
+Records every statement a request runs, groups them by normalized text
+(literals and bound values replaced by ?, IN lists collapsed) and flags
+SELECTs repeated SQL_N_PLUS_ONE_THRESHOLD or more times with different
+parameters — the per-row `Investor.query.get` shape of an N+1. Statements
+slower than SQL_SLOW_MS are logged with their query plan, in or outside
+requests.
+
+Each inspected response carries an X-SQL-Summary header and an
+X-SQL-Report id; the full JSON report is kept for the last
+SQL_REPORTS_KEPT requests (see the /api/admin/sql-reports endpoints).
+With SQL_REPORTS_DIR set, reports are files there that every worker
+reads and writes; without it each process keeps its own ring, so under
+serve.py with more than one worker a report id usually reaches a worker
+that doesn't have it.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from uuid import uuid4
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_SLOW_MS = 100
+DEFAULT_THRESHOLD = 5
+DEFAULT_KEPT = 200
+
+PRUNE_EVERY = 20
+
+_app = None
+_reports = OrderedDict()
+_reports_lock = threading.Lock()
+_written = 0
+_REPORT_ID = re.compile(r'^[0-9a-f]{12}$')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM = re.compile(r'%\(\w+\)s|%s|:\w+|\$\d+')
+_IN_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_SPACE = re.compile(r'\s+')
+_EXPLAINABLE = re.compile(r'\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+def normalize(statement):
+    """Statement text with values replaced by ? so repeats of one query compare equal."""
+    text = _STRING.sub('?', statement)
+    text = _PARAM.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _IN_LIST.sub('(?, ...)', text)
+    return _SPACE.sub(' ', text).strip()
+
+
+# -------------------- Capture --------------------
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _app is not None:
+        conn.info.setdefault('inspect_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _app is None or not conn.info.get('inspect_started'):
+        return
+    elapsed_ms = (time.perf_counter() - conn.info['inspect_started'].pop()) * 1000
+    if has_request_context() and 'sql_inspect' in g:
+        g.sql_inspect.append((statement, None if executemany else parameters, elapsed_ms))
+    if elapsed_ms >= _app.config.get('SQL_SLOW_MS', DEFAULT_SLOW_MS):
+        _log_slow(conn, statement, parameters, executemany, elapsed_ms)
+
+
+def _explain(conn, statement, parameters):
+    """
+    Query plan lines for `statement`, run on a raw cursor so it isn't
+    recorded itself. On PostgreSQL the EXPLAIN runs in a savepoint: a
+    failed statement would otherwise abort the request's transaction.
+    """
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif dialect in ('postgresql', 'mysql', 'mariadb'):
+        prefix = 'EXPLAIN '
+    else:
+        return []
+    savepoint = dialect == 'postgresql' and conn.in_transaction()
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute('SAVEPOINT sql_inspector_explain')
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+        except Exception:
+            if savepoint:
+                cursor.execute('ROLLBACK TO SAVEPOINT sql_inspector_explain')
+            raise
+        finally:
+            if savepoint:
+                cursor.execute('RELEASE SAVEPOINT sql_inspector_explain')
+    finally:
+        cursor.close()
+
+
+def _log_slow(conn, statement, parameters, executemany, elapsed_ms):
+    plan = []
+    if not executemany and _EXPLAINABLE.match(statement):
+        try:
+            plan = _explain(conn, statement, parameters)
+        except Exception as exc:  # the plan is best effort; the slow query itself already ran
+            plan = [f'(no plan: {exc})']
+    where = f'{request.method} {request.path}' if has_request_context() else 'outside request'
+    _app.logger.warning(
+        'Slow query (%.1fms, %s): %s\nparams: %r\nplan:\n  %s',
+        elapsed_ms, where, _SPACE.sub(' ', statement).strip(), parameters, '\n  '.join(plan) or '(none)'
+    )
+
+
+# -------------------- Reports --------------------
+
+def build_report(statements, threshold=DEFAULT_THRESHOLD, slow_ms=DEFAULT_SLOW_MS):
+    """Group (statement, parameters, ms) records by normalized text and flag N+1 patterns."""
+    groups = OrderedDict()
+    for statement, parameters, elapsed_ms in statements:
+        key = normalize(statement)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {'sql': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, '_params': set()}
+        group['count'] += 1
+        group['total_ms'] += elapsed_ms
+        group['max_ms'] = max(group['max_ms'], elapsed_ms)
+        group['_params'].add(repr(parameters))
+
+    report_groups = []
+    for group in groups.values():
+        distinct = len(group.pop('_params'))
+        group['distinct_params'] = distinct
+        group['n_plus_one'] = (
+            group['sql'].upper().startswith('SELECT')
+            and group['count'] >= threshold
+            and distinct > 1
+        )
+        group['total_ms'] = round(group['total_ms'], 3)
+        group['max_ms'] = round(group['max_ms'], 3)
+        report_groups.append(group)
+    report_groups.sort(key=lambda grp: grp['total_ms'], reverse=True)
+
+    return {
+        'queries': len(statements),
+        'distinct': len(report_groups),
+        'time_ms': round(sum(ms for _, _, ms in statements), 3),
+        'duplicates': sum(1 for grp in report_groups if grp['count'] > 1),
+        'n_plus_one': [grp['sql'] for grp in report_groups if grp['n_plus_one']],
+        'slow': sum(1 for _, _, ms in statements if ms >= slow_ms),
+        'groups': report_groups,
+    }
+
+
+def _before_request():
+    g.sql_inspect = []
+
+
+def _after_request(response):
+    statements = g.pop('sql_inspect', None)
+    if statements is None:
+        return response
+    config = _app.config
+    report = build_report(
+        statements,
+        config.get('SQL_N_PLUS_ONE_THRESHOLD', DEFAULT_THRESHOLD),
+        config.get('SQL_SLOW_MS', DEFAULT_SLOW_MS),
+    )
+    report_id = uuid4().hex[:12]
+    report.update(id=report_id, request_id=g.get('request_id'), method=request.method, path=request.full_path.rstrip('?'),
+                  status=response.status_code, at=datetime.utcnow().isoformat())
+    _store(report)
+
+    response.headers['X-SQL-Summary'] = (
+        f"queries={report['queries']}; time_ms={report['time_ms']}; duplicates={report['duplicates']}; "
+        f"n_plus_one={len(report['n_plus_one'])}; slow={report['slow']}"
+    )
+    response.headers['X-SQL-Report'] = report_id
+    if report['n_plus_one']:
+        _app.logger.warning('Possible N+1 in %s %s: %s', request.method, request.path, report['n_plus_one'])
+    return response
+
+
+# -------------------- Storage --------------------
+
+def _reports_dir():
+    return _app.config.get('SQL_REPORTS_DIR')
+
+
+def _report_files(directory):
+    """Report files in `directory`, oldest first."""
+    entries = [e for e in os.scandir(directory) if e.name.endswith('.json')]
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    return [e.path for e in entries]
+
+
+def _store(report):
+    global _written
+    kept = _app.config.get('SQL_REPORTS_KEPT', DEFAULT_KEPT)
+    directory = _reports_dir()
+    if not directory:
+        with _reports_lock:
+            _reports[report['id']] = report
+            while len(_reports) > kept:
+                _reports.popitem(last=False)
+        return
+
+    path = os.path.join(directory, f"{report['id']}.json")
+    with open(f'{path}.tmp', 'w') as fh:
+        json.dump(report, fh)
+    os.replace(f'{path}.tmp', path)
+    with _reports_lock:
+        _written += 1
+        prune = _written % PRUNE_EVERY == 0
+    if prune:
+        for old in _report_files(directory)[:-kept]:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass  # another worker pruned it first
+
+
+def _read(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def get_report(report_id):
+    directory = _reports_dir()
+    if not directory:
+        with _reports_lock:
+            return _reports.get(report_id)
+    if not _REPORT_ID.match(report_id):
+        return None
+    return _read(os.path.join(directory, f'{report_id}.json'))
+
+
+def recent(limit=50):
+    """Summaries of the latest reports, newest first."""
+    directory = _reports_dir()
+    if directory:
+        reports = [r for r in map(_read, _report_files(directory)[-limit:]) if r is not None]
+    else:
+        with _reports_lock:
+            reports = list(_reports.values())[-limit:]
+    return [{k: v for k, v in r.items() if k != 'groups'} for r in reversed(reports)]
+
+
+def enabled():
+    return _app is not None
+
+
+def init_app(app):
+    """Turn the inspector on when SQL_INSPECT is set; a no-op otherwise."""
+    global _app
+    if not app.config.get('SQL_INSPECT'):
+        return
+    _app = app
+    if app.config.get('SQL_REPORTS_DIR'):
+        os.makedirs(app.config['SQL_REPORTS_DIR'], exist_ok=True)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
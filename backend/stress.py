@@ -0,0 +1,184 @@
+"""
+Monte Carlo liquidity stress test.
+
+Samples loan default and late-payment scenarios over the cash-flow
+forecast book (see forecast.py) and measures, per withdrawal window, how
+far cumulative cash would fall short of the investment payouts due.
+Independent scenario batches run in a process pool of at most
+MAX_WORKERS processes (STRESS_WORKERS overrides it); each batch walks the
+loans in chunks sized so that its working arrays hold ELEMENT_BUDGET
+scenario x loan cells, about 50 MB, whatever the book size. Results are
+cached by book version and parameters.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+import forecast
+
+PERCENTILES = (50, 90, 95, 99)
+BATCH_SCENARIOS = 250
+ELEMENT_BUDGET = 2_000_000   # scenario x loan cells per chunk
+MAX_WORKERS = 4
+CACHE_SIZE = 32
+
+DEFAULTS = {
+    'scenarios': 2000,
+    'default_rate': 0.05,
+    'late_rate': 0.15,
+    'max_delay_windows': 3,
+    'horizon': forecast.HORIZON_WINDOWS,
+    'seed': 0,
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(os.environ.get('STRESS_WORKERS', min(os.cpu_count() or 1, MAX_WORKERS)))
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+        return _pool
+
+
+def _run_batch(prepared, seed, n_scenarios, params):
+    """
+    Simulate `n_scenarios` books and return their per-window shortfall,
+    shape (n_scenarios, horizon). Runs in a worker process.
+    """
+    repayments, repayment_slots, payout_per_window, opening_cash = prepared
+    horizon = params['horizon']
+    rng = np.random.default_rng(seed)
+
+    # Scenario s, window w lives in flat bin s * (horizon + 1) + w; the extra
+    # column collects repayments pushed past the horizon
+    width = horizon + 1
+    scenario_base = (np.arange(n_scenarios) * width)[:, None]
+    inflows = np.zeros(n_scenarios * width)
+
+    # Buffers reused by every chunk; a chunk's arrays are views of their head
+    chunk = max(1, ELEMENT_BUDGET // n_scenarios)
+    cells = n_scenarios * min(chunk, max(repayments.size, 1))
+    u_buf = np.empty(cells)
+    work_buf = np.empty(cells)
+    mask_buf = np.empty(cells, dtype=bool)
+    bin_buf = np.empty(cells, dtype=np.int64)
+    max_delay = params['max_delay_windows']
+
+    for start in range(0, repayments.size, chunk):
+        amounts = repayments[start:start + chunk]
+        slots = repayment_slots[start:start + chunk]
+        n = n_scenarios * amounts.size
+        u, work, mask, bins = (buf[:n].reshape(n_scenarios, amounts.size)
+                               for buf in (u_buf, work_buf, mask_buf, bin_buf))
+
+        # One uniform draw per loan decides everything: below default_rate the
+        # loan defaults, within the next late_rate it slips 1..max_delay windows
+        rng.random(out=u)
+        if params['late_rate']:
+            np.subtract(u, params['default_rate'], out=work)
+            work /= params['late_rate']
+            np.clip(work, 0, None, out=work)
+        else:
+            work.fill(1)
+        np.less(work, 1, out=mask)                  # late
+        work *= max_delay
+        np.floor(work, out=work)
+        work += 1
+        work *= mask                                # delay in windows, 0 if on time
+        work += slots[None, :]
+        np.minimum(work, horizon, out=work)
+        np.copyto(bins, work, casting='unsafe')     # target window
+        bins += scenario_base
+
+        np.greater_equal(u, params['default_rate'], out=mask)  # not defaulted
+        np.multiply(mask, amounts[None, :], out=work)
+
+        inflows += np.bincount(bins.ravel(), weights=work.ravel(), minlength=n_scenarios * width)
+
+    inflows = inflows.reshape(n_scenarios, width)[:, :horizon]
+    cumulative = opening_cash + np.cumsum(inflows - payout_per_window[None, :], axis=1)
+    return np.maximum(-cumulative, 0.0)
+
+
+def _prepare(book, first, horizon, opening_cash):
+    """Reduce the book to what the simulation needs: loans inside the horizon, payouts per window."""
+    repayment_slots = np.maximum(book.repayment_windows - first, 0)  # overdue loans are collected now
+    keep = repayment_slots < horizon
+    payout_slots = book.payout_windows - first
+    payout_per_window = np.bincount(
+        np.clip(payout_slots, 0, horizon), weights=book.payouts, minlength=horizon + 1
+    )[:horizon]
+    return (
+        np.ascontiguousarray(book.repayments[keep]),
+        np.ascontiguousarray(repayment_slots[keep]),
+        payout_per_window,
+        float(opening_cash),
+    )
+
+
+def simulate(book, opening_cash=0.0, workers=None, **overrides):
+    """
+    Run the stress test and return percentiles of the shortfall per window.
+    Cached by book version and parameters.
+    """
+    params = dict(DEFAULTS, **overrides)
+    first = forecast.current_window()
+    key = (book.version, first, round(opening_cash, 2), tuple(sorted(params.items())))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return dict(_cache[key], cached=True)
+
+    horizon = params['horizon']
+    prepared = _prepare(book, first, horizon, opening_cash)
+
+    sizes = [BATCH_SCENARIOS] * (params['scenarios'] // BATCH_SCENARIOS)
+    if params['scenarios'] % BATCH_SCENARIOS:
+        sizes.append(params['scenarios'] % BATCH_SCENARIOS)
+    seeds = np.random.SeedSequence(params['seed']).spawn(len(sizes))
+
+    if workers == 1 or len(sizes) == 1:
+        batches = [_run_batch(prepared, seed, size, params) for seed, size in zip(seeds, sizes)]
+    else:
+        pool = _get_pool()
+        futures = [
+            pool.submit(_run_batch, prepared, seed, size, params)
+            for seed, size in zip(seeds, sizes)
+        ]
+        batches = [f.result() for f in futures]
+    shortfall = np.vstack(batches)
+
+    pct = np.percentile(shortfall, PERCENTILES, axis=0)
+    windows = []
+    for offset in range(horizon):
+        start, end = forecast.window_bounds(first + offset)
+        windows.append({
+            'window_start': start.isoformat(),
+            'window_end': end.isoformat(),
+            'payouts_due': round(float(prepared[2][offset]), 2),
+            'shortfall_probability': round(float((shortfall[:, offset] > 0).mean()), 4),
+            'shortfall_percentiles': {
+                f'p{p}': round(float(pct[i, offset]), 2) for i, p in enumerate(PERCENTILES)
+            },
+        })
+
+    result = {
+        'parameters': dict(params, opening_cash=round(opening_cash, 2)),
+        'windows': windows,
+        'loans_simulated': int(prepared[0].size),
+    }
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(result, cached=False)
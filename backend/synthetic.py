@@ -0,0 +1,351 @@
+"""
+Seeded synthetic data for load tests and benchmarks.
+
+generate() fills the database with investors, investments, withdrawals,
+loans, repayments, notifications and audit entries that follow the
+status lifecycles the API enforces: only approved investors invest or
+borrow, approval stamps approved_at and the maturity / repayment due
+date, matured investments go on to withdrawal requests that are paid,
+confirmed or rejected, and loans past their due date are either repaid
+by approved repayments or overdue. Each transition leaves the
+notification and audit entries its endpoint would write.
+
+The same seed, counts and `now` produce the same rows. Ids continue
+after the current maximum of each table, so an existing database is
+extended rather than overwritten. Rows are bulk inserted in chunks of
+CHUNK and committed per chunk; portfolio summaries are rebuilt at the
+end (the ledger backfill and valuations are separate commands).
+
+Every synthetic investor can log in as synthetic<id> with PASSWORD.
+"""
+import random
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+
+import portfolio
+import rates
+from models import (
+    db,
+    AdminUser,
+    AuditLog,
+    Investment,
+    Investor,
+    LoanApplication,
+    LoanRepayment,
+    Notification,
+    WithdrawalRequest,
+)
+
+DEFAULTS = {'investors': 100_000, 'investments': 1_000_000, 'loans': 200_000}
+CHUNK = 10_000
+HISTORY_DAYS = 3 * 365
+PASSWORD = 'synthetic-password'
+
+FIRST_NAMES = ('Tendai', 'Rudo', 'Farai', 'Chipo', 'Tatenda', 'Nyasha', 'Kuda', 'Tsitsi', 'Blessing',
+               'Grace', 'Simba', 'Ruvimbo', 'Tinashe', 'Vimbai', 'Takudzwa', 'Precious')
+SURNAMES = ('Moyo', 'Ncube', 'Sibanda', 'Dube', 'Chikwanha', 'Mutasa', 'Nyathi', 'Gumbo', 'Marufu',
+            'Mlambo', 'Chirwa', 'Mhlanga', 'Zhou', 'Banda', 'Phiri', 'Mapfumo')
+LOAN_PURPOSES = ('School fees', 'Stock for shop', 'Medical bills', 'Farming inputs', 'Vehicle repairs',
+                 'Rent', 'Building materials', 'Equipment')
+REPAYMENT_METHODS = ('bank_transfer', 'ecocash', 'cash')
+
+
+def _between(rng, start, end):
+    """Uniform datetime in [start, end]; `start` when the range is empty."""
+    span = (end - start).total_seconds()
+    return start + timedelta(seconds=rng.uniform(0, span)) if span > 0 else start
+
+
+def _admin_id():
+    admin_id = db.session.scalar(select(func.min(AdminUser.id)))
+    if admin_id is None:
+        admin = AdminUser(name='Synthetic Admin', email='synthetic-admin@example.com',
+                          password_hash=generate_password_hash(PASSWORD))
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+    return admin_id
+
+
+class _Generator:
+    """Row builders sharing the random stream, id counters and pending rows."""
+
+    TABLES = (Investor, Investment, WithdrawalRequest, LoanApplication, LoanRepayment, Notification, AuditLog)
+
+    def __init__(self, seed, now, progress):
+        self.rng = random.Random(seed)
+        self.now = now
+        self.progress = progress
+        self.admin_id = _admin_id()
+        self.counts = {}
+        self._rows = {}
+        self._next_id = {
+            model: (db.session.scalar(select(func.max(model.id))) or 0) + 1 for model in self.TABLES
+        }
+
+    def new_id(self, model):
+        value = self._next_id[model]
+        self._next_id[model] += 1
+        return value
+
+    def add(self, model, row):
+        self._rows.setdefault(model, []).append(row)
+
+    def flush(self):
+        """Insert pending rows, one executemany per table, and commit."""
+        for model in self.TABLES:
+            rows = self._rows.pop(model, None)
+            if rows:
+                db.session.execute(insert(model.__table__), rows)
+                name = model.__tablename__
+                self.counts[name] = self.counts.get(name, 0) + len(rows)
+        db.session.commit()
+
+    def between(self, start, end):
+        return _between(self.rng, start, end)
+
+    def reviewed(self, submitted_at, days):
+        return self.between(submitted_at, min(submitted_at + timedelta(days=days), self.now))
+
+    def event(self, investor_id, at, notification=None, admin_action=None, investor_action=None):
+        """The notification and audit entries one transition writes."""
+        if notification:
+            age_days = (self.now - at).days
+            self.add(Notification, {
+                'id': self.new_id(Notification), 'investor_id': investor_id, 'message': notification, 'date': at,
+                'read': age_days > 30 or (age_days > 2 and self.rng.random() < 0.5),
+            })
+        if admin_action:
+            self.add(AuditLog, {'id': self.new_id(AuditLog), 'actor_id': self.admin_id, 'role': 'admin',
+                                'action': admin_action, 'timestamp': at})
+        if investor_action:
+            self.add(AuditLog, {'id': self.new_id(AuditLog), 'actor_id': investor_id, 'role': 'investor',
+                                'action': investor_action, 'timestamp': at})
+
+    # -------------------- Investors --------------------
+
+    def investors(self, count):
+        """Insert `count` investors; returns {id: (created_at, full name, email, phone)} of the approved ones."""
+        rng = self.rng
+        password_hash = generate_password_hash(PASSWORD)
+        approved = {}
+        for n in range(count):
+            inv_id = self.new_id(Investor)
+            created_at = self.now - timedelta(days=rng.uniform(0, HISTORY_DAYS))
+            first, surname = rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+            email = f'synthetic{inv_id}@example.com'
+            phone = f'+2637{rng.randrange(10_000_000, 100_000_000)}'
+            confirmed = rng.random() < 0.9
+            roll = rng.random()
+            is_approved = confirmed and roll < 0.85
+            is_rejected = confirmed and 0.85 <= roll < 0.9
+            self.add(Investor, {
+                'id': inv_id, 'first_name': first, 'surname': surname, 'username': f'synthetic{inv_id}',
+                'email': email, 'password_hash': password_hash, 'phone': phone,
+                'phone_verified': confirmed, 'email_verified': confirmed,
+                'id_number': f'{rng.randrange(10, 100)}-{rng.randrange(100_000, 10_000_000)}'
+                             f'{rng.choice("ABCDEFGHJKLMNPQRSTVWXYZ")}{rng.randrange(10, 100)}',
+                'address': f'{rng.randrange(1, 10_000)} {rng.choice(SURNAMES)} Street, Harare',
+                'next_of_kin': f'{rng.choice(FIRST_NAMES)} {surname}',
+                'phone_of_kin': f'+2637{rng.randrange(10_000_000, 100_000_000)}',
+                'proof_of_residence': f'residence_{inv_id}.pdf', 'id_document': f'id_{inv_id}.jpg',
+                'face_photo': f'face_{inv_id}.jpg', 'is_confirmed': confirmed, 'is_approved': is_approved,
+                'is_rejected': is_rejected, 'balance': 0.0, 'version': 0,
+                'created_at': created_at, 'updated_at': created_at,
+            })
+            if is_approved:
+                approved[inv_id] = (created_at, f'{first} {surname}', email, phone)
+                self.event(inv_id, self.reviewed(created_at, 3),
+                           notification='Your investor account has been approved',
+                           admin_action=f'Approved investor {inv_id}')
+            elif is_rejected:
+                self.event(inv_id, self.reviewed(created_at, 3),
+                           notification='Your investor account has been rejected',
+                           admin_action=f'Rejected investor {inv_id}')
+            if (n + 1) % CHUNK == 0 or n + 1 == count:
+                self.flush()
+                self.progress(f'investors: {n + 1}/{count}')
+        return approved
+
+    # -------------------- Investments and withdrawals --------------------
+
+    def investments(self, count, approved):
+        rng = self.rng
+        investors = list(approved.items())
+        # A few investors hold many investments, most hold a handful
+        cum_weights = np.cumsum([rng.paretovariate(1.2) for _ in investors]).tolist()
+        durations = np.arange(1, rates.MAX_DURATION_MONTHS + 1)
+        done = 0
+        while done < count:
+            size = min(CHUNK, count - done)
+            picked = rng.choices(investors, cum_weights=cum_weights, k=size)
+            amounts = [max(rates.MIN_AMOUNT, round(rng.lognormvariate(5.5, 0.9))) for _ in range(size)]
+            months = [rng.randint(1, rates.MAX_DURATION_MONTHS) for _ in range(size)]
+            priced = rates.rate_grid(amounts, durations)[np.arange(size), np.array(months) - 1].tolist()
+            for (inv_id, (joined, *_)), amount, duration, rate in zip(picked, amounts, months, priced):
+                self.investment(inv_id, joined, float(amount), duration, rate)
+            self.flush()
+            done += size
+            self.progress(f'investments: {done}/{count}')
+
+    def investment(self, inv_id, joined, amount, duration, rate):
+        rng = self.rng
+        investment_id = self.new_id(Investment)
+        created_at = self.between(joined, self.now)
+        row = {
+            'id': investment_id, 'investor_id': inv_id, 'amount': amount, 'duration_months': duration,
+            'rate': rate, 'created_at': created_at, 'updated_at': created_at, 'approved_at': None,
+            'maturity_date': None, 'status': 'pending', 'is_authorized': False, 'version': 0,
+            'proof_of_payment': f'proof_{investment_id}.pdf',
+        }
+        self.add(Investment, row)
+        self.event(inv_id, created_at, investor_action=f'Submitted investment {investment_id}')
+
+        roll = rng.random()
+        if (self.now - created_at).days < 3 and roll < 0.6 or roll < 0.01:
+            return  # still awaiting review
+        reviewed_at = self.reviewed(created_at, 3)
+        if roll < 0.04:
+            row.update(status='rejected', updated_at=reviewed_at)
+            self.event(inv_id, reviewed_at, notification=f'Investment {investment_id} rejected',
+                       admin_action=f'Rejected investment {investment_id}')
+            return
+
+        maturity = Investment.maturity_for(reviewed_at, duration)
+        row.update(status='approved', approved_at=reviewed_at, updated_at=reviewed_at,
+                   maturity_date=maturity, is_authorized=True)
+        self.event(inv_id, reviewed_at, notification=f'Investment {investment_id} approved',
+                   admin_action=f'Approved investment {investment_id}')
+        if maturity > self.now.date():
+            return
+
+        roll = rng.random()
+        if roll < 0.55:
+            row['status'] = 'matured'
+        elif roll < 0.65:
+            row['status'] = 'withdrawal_requested'
+            self.withdrawal(row, maturity, 'pending')
+        elif roll < 0.7:
+            row['status'] = 'matured'  # rejected withdrawals restore the investment
+            self.withdrawal(row, maturity, 'rejected')
+        else:
+            row['status'] = 'withdrawn'
+            self.withdrawal(row, maturity, 'completed' if roll < 0.85 else 'paid')
+
+    def withdrawal(self, investment, maturity, status):
+        inv_id, investment_id = investment['investor_id'], investment['id']
+        opened = self.between(datetime.combine(maturity, time()), self.now)
+        wr_id = self.new_id(WithdrawalRequest)
+        paid = status in ('paid', 'completed')
+        self.add(WithdrawalRequest, {
+            'id': wr_id, 'investment_id': investment_id, 'investor_id': inv_id, 'amount': investment['amount'],
+            'status': status, 'proof_of_payment': f'withdrawal_proof_{wr_id}_proof.pdf' if paid else None,
+            'version': 0, 'created_at': opened,
+        })
+        self.event(inv_id, opened, investor_action=f'Requested withdrawal for investment {investment_id}')
+        if status == 'pending':
+            return
+        processed = self.reviewed(opened, 5)
+        self.event(inv_id, processed, admin_action=f'{"Approved" if paid else "Rejected"} withdrawal {wr_id}')
+        if status == 'completed':
+            self.event(inv_id, self.between(processed, self.now),
+                       investor_action=f'Confirmed withdrawal receipt for withdrawal {wr_id}')
+
+    # -------------------- Loans and repayments --------------------
+
+    def loans(self, count, approved):
+        rng = self.rng
+        borrowers = list(approved.items())
+        for n in range(count):
+            inv_id, (joined, full_name, email, phone) = rng.choice(borrowers)
+            self.loan(inv_id, joined, full_name, email, phone)
+            if (n + 1) % CHUNK == 0 or n + 1 == count:
+                self.flush()
+                self.progress(f'loans: {n + 1}/{count}')
+
+    def loan(self, inv_id, joined, full_name, email, phone):
+        rng = self.rng
+        loan_id = self.new_id(LoanApplication)
+        submitted_at = self.between(joined, self.now)
+        pricing = LoanApplication(amount=float(max(20, round(rng.lognormvariate(5.3, 0.8)))))
+        pricing.assign_interest_rate()
+        row = {
+            'id': loan_id, 'investor_id': inv_id, 'full_name': full_name, 'email': email, 'phone': phone,
+            'amount': pricing.amount, 'purpose': rng.choice(LOAN_PURPOSES), 'status': 'pending',
+            'submitted_at': submitted_at, 'interest_rate': pricing.interest_rate, 'repayment_due_date': None,
+            'approved_at': None, 'signed_documents': f'signed_{loan_id}.pdf', 'version': 0,
+        }
+        self.add(LoanApplication, row)
+
+        roll = rng.random()
+        if (self.now - submitted_at).days < 3 and roll < 0.6 or roll < 0.02:
+            return
+        reviewed_at = self.reviewed(submitted_at, 5)
+        if roll < 0.1:
+            row['status'] = 'rejected'
+            self.event(inv_id, reviewed_at, notification=f'Loan {loan_id} rejected',
+                       admin_action=f'Rejected loan {loan_id}')
+            return
+        due = reviewed_at + timedelta(days=30)
+        row.update(status='approved', approved_at=reviewed_at, repayment_due_date=due)
+        self.event(inv_id, reviewed_at, notification=f'Loan {loan_id} approved',
+                   admin_action=f'Approved loan {loan_id}')
+        self.repayments(row, reviewed_at, due)
+
+    def repayments(self, loan, approved_at, due):
+        rng = self.rng
+        repayable = portfolio.loan_repayable(loan['amount'], loan['interest_rate'])
+        if due > self.now:
+            if rng.random() < 0.4:
+                self.repayment(loan, repayable, self.between(approved_at, self.now), 'pending')
+            return
+
+        if rng.random() < 0.8:
+            # Approved repayments add up to the amount due, which is what marks a loan repaid
+            loan['status'] = 'repaid'
+            parts = rng.randint(1, 3)
+            paid = 0.0
+            for i in range(parts):
+                amount = repayable - paid if i == parts - 1 else round(repayable / parts, 2)
+                paid += amount
+                self.repayment(loan, amount, self.between(approved_at, due), 'approved')
+            return
+
+        loan['status'] = 'overdue'
+        roll = rng.random()
+        if roll < 0.5:
+            self.repayment(loan, repayable * rng.uniform(0.3, 0.7), self.between(approved_at, due), 'approved')
+        if roll < 0.2:
+            self.repayment(loan, repayable, self.between(approved_at, self.now), 'rejected')
+        elif roll > 0.9:
+            self.repayment(loan, repayable, self.between(due, self.now), 'pending')
+
+    def repayment(self, loan, amount, paid_at, status):
+        repayment_id = self.new_id(LoanRepayment)
+        self.add(LoanRepayment, {
+            'id': repayment_id, 'loan_id': loan['id'], 'amount_paid': round(amount, 2), 'date_paid': paid_at,
+            'proof': f'repay_proof_{repayment_id}.pdf', 'method': self.rng.choice(REPAYMENT_METHODS),
+            'status': status,
+        })
+
+
+# -------------------- Entry point --------------------
+
+def generate(investors=DEFAULTS['investors'], investments=DEFAULTS['investments'], loans=DEFAULTS['loans'],
+             seed=0, now=None, progress=None):
+    """
+    Insert a synthetic book and rebuild the portfolio summaries. Returns
+    the number of rows inserted per table.
+    """
+    generator = _Generator(seed, now or datetime.utcnow().replace(microsecond=0), progress or (lambda msg: None))
+    approved = generator.investors(investors)
+    if approved:
+        generator.investments(investments, approved)
+        generator.loans(loans, approved)
+
+    portfolio.rebuild()
+    db.session.commit()
+    return generator.counts
@@ -0,0 +1,88 @@
+"""
+Shared fixtures. The app is imported once against a scratch SQLite
+database; every test starts from empty tables.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+_scratch = tempfile.mkdtemp(prefix='acfinance-tests-')
+os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ['INTAKE_DATABASE_URI'] = f"sqlite:///{os.path.join(_scratch, 'intake.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+import app as app_module  # noqa: E402
+import forecast  # noqa: E402
+import intake  # noqa: E402
+import result_cache  # noqa: E402
+import synthetic  # noqa: E402
+from models import db, AdminUser, Investor  # noqa: E402
+
+BASE_URL = 'https://localhost'  # access cookies are Secure
+NOW = datetime(2025, 6, 15, 12, 0)
+
+with app_module.app.app_context():
+    db.create_all()
+    intake.create_tables()
+
+
+@pytest.fixture
+def app(tmp_path):
+    flask_app = app_module.app
+    flask_app.config.update(TESTING=True, UPLOAD_FOLDER=str(tmp_path))
+    with flask_app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        result_cache.get_backend().clear()
+        forecast._cached_book = None
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def admin(app):
+    user = AdminUser(name='Admin', email='admin@example.com')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def investor(app):
+    user = Investor(first_name='Rudo', surname='Moyo', username='rudo', email='rudo@example.com',
+                    phone='+263780000000', is_approved=True, is_confirmed=True)
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _client(app, role, identity):
+    client = app.test_client()
+    token = create_access_token(identity=str(identity), additional_claims={'role': role, 'email': 'test@example.com'})
+    client.set_cookie(app.config.get('JWT_ACCESS_COOKIE_NAME', 'access_token_cookie'), token,
+                      domain='localhost', path=app.config['JWT_ACCESS_COOKIE_PATH'])
+    return client
+
+
+@pytest.fixture
+def admin_client(app, admin):
+    return _client(app, 'admin', admin.id)
+
+
+@pytest.fixture
+def investor_client(app, investor):
+    return _client(app, 'investor', investor.id)
+
+
+@pytest.fixture
+def book(app, admin):
+    """A small synthetic book as of NOW."""
+    return synthetic.generate(investors=30, investments=150, loans=60, seed=7, now=NOW)
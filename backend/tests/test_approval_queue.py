@@ -0,0 +1,64 @@
+"""Loan approvals queued outside the window and applied in one batch (approval_queue.py)."""
+import approval_queue
+import ledger
+from conftest import BASE_URL
+from models import db, LoanApplication, Notification, QueuedApproval
+
+
+def _loan(investor):
+    loan = LoanApplication(investor_id=investor.id, full_name='Rudo Moyo', email=investor.email,
+                           phone=investor.phone, amount=400, interest_rate=17)
+    db.session.add(loan)
+    db.session.commit()
+    return loan
+
+
+def _window(monkeypatch, is_open):
+    monkeypatch.setattr(approval_queue, 'window_is_open', lambda *args, **kwargs: is_open)
+
+
+def test_approval_outside_the_window_is_queued_once(admin_client, investor, monkeypatch):
+    _window(monkeypatch, False)
+    loan = _loan(investor)
+
+    first = admin_client.put(f'/api/admin/approve-loan/{loan.id}', base_url=BASE_URL)
+    second = admin_client.put(f'/api/admin/approve-loan/{loan.id}', base_url=BASE_URL)
+
+    assert first.status_code == second.status_code == 202
+    assert first.get_json()['queued_approval_id'] == second.get_json()['queued_approval_id']
+    db.session.refresh(loan)
+    assert loan.status == 'pending'
+
+
+def test_queued_approvals_apply_in_one_batch(admin_client, investor, monkeypatch):
+    _window(monkeypatch, False)
+    loans = [_loan(investor) for _ in range(3)]
+    for loan in loans:
+        admin_client.put(f'/api/admin/approve-loan/{loan.id}', base_url=BASE_URL)
+    cancelled = db.session.query(QueuedApproval).filter_by(target_id=loans[2].id).one()
+    assert admin_client.delete(f'/api/admin/queued-approvals/{cancelled.id}', base_url=BASE_URL).status_code == 200
+
+    _window(monkeypatch, True)
+    response = admin_client.post('/api/admin/queued-approvals/apply', base_url=BASE_URL)
+
+    assert response.status_code == 200, response.get_json()
+    summary = response.get_json()
+    assert (summary['applied'], summary['failed']) == (2, 0)
+    db.session.expire_all()
+    assert [db.session.get(LoanApplication, loan.id).status for loan in loans] == ['approved', 'approved', 'pending']
+    assert {item.batch_id for item in QueuedApproval.query.filter_by(status='applied')} == {summary['batch_id']}
+    assert Notification.query.count() == 2
+    assert ledger.balance_as_of(ledger.CASH) == -800
+
+
+def test_loan_decided_before_the_batch_fails_its_item(admin_client, investor, monkeypatch):
+    _window(monkeypatch, False)
+    loan = _loan(investor)
+    admin_client.put(f'/api/admin/approve-loan/{loan.id}', base_url=BASE_URL)
+    db.session.execute(LoanApplication.__table__.update().values(status='rejected'))
+    db.session.commit()
+
+    summary = approval_queue.apply_queued()
+
+    assert (summary['applied'], summary['failed']) == (0, 1)
+    assert QueuedApproval.query.one().status == 'failed'
@@ -0,0 +1,55 @@
+"""Traffic capture redaction and records (capture.py)."""
+import json
+
+from flask import g
+
+import capture
+
+
+def test_secrets_become_a_fixed_marker_whatever_their_type():
+    assert capture.redact('hunter2', 'password') == capture.SECRET
+    assert capture.redact(123456, 'otp') == capture.SECRET
+    assert capture.redact(['a', 'b'], 'reset_token') == capture.SECRET
+    assert capture.redact('', 'new_password') == capture.SECRET
+
+
+def test_ids_become_kind_markers():
+    assert capture.redact(42, 'loan_id') == ':loan'
+    assert capture.redact('42', 'investment_id') == ':investment'
+    assert capture.redact([1, 2, 3], 'repayment_ids') == [':repayment'] * 3
+    assert capture.redact(7, 'id') == ':id'
+
+
+def test_strings_are_masked_to_bucketed_lengths():
+    assert capture.redact('Rudo', 'first_name') == 'xxxx'
+    assert capture.redact('rudo@example.com', 'email') == 'x' * 16
+    assert capture.redact('rudo.moyo@example.com', 'email') == 'x' * 32
+    assert capture.redact('y' * 500, 'notes') == 'x' * capture.MAX_STRING
+    assert capture.redact('approved', 'status') == 'approved'  # SAFE_PARAMS are kept
+
+
+def test_numbers_are_rounded_to_two_significant_digits():
+    assert capture.redact(12345, 'amount') == 12000
+    assert capture.redact(1234.56, 'amount') == 1200.0
+    assert capture.redact('12345', 'amount') == '12000'
+    assert capture.redact(42, 'duration') == 42
+    assert capture.redact(True, 'agree') is True
+
+
+def test_a_request_is_recorded_without_identifying_content(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(capture, '_path', str(tmp_path / 'capture-{pid}.jsonl'))
+    body = {'email': 'rudo@example.com', 'password': 'hunter2', 'investment_id': 12, 'amount': 12345}
+
+    with app.test_request_context('/api/investor-resend-confirmation?page=2', method='POST', json=body):
+        g.capture = (1_750_000_000.0, 0.0)
+        capture._after_request(app.make_response(('', 200)))
+    capture.flush()
+
+    (path,) = tmp_path.glob('capture-*.jsonl')
+    text = path.read_text()
+    assert 'rudo' not in text and 'hunter2' not in text
+    record = json.loads(text)
+    assert (record['m'], record['r'], record['s'], record['q']) == ('POST', '/api/investor-resend-confirmation', 200, {'page': '2'})
+    assert record['b'] == {'json': {'email': 'x' * 16, 'password': capture.SECRET,
+                                    'investment_id': ':investment', 'amount': 12000}}
+    assert record['u'] is None
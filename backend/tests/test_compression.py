@@ -0,0 +1,37 @@
+"""Response compression (compression.py)."""
+import gzip
+
+import pytest
+
+import compression
+from conftest import BASE_URL
+
+URL = '/api/admin/loans'
+
+
+def test_large_json_is_gzipped(admin_client, book):
+    plain = admin_client.get(URL, query_string={'per_page': 500}, base_url=BASE_URL)
+    response = admin_client.get(URL, query_string={'per_page': 500}, headers={'Accept-Encoding': 'gzip'},
+                                base_url=BASE_URL)
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+    assert len(response.get_data()) < len(plain.get_data())
+
+
+def test_small_responses_are_sent_as_is(admin_client):
+    response = admin_client.get(URL, headers={'Accept-Encoding': 'gzip'}, base_url=BASE_URL)
+
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+
+
+@pytest.mark.skipif(compression.brotli is None, reason='brotli not installed')
+def test_brotli_is_preferred(admin_client, book):
+    response = admin_client.get(URL, query_string={'per_page': 500}, headers={'Accept-Encoding': 'gzip, br'},
+                                base_url=BASE_URL)
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert compression.brotli.decompress(response.get_data())
@@ -0,0 +1,47 @@
+"""The endpoint benchmark runner (endpoint_bench.py)."""
+import pytest
+
+import endpoint_bench
+
+
+def test_run_times_routes_and_reports_failures(app, book, monkeypatch):
+    def broken():
+        raise RuntimeError('boom')
+
+    monkeypatch.setitem(app.view_functions, 'ping', broken)
+
+    report = endpoint_bench.run(app, repeat=2, warmup=0, only='/api/')
+
+    assert {'route': '/api/ping', 'path': '/api/ping', 'reason': "raised RuntimeError('boom')"} in report['failed']
+    timed = {r['route']: r for r in report['results']}
+    assert '/api/admin/pending-investments' in timed and '/api/ping' not in timed
+    assert not {f['route'] for f in report['failed']} & set(timed)
+    assert all(r['status'] < 500 for r in timed.values())
+
+
+def test_routes_answering_5xx_are_failed(app, book, monkeypatch):
+    monkeypatch.setattr(app, 'testing', False)
+    monkeypatch.setitem(app.config, 'PROPAGATE_EXCEPTIONS', False)
+    monkeypatch.setitem(app.view_functions, 'ping', lambda: ('down', 503))
+
+    report = endpoint_bench.run(app, repeat=1, warmup=0, only='/api/ping')
+
+    assert report['results'] == []
+    assert report['failed'] == [{'route': '/api/ping', 'path': '/api/ping', 'reason': 'answered 503'}]
+
+
+def test_run_needs_seeded_data(app):
+    with pytest.raises(LookupError):
+        endpoint_bench.run(app, repeat=1, warmup=0)
+
+
+def test_compare_lines_runs_up_by_route():
+    baseline = {'results': [{'route': '/a', 'p50_ms': 10, 'p95_ms': 20, 'queries': 5},
+                            {'route': '/b', 'p50_ms': 4, 'p95_ms': 8, 'queries': 2}]}
+    current = {'results': [{'route': '/a', 'p50_ms': 5, 'p95_ms': 9, 'queries': 1},
+                           {'route': '/b', 'p50_ms': 6, 'p95_ms': 9, 'queries': 2},
+                           {'route': '/new', 'p50_ms': 1, 'p95_ms': 1, 'queries': 1}]}
+
+    rows = endpoint_bench.compare(baseline, current)
+
+    assert [(r['route'], r['change_pct'], r['queries_after']) for r in rows] == [('/b', 50.0, 2), ('/a', -50.0, 1)]
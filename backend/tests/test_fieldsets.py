@@ -0,0 +1,48 @@
+"""Sparse fieldsets with column-pruned loading (fieldsets.py)."""
+from sqlalchemy import event
+
+from conftest import BASE_URL
+from models import db
+
+URL = '/api/admin/active-investors'
+
+
+def _investor_selects(client, **params):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith('SELECT') and 'FROM investor' in statement and 'count(' not in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(URL, query_string=params, base_url=BASE_URL)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response, statements
+
+
+def test_fields_limit_the_keys_and_the_loaded_columns(admin_client, book):
+    response, statements = _investor_selects(admin_client, fields='first_name,email')
+
+    assert response.status_code == 200
+    investors = response.get_json()['investors']
+    assert investors and all(set(inv) == {'first_name', 'email'} for inv in investors)
+    (select,) = statements
+    columns = select.split(' FROM ')[0]
+    assert 'investor.email' in columns and 'investor.first_name' in columns
+    assert 'investor.address' not in columns and 'investor.face_photo' not in columns
+
+
+def test_without_fields_every_field_is_returned(admin_client, book):
+    response, statements = _investor_selects(admin_client)
+
+    assert 'investor.address' in statements[0]
+    assert 'address' in response.get_json()['investors'][0]
+
+
+def test_unknown_fields_are_a_400(admin_client):
+    response = admin_client.get(URL, query_string={'fields': 'email,password_hash'}, base_url=BASE_URL)
+
+    assert response.status_code == 400
+    assert 'password_hash' in response.get_json()['error']
@@ -0,0 +1,46 @@
+"""Book-wide cash-flow forecast (forecast.py) against a per-row reference."""
+from collections import defaultdict
+
+import pytest
+from sqlalchemy import select
+
+import forecast
+from conftest import NOW
+from models import db, Investment, LoanApplication
+
+
+def _reference(first, horizon):
+    inflows, outflows = defaultdict(float), defaultdict(float)
+    for inv in db.session.scalars(select(Investment).where(Investment.status.in_(forecast.PAYOUT_STATUSES))):
+        if inv.approved_at is not None:
+            mat = inv.expected_maturity_date
+            outflows[forecast.month_index(mat.year, mat.month)] += inv.projected_value()
+    for loan in db.session.scalars(select(LoanApplication).where(LoanApplication.status.in_(forecast.REPAYMENT_STATUSES))):
+        if loan.repayment_due_date is not None:
+            due = loan.repayment_due_date
+            inflows[forecast.month_index(due.year, due.month)] += loan.amount * (1 + (loan.interest_rate or 0) / 100)
+    return ([inflows[first + offset] for offset in range(horizon)],
+            [outflows[first + offset] for offset in range(horizon)])
+
+
+def test_forecast_matches_per_row_totals(book, app):
+    result = forecast.forecast(forecast.get_book(), today=NOW.date(), horizon=12)
+
+    inflows, outflows = _reference(forecast.current_window(NOW.date()), 12)
+    assert [w['inflows'] for w in result['windows']] == pytest.approx(inflows, abs=0.01)
+    assert [w['outflows'] for w in result['windows']] == pytest.approx(outflows, abs=0.01)
+    assert any(outflows) and any(inflows)
+    assert result['windows'][0]['window_start'] == '2025-06-28'  # the next window to open
+
+
+def test_book_is_cached_until_the_tables_change(book, app, investor):
+    first = forecast.get_book()
+    assert forecast.get_book() is first
+
+    db.session.add(Investment(investor_id=investor.id, amount=1000, duration_months=6, rate=12, status='approved',
+                              approved_at=NOW))
+    db.session.commit()
+
+    reloaded = forecast.get_book()
+    assert reloaded is not first
+    assert reloaded.payouts.size == first.payouts.size + 1
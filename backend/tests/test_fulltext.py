@@ -0,0 +1,66 @@
+"""Trigger-maintained full-text search (fulltext.py)."""
+from sqlalchemy import select
+
+import fulltext
+from conftest import BASE_URL
+from models import db, Investor
+
+
+def _investor(first, surname, email, approved=True):
+    investor = Investor(first_name=first, surname=surname, username=email.split('@')[0], email=email,
+                        phone='+263780000001', is_approved=approved, is_confirmed=True)
+    investor.set_password('password')
+    db.session.add(investor)
+    db.session.commit()
+    return investor
+
+
+def _search(term):
+    return [inv.id for inv in db.session.scalars(fulltext.ranked(select(Investor), Investor, term))]
+
+
+def test_every_word_must_match_as_a_prefix(app):
+    tendai = _investor('Tendai', 'Moyo', 'tendai@example.com')
+    _investor('Tendai', 'Chikore', 'tc@example.com')
+    _investor('Farai', 'Moyo', 'farai@example.com')
+
+    assert _search('tend moy') == [tendai.id]
+    assert _search('MOYO tendai') == [tendai.id]
+    assert len(_search('moyo')) == 2
+    assert _search('endai') == []
+
+
+def test_index_follows_updates_and_deletes(app):
+    investor = _investor('Rudo', 'Moyo', 'rudo2@example.com')
+
+    investor.surname = 'Ncube'
+    db.session.commit()
+    assert _search('ncube') == [investor.id]
+    assert _search('moyo') == []
+
+    db.session.delete(investor)
+    db.session.commit()
+    assert _search('ncube') == []
+
+
+def test_better_matches_rank_first(app):
+    once = _investor('Chipo', 'Banda', 'chipo@example.com')
+    twice = _investor('Banda', 'Banda', 'banda@example.com')
+
+    assert _search('banda') == [twice.id, once.id]
+
+
+def test_termless_search_leaves_the_query_alone(app):
+    _investor('Rudo', 'Moyo', 'rudo3@example.com')
+
+    assert len(_search(' -- ')) == 1
+
+
+def test_admin_list_search(admin_client, app):
+    tendai = _investor('Tendai', 'Moyo', 'tendai@example.com')
+    _investor('Farai', 'Moyo', 'farai@example.com')
+
+    response = admin_client.get('/api/admin/active-investors', query_string={'search': 'tendai'}, base_url=BASE_URL)
+
+    assert response.status_code == 200
+    assert [inv['id'] for inv in response.get_json()['investors']] == [tendai.id]
@@ -0,0 +1,83 @@
+"""Surge intake for withdrawal requests (intake.py)."""
+import pytest
+
+import approval_queue
+import intake
+from conftest import BASE_URL
+from models import db, Investment, WithdrawalRequest
+
+
+@pytest.fixture
+def surge(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'WITHDRAWAL_SURGE_MODE', 'on')
+    monkeypatch.setattr(approval_queue, 'window_is_open', lambda *args, **kwargs: True)
+    with intake._engine.begin() as conn:
+        conn.execute(intake.intake_request.delete())
+    return app
+
+
+def _investment(investor, status='approved'):
+    investment = Investment(investor_id=investor.id, amount=1000, duration_months=6, rate=12, status=status)
+    db.session.add(investment)
+    db.session.commit()
+    return investment
+
+
+def _request(client, investment):
+    response = client.post(f'/api/investor/request-withdrawal/{investment.id}', base_url=BASE_URL)
+    assert response.status_code == 202
+    return response.get_json()['request_id']
+
+
+def test_accepted_request_is_persisted_by_a_worker(surge, investor_client, investor):
+    investment = _investment(investor)
+    request_id = _request(investor_client, investment)
+    assert WithdrawalRequest.query.count() == 0
+
+    assert intake.process_batch() == 1
+
+    status = investor_client.get(f'/api/investor/withdrawal-requests/{request_id}', base_url=BASE_URL).get_json()
+    withdrawal = db.session.get(WithdrawalRequest, status['withdrawal_id'])
+    assert status['status'] == 'completed'
+    assert withdrawal.intake_id == request_id
+    assert db.session.get(Investment, investment.id).status == 'withdrawal_requested'
+
+
+def test_invalid_request_is_rejected_with_a_reason(surge, investor_client, investor):
+    request_id = _request(investor_client, _investment(investor, status='pending'))
+
+    intake.process_batch()
+
+    status = intake.get_status(request_id, investor.id)
+    assert status['status'] == 'rejected'
+    assert status['error'] == 'Only approved investments can be withdrawn'
+
+
+def test_releasing_a_persisted_batch_does_not_duplicate_it(surge, investor_client, investor):
+    request_id = _request(investor_client, _investment(investor))
+    leased = intake._lease(10)
+    intake._persist(leased)  # the worker died before recording the outcome
+
+    assert intake._persist(leased)[0] == {
+        'id': request_id, 'status': 'completed', 'error': None,
+        'result_id': WithdrawalRequest.query.one().id,
+    }
+    assert WithdrawalRequest.query.count() == 1
+
+
+def test_request_whose_batch_keeps_failing_is_given_up(surge, investor_client, investor, monkeypatch):
+    request_id = _request(investor_client, _investment(investor))
+
+    def broken(leased):
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(intake, '_persist', broken)
+    monkeypatch.setattr(intake, 'LEASE', -intake.LEASE)  # every lease has already ended
+    for _ in range(intake.MAX_ATTEMPTS):
+        with pytest.raises(RuntimeError):
+            intake.process_batch()
+
+    assert intake.process_batch() == 0
+    status = intake.get_status(request_id, investor.id)
+    assert status['status'] == 'failed'
+    assert status['error'] == 'RuntimeError: database unavailable'
@@ -0,0 +1,55 @@
+"""orjson JSON provider and format=columns listings (json_provider.py)."""
+import dataclasses
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from conftest import BASE_URL
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: float
+
+
+PAYLOAD = {
+    'b': [1, 2.5, None, True, 'text é'],
+    'a': {'when': datetime(2025, 6, 15, 12, 30), 'day': date(2025, 6, 15)},
+    'amount': Decimal('12.50'),
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'point': Point(1, 2.0),
+}
+
+
+@pytest.mark.skipif(json_provider.orjson is None, reason='orjson not installed')
+def test_output_matches_the_default_provider(app):
+    fast = json_provider.OrjsonProvider(app)
+    default = DefaultJSONProvider(app)
+
+    assert json.loads(fast.dumps(PAYLOAD)) == json.loads(default.dumps(PAYLOAD))
+    assert fast.dumps(PAYLOAD) == default.dumps(PAYLOAD, separators=(',', ':'), ensure_ascii=False)
+    assert fast.dumps({'n': np.int64(3), 'v': np.array([1.5, 2.5])}) == '{"n":3,"v":[1.5,2.5]}'
+    assert fast.loads(fast.dumps(PAYLOAD['b'])) == PAYLOAD['b']
+
+
+def test_to_columns_fills_missing_fields():
+    rows = [{'a': 1, 'b': 2}, {'a': 3, 'c': 4}]
+
+    assert json_provider.to_columns(rows) == {'a': [1, 3], 'b': [2, None], 'c': [None, 4]}
+    assert json_provider.to_columns([]) == {}
+
+
+def test_format_columns_on_a_list_endpoint(admin_client, book):
+    rows = admin_client.get('/api/admin/active-investors', base_url=BASE_URL).get_json()['investors']
+    columns = admin_client.get('/api/admin/active-investors', query_string={'format': 'columns'},
+                               base_url=BASE_URL).get_json()['investors']
+
+    assert rows
+    assert columns == json_provider.to_columns(rows)
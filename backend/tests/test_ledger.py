@@ -0,0 +1,149 @@
+"""Double-entry postings for approvals and payouts (ledger.py)."""
+import io
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+import approval_queue
+import ledger
+import work_queue
+from conftest import BASE_URL
+from models import db, Investment, LedgerPosting, LoanApplication, LoanRepayment, WithdrawalRequest
+
+
+def _unbalanced_entries():
+    return db.session.execute(
+        select(LedgerPosting.entry_id)
+        .group_by(LedgerPosting.entry_id)
+        .having(func.sum(LedgerPosting.amount_cents) != 0)
+    ).all()
+
+
+def _loan(investor, amount, rate, status='pending'):
+    loan = LoanApplication(investor_id=investor.id, full_name='Rudo Moyo', email=investor.email, phone=investor.phone,
+                           amount=amount, interest_rate=rate, status=status)
+    db.session.add(loan)
+    db.session.commit()
+    return loan
+
+
+@pytest.mark.parametrize('amount, rate', [(100.125, 5), (100.125, 7.5), (100.125, 10), (10.005, 5), (2500, 10)])
+def test_loan_posting_balances_with_sub_cent_amounts(investor, amount, rate):
+    loan = _loan(investor, amount, rate, status='approved')
+
+    ledger.post_loan_approved(loan)
+    db.session.commit()
+
+    assert _unbalanced_entries() == []
+    receivable = ledger.balance_as_of(ledger.loans_receivable(investor.id))
+    cash = ledger.balance_as_of(ledger.CASH)
+    income = ledger.balance_as_of(ledger.INTEREST_INCOME)
+    assert round(receivable + cash + income, 2) == 0
+    assert cash == -ledger.to_cents(amount) / 100
+
+
+def test_approve_loan_posts_a_balanced_entry(admin_client, investor, monkeypatch):
+    monkeypatch.setattr(approval_queue, 'window_is_open', lambda *args, **kwargs: True)
+    loan = _loan(investor, 100.125, 5)
+
+    response = admin_client.put(f'/api/admin/approve-loan/{loan.id}', base_url=BASE_URL)
+
+    assert response.status_code == 200, response.get_json()
+    assert db.session.scalar(select(func.count()).select_from(LedgerPosting)) == 3
+    assert _unbalanced_entries() == []
+
+
+def test_investment_approval_and_payout_balance(admin_client, investor):
+    investment = Investment(investor_id=investor.id, amount=1000.005, duration_months=6, rate=5, status='pending')
+    db.session.add(investment)
+    db.session.commit()
+
+    response = admin_client.put(f'/api/admin/approve-investment/{investment.id}', base_url=BASE_URL)
+    assert response.status_code == 200, response.get_json()
+
+    db.session.execute(Investment.__table__.update().where(Investment.id == investment.id)
+                       .values(status='withdrawal_requested'))
+    withdrawal = WithdrawalRequest(investment_id=investment.id, investor_id=investor.id,
+                                   amount=investment.amount, status='pending')
+    db.session.add(withdrawal)
+    db.session.commit()
+
+    response = admin_client.post(
+        f'/api/admin/withdrawals/{withdrawal.id}/approve', base_url=BASE_URL,
+        data={'proof_of_payment': (io.BytesIO(b'%PDF-1.4'), 'proof.pdf')}, content_type='multipart/form-data',
+    )
+    assert response.status_code == 200, response.get_json()
+
+    db.session.expire_all()
+    investment = db.session.get(Investment, investment.id)
+    assert investment.status == 'withdrawn'
+    assert _unbalanced_entries() == []
+    assert ledger.balance_as_of(ledger.investor_capital(investor.id)) == 0
+    payout = investment.projected_value()
+    assert ledger.balance_as_of(ledger.CASH) == round(ledger.to_cents(investment.amount) / 100 - payout, 2)
+    assert ledger.balance_as_of(ledger.INTEREST_EXPENSE) == round(payout - ledger.to_cents(investment.amount) / 100, 2)
+
+
+def test_backfill_dates_entries_when_the_money_moved(investor):
+    approved_at = datetime(2024, 1, 5)
+    db.session.add(Investment(investor_id=investor.id, amount=500, duration_months=6, rate=5, status='approved',
+                              approved_at=approved_at))
+    db.session.commit()
+
+    assert ledger.backfill_from_history() == 1
+    assert ledger.balance_as_of(ledger.CASH, datetime(2023, 12, 31)) == 0
+    assert ledger.balance_as_of(ledger.CASH, datetime(2024, 2, 1)) == 500
+
+
+def test_repayment_approved_concurrently_is_posted_once(admin_client, investor, monkeypatch):
+    loan = _loan(investor, 1000, 10, status='approved')
+    repayment = LoanRepayment(loan_id=loan.id, amount_paid=250, status='pending')
+    db.session.add(repayment)
+    db.session.commit()
+
+    # Another admin approves it after this request has loaded the row
+    def approved_elsewhere(model, row_id, admin_id):
+        with db.engine.begin() as connection:
+            connection.execute(LoanRepayment.__table__.update().values(status='approved'))
+        return False
+
+    monkeypatch.setattr(work_queue, 'claimed_by_other', approved_elsewhere)
+    response = admin_client.post('/api/admin/approve-repayment', json={'repayment_ids': [repayment.id]},
+                                 base_url=BASE_URL)
+
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['approved_ids'] == []
+    assert db.session.scalar(select(func.count()).select_from(LedgerPosting)) == 0
+
+
+def test_snapshots_cover_postings_by_date(investor):
+    # Backfill posts all investments before all loans, so ids don't follow dates
+    db.session.add_all([
+        Investment(investor_id=investor.id, amount=500, duration_months=6, rate=5, status='approved',
+                   approved_at=datetime(2024, 3, 1)),
+        LoanApplication(investor_id=investor.id, full_name='Rudo Moyo', email=investor.email, phone=investor.phone,
+                        amount=200, interest_rate=10, status='approved', approved_at=datetime(2024, 1, 10)),
+    ])
+    db.session.commit()
+    ledger.backfill_from_history()
+
+    assert ledger.take_snapshots(datetime(2024, 2, 1)) > 0
+    assert ledger.take_snapshots(datetime(2024, 4, 1)) > 0
+
+    assert ledger.balance_as_of(ledger.CASH, datetime(2024, 2, 1)) == -200
+    assert ledger.balance_as_of(ledger.CASH, datetime(2024, 4, 1)) == 300
+    assert ledger.balance_as_of(ledger.CASH) == 300
+
+
+def test_snapshots_stay_behind_in_flight_postings(investor):
+    loan = _loan(investor, 200, 10, status='approved')
+    ledger.post_loan_approved(loan)
+    db.session.commit()
+
+    assert ledger.take_snapshots() == 0  # dated within SETTLE_TIME of now
+    ledger.post_loan_approved(loan, datetime.utcnow() - ledger.SETTLE_TIME * 2)
+    db.session.commit()
+
+    assert ledger.take_snapshots() == 3
+    assert ledger.balance_as_of(ledger.CASH) == -400
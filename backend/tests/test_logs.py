@@ -0,0 +1,66 @@
+"""Structured logging: request IDs, JSON lines and throttling (logs.py)."""
+import json
+import logging
+
+from conftest import BASE_URL
+import logs
+from models import AuditLog
+
+
+def _record(msg='Balance for %s is stale', args=('acc-1',), level=logging.WARNING, name='ledger', **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_request_id_is_echoed_or_generated(app):
+    client = app.test_client()
+
+    assert client.get('/api/ping', headers={'X-Request-ID': 'abc-123'}, base_url=BASE_URL).headers['X-Request-ID'] == 'abc-123'
+    generated = client.get('/api/ping', headers={'X-Request-ID': 'bad id; drop'}, base_url=BASE_URL).headers['X-Request-ID']
+    assert generated != 'bad id; drop' and len(generated) == 32
+
+
+def test_audit_entries_carry_the_request_id(admin_client):
+    admin_client.post('/api/admin/profiling/token', json={}, headers={'X-Request-ID': 'req-42'}, base_url=BASE_URL)
+
+    assert AuditLog.query.one().request_id == 'req-42'
+
+
+def test_json_formatter_writes_one_object_per_record_with_extras():
+    record = logs._QueueHandler(None).prepare(_record(request_id='req-1', account='acc-1'))
+
+    entry = json.loads(logs.JsonFormatter().format(record))
+
+    assert entry['msg'] == 'Balance for acc-1 is stale'
+    assert (entry['level'], entry['logger'], entry['request_id'], entry['account']) == ('WARNING', 'ledger', 'req-1', 'acc-1')
+
+
+def test_repeated_warnings_are_rate_limited_and_report_what_was_dropped(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(logs.time, 'monotonic', lambda: clock[0])
+    throttle = logs.ThrottleFilter(limit=2, window=60)
+
+    kept = [throttle.filter(_record(args=(f'acc-{i}',))) for i in range(5)]
+    assert kept == [True, True, False, False, False]
+    assert throttle.filter(_record(level=logging.ERROR))  # errors are never throttled
+
+    clock[0] = 61
+    after_window = _record()
+    assert throttle.filter(after_window)
+    assert after_window.suppressed == 3
+
+
+def test_sampling_drops_records_below_error_only():
+    throttle = logs.ThrottleFilter(sample={'access': 0.0})
+
+    assert not throttle.filter(_record(name='access', level=logging.INFO))
+    assert throttle.filter(_record(name='access', level=logging.ERROR))
+    assert throttle.filter(_record(name='ledger', level=logging.INFO))
+
+
+def test_parse_pairs():
+    assert logs._parse_pairs('access=WARNING, sqlalchemy.engine=info', str.upper) == {
+        'access': 'WARNING', 'sqlalchemy.engine': 'INFO',
+    }
+    assert logs._parse_pairs(None, float) == {}
@@ -0,0 +1,60 @@
+"""Prometheus metrics (metrics.py)."""
+import json
+import os
+
+import metrics
+from conftest import BASE_URL
+
+
+def _scrape(client):
+    response = client.get('/metrics', base_url=BASE_URL)
+    assert response.status_code == 200
+    values = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line and not line.startswith('#'):
+            series, _, value = line.rpartition(' ')
+            values[series] = float(value)
+    return values
+
+
+def _series(name, **labels):
+    return f'{name}{metrics._format_labels(metrics._labels(**labels))}'
+
+
+def test_requests_are_counted_by_route_rule(admin_client, app):
+    key = _series('http_requests_total', method='GET', route='/api/admin/loans/<int:loan_id>', status='404')
+    before = _scrape(admin_client).get(key, 0)
+
+    for loan_id in (101, 102, 103):
+        admin_client.get(f'/api/admin/loans/{loan_id}', base_url=BASE_URL)
+    scraped = _scrape(admin_client)
+
+    assert scraped[key] == before + 3
+    assert not any('/api/admin/loans/101' in series for series in scraped)
+    count = _series('http_request_duration_seconds_count', method='GET', route='/api/admin/loans/<int:loan_id>')
+    inf = f'http_request_duration_seconds_bucket{{method="GET",route="/api/admin/loans/<int:loan_id>",le="+Inf"}}'
+    assert scraped[inf] == scraped[count] >= 3
+    assert scraped['db_queries_total'] > 0
+
+
+def test_snapshots_of_other_workers_are_added(admin_client, app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_DIR', str(tmp_path))
+    gone = 2 ** 22 + 12345  # no such process
+    with open(os.path.join(tmp_path, f'metrics-{gone}.json'), 'w') as fh:
+        json.dump([
+            ['http_requests_total', [['method', 'GET'], ['route', '/gone'], ['status', '200']], 7],
+            ['http_requests_in_progress', [['method', 'GET'], ['route', '/gone']], 2],
+        ], fh)
+
+    scraped = _scrape(admin_client)
+
+    assert scraped[_series('http_requests_total', method='GET', route='/gone', status='200')] == 7
+    assert _series('http_requests_in_progress', method='GET', route='/gone') not in scraped
+
+
+def test_token_guards_the_endpoint(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'secret')
+    client = app.test_client()
+
+    assert client.get('/metrics', base_url=BASE_URL).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}, base_url=BASE_URL).status_code == 200
@@ -0,0 +1,56 @@
+"""Maintained investor portfolio summaries (portfolio.py)."""
+import pytest
+
+import portfolio
+from conftest import BASE_URL
+from models import db, Investment, InvestorPortfolio
+
+
+def _summary(investor_id):
+    row = db.session.get(InvestorPortfolio, investor_id, populate_existing=True)
+    return {name: pytest.approx(getattr(row, name)) for name in portfolio.SUMMARY_FIELDS}
+
+
+def _from_source(investor_id):
+    return dict(portfolio._aggregate(investor_id).get(investor_id) or dict.fromkeys(portfolio.SUMMARY_FIELDS, 0))
+
+
+def test_dashboard_builds_the_row_on_first_read(investor_client, investor):
+    db.session.add(Investment(investor_id=investor.id, amount=1000, duration_months=6, rate=12, status='approved'))
+    db.session.commit()
+
+    response = investor_client.get('/api/investor/dashboard', base_url=BASE_URL)
+
+    assert response.status_code == 200
+    assert response.get_json()['investment_summary'] == {
+        'count': 1, 'total_invested': 1000, 'total_returns': portfolio.projected_value(1000, 12, 6)}
+    assert _summary(investor.id) == _from_source(investor.id)
+
+
+def test_approvals_keep_the_row_in_step_with_the_source_tables(admin_client, investor):
+    portfolio.get_summary(investor.id)
+    pending = Investment(investor_id=investor.id, amount=250, duration_months=3, rate=10, status='pending')
+    db.session.add(pending)
+    db.session.commit()
+
+    response = admin_client.put(f'/api/admin/approve-investment/{pending.id}', base_url=BASE_URL)
+
+    assert response.status_code == 200, response.get_json()
+    assert _summary(investor.id) == _from_source(investor.id)
+    assert _summary(investor.id)['investment_count'] == 1
+
+
+def test_rebuild_all_matches_aggregates(book, app):
+    assert portfolio.rebuild() > 0
+    db.session.commit()
+
+    totals = portfolio._aggregate()
+    for investor_id, values in totals.items():
+        assert _summary(investor_id) == values
+
+
+def test_rebuild_endpoint_validates_the_investor(admin_client):
+    assert admin_client.post('/api/admin/portfolio/rebuild', json={'investor_id': 'x'},
+                             base_url=BASE_URL).status_code == 400
+    assert admin_client.post('/api/admin/portfolio/rebuild', json={'investor_id': 999},
+                             base_url=BASE_URL).status_code == 404
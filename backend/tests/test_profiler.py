@@ -0,0 +1,68 @@
+"""Request profiling: signed X-Profile-Token headers and PROFILE_SAMPLE_RATE."""
+import os
+
+import pytest
+
+import profiler
+from conftest import BASE_URL
+
+
+@pytest.fixture
+def profile_dir(app, tmp_path, monkeypatch):
+    directory = tmp_path / 'profiles'
+    monkeypatch.setitem(app.config, 'PROFILE_DIR', str(directory))
+    return directory
+
+
+def _issue(admin_client, mode):
+    response = admin_client.post('/api/admin/profiling/token', json={'mode': mode}, base_url=BASE_URL)
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_signed_token_profiles_the_request(app, admin_client, profile_dir):
+    issued = _issue(admin_client, 'cprofile')
+
+    response = app.test_client().get('/api/ping', headers={issued['header']: issued['token']}, base_url=BASE_URL)
+
+    profile_id = response.headers['X-Profile-Id']
+    assert sorted(os.listdir(profile_dir)) == [f'{profile_id}.json', f'{profile_id}.pstats']
+    (summary,) = admin_client.get('/api/admin/profiles', base_url=BASE_URL).get_json()['profiles']
+    assert (summary['id'], summary['mode'], summary['path'], summary['status']) == (profile_id, 'cprofile', '/api/ping', 200)
+    download = admin_client.get(f'/api/admin/profiles/{profile_id}', base_url=BASE_URL)
+    assert download.status_code == 200 and download.data
+
+
+def test_forged_or_missing_token_is_not_profiled(app, profile_dir):
+    client = app.test_client()
+
+    assert 'X-Profile-Id' not in client.get('/api/ping', base_url=BASE_URL).headers
+    assert 'X-Profile-Id' not in client.get('/api/ping', headers={profiler.HEADER: 'forged'}, base_url=BASE_URL).headers
+    assert not profile_dir.exists()
+
+
+def test_sample_rate_profiles_requests_in_sample_mode(app, profile_dir, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILE_SAMPLE_RATE', 1.0)
+    monkeypatch.setitem(app.config, 'PROFILE_SAMPLE_MODE', 'sample')
+
+    response = app.test_client().get('/api/ping', base_url=BASE_URL)
+
+    profile_id = response.headers['X-Profile-Id']
+    assert (profile_dir / f'{profile_id}.collapsed').exists()
+
+
+def test_old_profiles_are_pruned_past_keep(app, profile_dir, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILE_SAMPLE_RATE', 1.0)
+    monkeypatch.setitem(app.config, 'PROFILE_KEEP', 2)
+    client = app.test_client()
+
+    for _ in range(4):
+        client.get('/api/ping', base_url=BASE_URL)
+
+    assert len(list(profile_dir.glob('*.json'))) == 2
+
+
+def test_unknown_mode_is_refused(admin_client):
+    response = admin_client.post('/api/admin/profiling/token', json={'mode': 'tracemalloc'}, base_url=BASE_URL)
+
+    assert response.status_code == 400
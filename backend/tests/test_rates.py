@@ -0,0 +1,53 @@
+"""Compiled rate table and batch quotes (rates.py, /api/investment-quotes)."""
+import rates
+from conftest import BASE_URL
+from models import Investment
+
+# The bracket table rates.py replaced: 28-99, 100-199, 200+, each with 1-3 / 4-6 / 7+ month tiers
+BRACKETS = [(28, 99, (8, 10, 12)), (100, 199, (10, 12, 13)), (200, float('inf'), (12, 14, 15))]
+
+
+def _bracket_rate(amount, months):
+    for lo, hi, tiers in BRACKETS:
+        if lo <= amount <= hi:
+            return tiers[0] if months <= 3 else tiers[1] if months <= 6 else tiers[2]
+    return 0
+
+
+def test_rate_grid_matches_the_brackets():
+    amounts = [27, 28, 50, 99, 100, 150, 199, 200, 5000]
+    durations = list(range(1, rates.MAX_DURATION_MONTHS + 1))
+
+    grid = rates.rate_grid(amounts, durations)
+
+    for i, amount in enumerate(amounts):
+        for j, months in enumerate(durations):
+            assert grid[i, j] == _bracket_rate(amount, months), (amount, months)
+
+
+def test_quote_projects_like_an_investment():
+    quote = rates.quote([150, 1000], [3, 12])
+
+    for i, amount in enumerate(quote['amounts']):
+        for j, months in enumerate(quote['durations']):
+            investment = Investment(amount=amount, duration_months=months, rate=rates.rate_for(amount, months))
+            assert quote['rates'][i][j] == investment.rate
+            assert quote['projected_values'][i][j] == investment.projected_value()
+
+
+def test_quote_endpoint(investor_client):
+    response = investor_client.post('/api/investment-quotes', base_url=BASE_URL,
+                                    json={'amounts': [150], 'durations': [2, 6], 'curves': True})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['rates'] == [[10, 12]]
+    assert [len(curve) for curve in body['curves'][0]] == [2, 6]
+    assert body['curves'][0][1][-1] == body['projected_values'][0][1]
+
+
+def test_quote_endpoint_rejects_small_amounts(investor_client):
+    response = investor_client.post('/api/investment-quotes', base_url=BASE_URL,
+                                    json={'amounts': [10], 'durations': [6]})
+
+    assert response.status_code == 400
@@ -0,0 +1,46 @@
+"""Core read models (read_models.py) against the ORM loads they replace."""
+from sqlalchemy import select
+
+import read_models
+from models import db, Investment, LoanApplication, LoanRepayment
+
+
+def test_investments_match_the_orm(book, app):
+    rows = {row.id: row for row in read_models.investments()}
+    orm = read_models._orm_investments()
+
+    assert len(rows) == len(orm)
+    for inv in orm:
+        row = rows[inv.id]
+        assert (row.amount, row.status, row.approved_at) == (inv.amount, inv.status, inv.approved_at)
+        assert row.investor_first_name == (inv.investor.first_name if inv.investor else None)
+
+
+def test_cached_statements_take_fresh_values(book, app):
+    # Lambda statements are compiled once; each call must still bind its own filter
+    for status in ('pending', 'rejected', 'approved', 'pending'):
+        expected = {'approved': ('approved', 'matured')}.get(status, (status,))
+        assert {row.status for row in read_models.investments(status)} <= set(expected)
+        assert len(read_models.investments(status)) == db.session.query(Investment) \
+            .filter(Investment.status.in_(expected)).count()
+
+    investor_ids = db.session.scalars(select(LoanApplication.investor_id).distinct().limit(3)).all()
+    for investor_id in investor_ids:
+        assert [row.id for row in read_models.investor_loans(investor_id)] == \
+               [loan.id for loan in read_models._orm_loans(investor_id)]
+
+
+def test_repayment_pages(book, app):
+    total = db.session.query(LoanRepayment).count()
+    assert total > 5
+    first = read_models.repayments(page=1, per_page=5)
+    second = read_models.repayments(page=2, per_page=5)
+
+    assert first.total == total and first.pages == -(-total // 5)
+    assert len(first.items) == min(5, total)
+    assert not {row.id for row in first.items} & {row.id for row in second.items}
+    newest = db.session.scalars(
+        select(LoanRepayment.id).order_by(LoanRepayment.date_paid.desc(), LoanRepayment.id.desc()).limit(5)
+    ).all()
+    assert [row.id for row in first.items] == newest
+    assert read_models.repayments(page=0, per_page=1000).per_page == read_models.MAX_PER_PAGE
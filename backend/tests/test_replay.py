@@ -0,0 +1,94 @@
+"""Loading, preparing and replaying captured traffic (replay.py)."""
+import json
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from werkzeug.serving import make_server
+
+import replay
+from models import db, LoanApplication
+
+T0 = datetime(2025, 6, 1).timestamp()
+
+
+def _record(t, rule, method='GET', user=('investor', 'u1'), args=None, query=None, body=None, status=200):
+    return {'t': T0 + t, 'm': method, 'r': rule, 'a': args or {}, 'q': query or {}, 'b': body,
+            'u': list(user) if user else None, 's': status, 'd': 5.0, 'n': 10}
+
+
+def _rules(app):
+    return {(rule.rule, method): rule for rule in app.url_map.iter_rules() for method in rule.methods}
+
+
+def test_load_merges_files_in_time_order_and_windows(tmp_path):
+    (tmp_path / 'capture-1.jsonl').write_text('\n'.join(json.dumps(r) for r in [
+        _record(3, '/api/ping'), _record(1, '/api/ping'), {'t': T0 + 2, 'm': 'GET', 'r': None}]) + '\n')
+    (tmp_path / 'capture-2.jsonl').write_text(json.dumps(_record(2, '/api/investor/loans')) + '\n\n')
+
+    assert [r['t'] - T0 for r in replay.load(str(tmp_path))] == [1, 2, 3]
+    assert [r['t'] - T0 for r in replay.load(str(tmp_path), start=datetime(2025, 6, 1, 0, 0, 2))] == [2, 3]
+
+
+def test_prepare_maps_users_and_fills_ids_from_their_own_rows(app, book):
+    records = [
+        _record(0, '/api/investor/loans/<int:loan_id>/signed-docs', args={'loan_id': ':loan'}),
+        _record(1, '/api/admin/pending-investments', user=('admin', 'a1'), query={'investor_id': ':investor', 'page': '2'}),
+        _record(2, '/api/removed'),
+    ]
+    local = replay._Local(records, seed=0)
+    investor_id = local.investor_of(['investor', 'u1'])
+    own_loans = set(db.session.scalars(select(LoanApplication.id).where(LoanApplication.investor_id == investor_id)))
+    all_loans = set(db.session.scalars(select(LoanApplication.id)))
+
+    method, path, body, headers = replay.prepare(records[0], local, _rules(app))
+    assert method == 'GET' and body is None
+    assert int(path.split('/')[-2]) in (own_loans or all_loans)
+    assert headers['Cookie'].startswith('access_token_cookie=')
+    assert '?investor_id=' in replay.prepare(records[1], local, _rules(app))[1]
+    assert replay.prepare(records[2], local, _rules(app)) is None
+
+
+def test_prepare_rebuilds_json_and_upload_bodies(app, book):
+    records = [
+        _record(0, '/api/investor-resend-confirmation', method='POST', user=None,
+                body={'json': {'email': 'x' * 16, 'investment_id': ':investment'}}),
+        _record(1, '/api/investor-resend-confirmation', method='POST', user=None,
+                body={'form': {'email': 'x' * 16}, 'files': {'proof': [100, '.pdf']}}),
+    ]
+    local = replay._Local(records, seed=0)
+
+    _, _, body, headers = replay.prepare(records[0], local, _rules(app))
+    assert headers['Content-Type'] == 'application/json'
+    assert isinstance(json.loads(body)['investment_id'], int)
+    _, _, body, headers = replay.prepare(records[1], local, _rules(app))
+    assert headers['Content-Type'].startswith('multipart/form-data')
+    assert b'filename="replay.pdf"' in body and b'\0' * 100 in body
+
+
+@pytest.fixture
+def target(app):
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+def test_run_replays_and_reports_per_route(app, book, target):
+    records = [_record(i * 0.01, '/api/ping', user=None) for i in range(5)]
+    records += [_record(0.05 + i * 0.01, '/api/investor/loans') for i in range(3)]
+    records.append(_record(0.1, '/api/investor/loans', method='POST', status=201))
+
+    result = replay.run(app, records, target, speed=10, concurrency=2, reads_only=True)
+
+    assert (result['requests'], result['skipped']) == (8, 0)
+    routes = {r['route']: r for r in result['routes']}
+    assert routes['/api/ping']['count'] == 5 and routes['/api/investor/loans']['count'] == 3
+    assert all(r['status_mismatches'] == 0 and r['errors'] == 0 for r in routes.values())
+
+
+def test_run_refuses_an_empty_capture(app):
+    with pytest.raises(ValueError):
+        replay.run(app, [_record(0, '/api/ping', method='POST')], 'http://127.0.0.1:1', reads_only=True)
@@ -0,0 +1,77 @@
+"""Version-keyed result cache with single-flight misses (result_cache.py)."""
+import threading
+import time
+
+import result_cache
+from conftest import BASE_URL
+from models import db, LoanApplication
+
+
+def test_concurrent_misses_compute_once(app):
+    calls = []
+    start = threading.Barrier(8)
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)  # long enough for every caller to arrive
+        return b'value'
+
+    def caller():
+        start.wait()
+        results.append(result_cache.get_or_compute('single-flight', compute))
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [b'value'] * 8
+    assert result_cache.get_or_compute('single-flight', compute) == b'value'
+    assert len(calls) == 1
+
+
+def test_uncacheable_results_are_not_stored(app):
+    calls = []
+
+    def compute():
+        calls.append(1)
+
+    result_cache.get_or_compute('nothing', compute)
+    result_cache.get_or_compute('nothing', compute)
+
+    assert len(calls) == 2
+
+
+def test_sqlite_backend_leases_across_instances(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    first, second = result_cache.SQLiteBackend(path), result_cache.SQLiteBackend(path)
+
+    assert first.acquire('key', 30)
+    assert not second.acquire('key', 30)
+    first.set('key', b'value', 60)
+    first.release('key')
+
+    assert second.get('key') == b'value'
+    assert second.acquire('key', 30)
+
+
+def test_writes_invalidate_cached_responses(admin_client, investor):
+    def loan_stats():
+        response = admin_client.get('/api/admin/loan-stats', base_url=BASE_URL)
+        assert response.status_code == 200
+        return response.get_json()
+
+    before = result_cache.stats()
+    first = loan_stats()
+    assert loan_stats() == first
+    assert result_cache.stats()['hits'] == before['hits'] + 1
+
+    db.session.add(LoanApplication(investor_id=investor.id, full_name='Rudo Moyo', email=investor.email,
+                                   phone=investor.phone, amount=500, interest_rate=10))
+    db.session.commit()
+
+    assert loan_stats() != first
+    assert result_cache.stats()['misses'] == before['misses'] + 2
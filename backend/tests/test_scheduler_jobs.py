@@ -0,0 +1,101 @@
+"""Maturity and overdue sweeps (scheduler.py) on a small synthetic book."""
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import func, select
+
+import scheduler
+from conftest import BASE_URL, NOW, _client
+from models import db, Investment, LoanApplication, Notification
+
+
+def _count(model, *where):
+    return db.session.scalar(select(func.count()).select_from(model).where(*where))
+
+
+def test_mark_matured_investments(book, app):
+    approved = _count(Investment, Investment.status == 'approved')
+    matured_before = _count(Investment, Investment.status == 'matured')
+    notifications = _count(Notification)
+    assert approved
+
+    result = scheduler.mark_matured_investments(today=(NOW + timedelta(days=3 * 365)).date())
+
+    assert result == {'matured': approved, 'notified': approved}
+    assert _count(Investment, Investment.status == 'approved') == 0
+    assert _count(Investment, Investment.status == 'matured') == matured_before + approved
+    assert _count(Notification) == notifications + approved
+    assert scheduler.mark_matured_investments(today=(NOW + timedelta(days=3 * 365)).date())['matured'] == 0
+
+
+def test_mark_matured_leaves_running_investments(book, app):
+    running = _count(Investment, Investment.status == 'approved', Investment.maturity_date > NOW.date())
+
+    scheduler.mark_matured_investments(today=NOW.date())
+
+    assert _count(Investment, Investment.status == 'approved') == running
+
+
+def test_matured_investments_stay_under_the_approved_filter(book, app):
+    scheduler.mark_matured_investments(today=(NOW + timedelta(days=3 * 365)).date())
+    investor_id = db.session.scalar(
+        select(Investment.investor_id).where(Investment.status == 'matured').limit(1)
+    )
+    expected = _count(Investment, Investment.investor_id == investor_id, Investment.status.in_(('approved', 'matured')))
+
+    response = _client(app, 'investor', investor_id).get(
+        '/api/investor/investments', query_string={'status': 'approved', 'per_page': 100}, base_url=BASE_URL)
+
+    assert response.status_code == 200
+    statuses = [inv['status'] for inv in response.get_json()['investments']]
+    assert len(statuses) == expected
+    assert 'matured' in statuses
+
+
+def test_mark_overdue_loans(book, app, admin_client):
+    later = NOW + timedelta(days=365)
+    approved = _count(LoanApplication, LoanApplication.status == 'approved')
+    overdue_before = _count(LoanApplication, LoanApplication.status == 'overdue')
+    assert approved
+
+    result = scheduler.mark_overdue_loans(now=later)
+
+    assert result['overdue'] == approved
+    assert _count(LoanApplication, LoanApplication.status == 'overdue') == overdue_before + approved
+    assert scheduler.mark_overdue_loans(now=later)['overdue'] == 0
+
+    response = admin_client.get('/api/admin/loans', query_string={'status': 'approved', 'per_page': 500},
+                                base_url=BASE_URL)
+    assert response.status_code == 200
+    assert {loan['status'] for loan in response.get_json()['loans']} == {'overdue'}
+
+
+def test_window_reminders_remind_each_investment_and_loan_once(book, app):
+    for months in range(36):
+        scheduler.window_reminders(today=(NOW + relativedelta(months=months)).date().replace(day=23))
+
+    messages = db.session.scalars(select(Notification.message).where(Notification.message.like('Reminder:%'))).all()
+    assert messages
+    assert len(messages) == len(set(messages))
+    first_start = NOW.date().replace(day=8)
+    expected = _count(Investment, Investment.status.in_(('approved', 'matured')),
+                      Investment.maturity_date > first_start)
+    assert sum('Investment' in message for message in messages) == expected
+
+
+def test_reapproved_investment_gets_a_term(admin_client, admin, investor):
+    assert admin.id == 1  # only the super-admin may re-approve
+    investment = Investment(investor_id=investor.id, amount=1000, duration_months=6, rate=5, status='rejected')
+    db.session.add(investment)
+    db.session.commit()
+
+    response = admin_client.put(f'/api/admin/reapprove-investment/{investment.id}', base_url=BASE_URL)
+
+    assert response.status_code == 200, response.get_json()
+    db.session.expire_all()
+    investment = db.session.get(Investment, investment.id)
+    assert investment.status == 'approved'
+    assert investment.approved_at is not None
+    assert investment.maturity_date == Investment.maturity_for(investment.approved_at, 6)
+    later = investment.maturity_date + timedelta(days=1)
+    assert scheduler.mark_matured_investments(today=later)['matured'] == 1
@@ -0,0 +1,73 @@
+"""The prefork master (serve.py) keeps its worker count up."""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not os.path.exists(f'/proc/{os.getpid()}/task'), reason='needs /proc')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _workers(master):
+    with open(f'/proc/{master.pid}/task/{master.pid}/children') as f:
+        return {int(pid) for pid in f.read().split()}
+
+
+def _wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.2)
+    raise AssertionError('timed out')
+
+
+def _ping(port):
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/ping', timeout=2) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+@pytest.fixture
+def master():
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}', '--workers', '1', '--threads', '2',
+         '--graceful-timeout', '1'],
+        cwd=BACKEND, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for(lambda: _ping(port))
+        yield process, port
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def test_killed_worker_is_replaced(master):
+    process, port = master
+    (worker,) = _wait_for(lambda: _workers(process))
+
+    os.kill(worker, signal.SIGKILL)
+
+    (replacement,) = _wait_for(lambda: _workers(process) - {worker})
+    assert replacement != worker
+    assert _wait_for(lambda: _ping(port))
@@ -0,0 +1,33 @@
+"""N+1 detection (sql_inspector.build_report) and the report endpoints."""
+import sql_inspector
+from conftest import BASE_URL
+
+
+def test_repeated_select_with_different_params_is_an_n_plus_one():
+    lookups = [('SELECT * FROM investor WHERE investor.id = ?', (i,), 0.5) for i in range(6)]
+    writes = [('UPDATE investor SET version = ? WHERE investor.id = ?', (1, i), 0.5) for i in range(6)]
+
+    report = sql_inspector.build_report(lookups + writes, threshold=5)
+
+    assert report['queries'] == 12
+    assert report['duplicates'] == 2
+    assert report['n_plus_one'] == ['SELECT * FROM investor WHERE investor.id = ?']
+
+
+def test_same_select_with_same_params_is_not_an_n_plus_one():
+    statements = [('SELECT * FROM investor WHERE investor.id = ?', (1,), 0.5)] * 6
+
+    assert sql_inspector.build_report(statements, threshold=5)['n_plus_one'] == []
+
+
+def test_normalize_collapses_literals_and_in_lists():
+    assert (sql_inspector.normalize("SELECT * FROM t WHERE a = 'x' AND b IN (1, 2, 3)")
+            == sql_inspector.normalize("SELECT * FROM t WHERE a = 'yy'  AND b IN (4, 5)")
+            == 'SELECT * FROM t WHERE a = ? AND b IN (?, ...)')
+
+
+def test_report_endpoints_are_404_while_the_inspector_is_off(admin_client):
+    assert not sql_inspector.enabled()
+
+    assert admin_client.get('/api/admin/sql-reports', base_url=BASE_URL).status_code == 404
+    assert admin_client.get('/api/admin/sql-reports/0123456789ab', base_url=BASE_URL).status_code == 404
@@ -0,0 +1,53 @@
+"""Monte Carlo liquidity stress test (stress.py)."""
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+import forecast
+import stress
+
+
+@pytest.fixture
+def loaded(book, app, monkeypatch):
+    monkeypatch.setattr(stress, '_cache', OrderedDict())
+    return forecast.get_book()
+
+
+def _deterministic_shortfall(book, horizon, opening_cash, defaulted=False):
+    repayments, slots, payouts, _ = stress._prepare(book, forecast.current_window(), horizon, opening_cash)
+    inflows = np.zeros(horizon) if defaulted else np.bincount(slots, weights=repayments, minlength=horizon)
+    return np.maximum(-(opening_cash + np.cumsum(inflows - payouts)), 0)
+
+
+@pytest.mark.parametrize('default_rate, defaulted', [(0.0, False), (1.0, True)])
+def test_certain_scenarios_match_the_forecast(loaded, monkeypatch, default_rate, defaulted):
+    monkeypatch.setattr(stress, 'ELEMENT_BUDGET', 7 * 10)  # several loan chunks per batch
+    expected = _deterministic_shortfall(loaded, 12, 5000.0, defaulted)
+
+    result = stress.simulate(loaded, opening_cash=5000.0, workers=1, scenarios=10, default_rate=default_rate,
+                             late_rate=0.0, horizon=12)
+
+    for offset, window in enumerate(result['windows']):
+        assert window['shortfall_percentiles']['p50'] == pytest.approx(expected[offset], abs=0.01)
+        assert window['shortfall_probability'] == (1.0 if expected[offset] > 0 else 0.0)
+
+
+def test_seeded_runs_repeat_and_are_cached(loaded):
+    params = dict(scenarios=300, default_rate=0.1, late_rate=0.2, horizon=6, seed=3)
+
+    first = stress.simulate(loaded, workers=1, **params)
+    stress._cache.clear()
+    again = stress.simulate(loaded, workers=1, **params)
+    cached = stress.simulate(loaded, workers=1, **params)
+
+    assert again['windows'] == first['windows']
+    assert not first['cached'] and cached['cached']
+
+
+def test_more_defaults_never_shrink_the_median_shortfall(loaded):
+    low = stress.simulate(loaded, workers=1, scenarios=500, default_rate=0.0, late_rate=0.1, horizon=6)
+    high = stress.simulate(loaded, workers=1, scenarios=500, default_rate=0.5, late_rate=0.1, horizon=6)
+
+    for a, b in zip(low['windows'], high['windows']):
+        assert b['shortfall_percentiles']['p50'] >= a['shortfall_percentiles']['p50']
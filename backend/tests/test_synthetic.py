@@ -0,0 +1,67 @@
+"""The seeded synthetic data generator (synthetic.py)."""
+from sqlalchemy import func, select
+
+import synthetic
+from conftest import NOW
+from models import db, Investment, Investor, LoanApplication, LoanRepayment, WithdrawalRequest
+
+
+def _wipe():
+    for table in reversed(db.metadata.sorted_tables):
+        db.session.execute(table.delete())
+    db.session.commit()
+
+
+def _rows():
+    return {
+        'investors': db.session.execute(
+            select(Investor.id, Investor.username, Investor.is_approved, Investor.created_at).order_by(Investor.id)).all(),
+        'investments': db.session.execute(
+            select(Investment.id, Investment.investor_id, Investment.amount, Investment.status,
+                   Investment.maturity_date).order_by(Investment.id)).all(),
+        'withdrawals': db.session.execute(
+            select(WithdrawalRequest.id, WithdrawalRequest.investment_id, WithdrawalRequest.status)
+            .order_by(WithdrawalRequest.id)).all(),
+        'repayments': db.session.execute(
+            select(LoanRepayment.id, LoanRepayment.loan_id, LoanRepayment.amount_paid, LoanRepayment.status)
+            .order_by(LoanRepayment.id)).all(),
+    }
+
+
+def test_same_seed_produces_the_same_rows(app):
+    first_counts = synthetic.generate(investors=20, investments=80, loans=30, seed=3, now=NOW)
+    first = _rows()
+    _wipe()
+    second_counts = synthetic.generate(investors=20, investments=80, loans=30, seed=3, now=NOW)
+
+    assert second_counts == first_counts
+    assert _rows() == first
+
+
+def test_a_different_seed_produces_different_rows(app):
+    synthetic.generate(investors=20, investments=80, loans=30, seed=3, now=NOW)
+    first = _rows()
+    _wipe()
+    synthetic.generate(investors=20, investments=80, loans=30, seed=4, now=NOW)
+
+    assert _rows() != first
+
+
+def test_generated_rows_follow_the_status_lifecycles(app, book):
+    assert book['investor'] == 30 and book['investment'] == 150 and book['loan_application'] == 60
+
+    approved = set(db.session.scalars(select(Investor.id).where(Investor.is_approved.is_(True))))
+    assert set(db.session.scalars(select(Investment.investor_id).distinct())) <= approved
+    assert set(db.session.scalars(select(LoanApplication.investor_id).distinct())) <= approved
+    assert not db.session.scalar(select(func.count()).select_from(Investment).where(
+        Investment.status == 'approved', Investment.maturity_date.is_(None)))
+    assert not db.session.scalar(select(func.count()).select_from(WithdrawalRequest).join(
+        Investment, Investment.id == WithdrawalRequest.investment_id).where(Investment.maturity_date > NOW.date()))
+
+
+def test_ids_continue_after_existing_rows(app, book):
+    top = db.session.scalar(select(func.max(Investment.id)))
+
+    synthetic.generate(investors=5, investments=10, loans=0, seed=8, now=NOW)
+
+    assert db.session.scalar(select(func.min(Investment.id)).where(Investment.id > top)) == top + 1
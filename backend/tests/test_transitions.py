@@ -0,0 +1,68 @@
+"""Conditional status transitions (models.transition_status) and how conflicts reach clients."""
+import pytest
+from sqlalchemy import event
+
+import app as app_module
+from conftest import BASE_URL
+from models import db, ConcurrentUpdateError, Investment, TRANSITION_RETRIES, transition_status
+
+
+def _investment(investor, status='pending'):
+    investment = Investment(investor_id=investor.id, amount=1000, duration_months=6, rate=5, status=status)
+    db.session.add(investment)
+    db.session.commit()
+    return investment
+
+
+def test_first_caller_wins_the_transition(investor):
+    investment = _investment(investor)
+
+    assert transition_status(Investment, investment.id, 'pending', status='approved')
+    db.session.commit()
+    assert not transition_status(Investment, investment.id, 'pending', status='rejected')
+
+    db.session.refresh(investment)
+    assert investment.status == 'approved'
+    assert investment.version == 1
+
+
+def test_missing_row_is_not_transitioned(app):
+    assert not transition_status(Investment, 12345, 'pending', status='approved')
+
+
+def test_retries_exhausted_raise(investor):
+    investment = _investment(investor)
+    attempts = []
+
+    # Another writer bumps the version between every read and conditional UPDATE; it
+    # runs on the raw DBAPI connection because SQLite allows a single writer
+    def interfere(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE investment'):
+            attempts.append(statement)
+            cursor.connection.execute('UPDATE investment SET version = version + 1 WHERE id = ?', (investment.id,))
+
+    event.listen(db.engine, 'before_cursor_execute', interfere)
+    try:
+        with pytest.raises(ConcurrentUpdateError):
+            transition_status(Investment, investment.id, 'pending', status='approved')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', interfere)
+        db.session.rollback()
+
+    assert len(attempts) == TRANSITION_RETRIES + 1
+    db.session.refresh(investment)
+    assert investment.status == 'pending'
+
+
+def test_conflict_is_answered_with_409(admin_client, investor, monkeypatch):
+    investment = _investment(investor)
+
+    def busy(model, row_id, *args, **kwargs):
+        raise ConcurrentUpdateError(f'{model.__tablename__} {row_id} is being updated concurrently')
+
+    monkeypatch.setattr(app_module, 'transition_status', busy)
+    response = admin_client.put(f'/api/admin/approve-investment/{investment.id}', base_url=BASE_URL)
+
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json()['retry'] is True
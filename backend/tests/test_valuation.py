@@ -0,0 +1,40 @@
+"""Vectorised valuation snapshots (valuation.py) agree with the per-row model methods."""
+from datetime import date, timedelta
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import select
+
+import valuation
+from conftest import NOW
+from models import db, Investment, InvestmentValuation
+
+
+def _relativedelta_months(start, on):
+    delta = relativedelta(on, start)
+    return max(1, delta.years * 12 + delta.months)
+
+
+def test_elapsed_months_matches_relativedelta():
+    starts = [date(2024, 1, 1) + timedelta(days=n) for n in range(0, 800, 3)]
+    starts += [date(2024, 1, 31), date(2024, 3, 31), date(2023, 8, 31), date(2024, 2, 29), date(2023, 5, 30)]
+    year, month, day = (np.array(parts) for parts in zip(*((s.year, s.month, s.day) for s in starts)))
+
+    for on in [date(2025, 4, 30), date(2025, 2, 28), date(2024, 2, 29), date(2025, 6, 30), date(2025, 3, 1),
+               date(2025, 4, 29), date(2026, 1, 31)]:
+        expected = [_relativedelta_months(start, on) for start in starts]
+        assert valuation.elapsed_months(year, month, day, on).tolist() == expected, on
+
+
+def test_stored_values_match_projected_value(book, app):
+    on = NOW.date()
+    assert valuation.value_investments(on) > 0
+
+    stored = db.session.execute(
+        select(InvestmentValuation.investment_id, InvestmentValuation.elapsed_months)
+        .where(InvestmentValuation.valuation_date == on)
+    ).all()
+    for investment_id, elapsed in stored:
+        investment = db.session.get(Investment, investment_id)
+        start = investment.approved_at or investment.created_at
+        assert elapsed == min(_relativedelta_months(start.date(), on), investment.duration_months)
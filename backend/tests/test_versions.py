@@ -0,0 +1,60 @@
+"""Table-version ETags (versions.py) on admin list endpoints."""
+from sqlalchemy import insert
+
+import versions
+from conftest import BASE_URL
+from models import db, LoanApplication
+
+URL = '/api/admin/loan-applications'
+
+
+def _loan(investor):
+    db.session.add(LoanApplication(investor_id=investor.id, full_name='Rudo Moyo', email=investor.email,
+                                   phone=investor.phone, amount=500, interest_rate=10))
+    db.session.commit()
+
+
+def test_matching_etag_is_answered_with_304(admin_client, investor):
+    _loan(investor)
+    first = admin_client.get(URL, base_url=BASE_URL)
+    assert first.status_code == 200
+    tag = first.headers['ETag']
+
+    again = admin_client.get(URL, headers={'If-None-Match': tag}, base_url=BASE_URL)
+
+    assert again.status_code == 304
+    assert again.headers['ETag'] == tag
+
+
+def test_write_changes_the_etag(admin_client, investor):
+    tag = admin_client.get(URL, base_url=BASE_URL).headers['ETag']
+
+    _loan(investor)
+    response = admin_client.get(URL, headers={'If-None-Match': tag}, base_url=BASE_URL)
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != tag
+    assert len(response.get_json()['loans']) == 1
+
+
+def test_investor_with_the_current_tag_gets_403(admin_client, investor_client):
+    for url in (URL, '/api/admin/pending-investments', '/api/admin/pending-repayments'):
+        tag = admin_client.get(url, base_url=BASE_URL).headers['ETag']
+
+        response = investor_client.get(url, headers={'If-None-Match': tag}, base_url=BASE_URL)
+
+        assert response.status_code == 403, url
+        assert 'ETag' not in response.headers
+
+
+def test_bulk_insert_bumps_the_table_version(app, investor):
+    before = versions.current(['loan_application'])
+
+    db.session.execute(insert(LoanApplication), [
+        {'investor_id': investor.id, 'full_name': 'Rudo Moyo', 'email': investor.email, 'phone': investor.phone,
+         'amount': 100 * n, 'interest_rate': 10}
+        for n in range(1, 4)
+    ])
+    db.session.commit()
+
+    assert versions.current(['loan_application']) != before
@@ -0,0 +1,75 @@
+"""Review work-queue leases (work_queue.py)."""
+from datetime import datetime, timedelta
+
+import work_queue
+from conftest import BASE_URL, _client
+from models import db, AdminUser, LoanApplication
+
+
+def _loans(investor, n):
+    loans = [LoanApplication(investor_id=investor.id, full_name='Rudo Moyo', email=investor.email,
+                             phone=investor.phone, amount=100 + i, interest_rate=20) for i in range(n)]
+    db.session.add_all(loans)
+    db.session.commit()
+    return loans
+
+
+def _second_admin(app):
+    other = AdminUser(name='Other', email='other@example.com')
+    other.set_password('password')
+    db.session.add(other)
+    db.session.commit()
+    return other, _client(app, 'admin', other.id)
+
+
+def _claim(client, count):
+    response = client.post('/api/admin/work-queue/loans/claim', json={'count': count}, base_url=BASE_URL)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_claims_by_two_admins_do_not_overlap(app, admin_client, investor):
+    _loans(investor, 5)
+    _, other_client = _second_admin(app)
+
+    mine = {item['id'] for item in _claim(admin_client, 3)['items']}
+    theirs = _claim(other_client, 3)
+
+    assert len(mine) == 3
+    assert len(theirs['items']) == 2
+    assert not mine & {item['id'] for item in theirs['items']}
+    assert theirs['backlog'] == {'pending': 5, 'unclaimed': 0, 'claimed': 5}
+
+
+def test_claiming_again_renews_and_keeps_the_batch(admin_client, investor):
+    _loans(investor, 4)
+    first = {item['id'] for item in _claim(admin_client, 2)['items']}
+
+    again = {item['id'] for item in _claim(admin_client, 0)['items']}
+
+    assert again == first
+
+
+def test_leased_item_is_refused_to_other_admins(app, admin_client, investor):
+    (loan,) = _loans(investor, 1)
+    _, other_client = _second_admin(app)
+    _claim(admin_client, 1)
+
+    response = other_client.put(f'/api/admin/reject-loan/{loan.id}', base_url=BASE_URL)
+
+    assert response.status_code == 409
+    db.session.refresh(loan)
+    assert loan.status == 'pending'
+
+
+def test_expired_and_released_leases_are_claimable(app, admin, admin_client, investor):
+    loans = _loans(investor, 2)
+    other, other_client = _second_admin(app)
+    _claim(admin_client, 2)
+    db.session.execute(LoanApplication.__table__.update().where(LoanApplication.id == loans[0].id)
+                       .values(claimed_until=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+    assert {item['id'] for item in _claim(other_client, 5)['items']} == {loans[0].id}
+    assert work_queue.release(LoanApplication, admin.id) == 1
+    assert {item['id'] for item in _claim(other_client, 5)['items']} == {loan.id for loan in loans}
@@ -0,0 +1,133 @@
+"""
+Per-table write versions and conditional GETs.
+
+Every commit that inserted, updated or deleted rows of a table — through
+the ORM unit of work or an ORM-enabled insert()/update()/delete() — bumps
+that table's TableVersion row right after it commits, in a short
+transaction of its own: bumping inside the business transaction would
+hold the counter rows' locks until commit and serialise every writer on
+the hot tables (audit_log, notification). A reader that lands between
+the commit and the bump pairs new data with the old version, which the
+bump then retires, so tags can only be invalidated early. Readers combine
+the versions of the tables a response depends on into a weak ETag, so a
+client whose tag is still current gets a 304 after one primary-key read
+instead of the endpoint's queries.
+"""
+import hashlib
+from datetime import date
+from functools import wraps
+
+from flask import make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, insert, select, update
+
+from models import db, TableVersion
+
+_TOUCHED = 'touched_tables'
+
+
+# -------------------- Write tracking --------------------
+
+def _touch(session, names):
+    names = set(names) - {TableVersion.__tablename__}
+    if names:
+        session.info.setdefault(_TOUCHED, set()).update(names)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _after_flush(session, flush_context):
+    _touch(session, (obj.__table__.name for obj in (*session.new, *session.dirty, *session.deleted)))
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _on_execute(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    result = orm_execute_state.invoke_statement()
+    # Sweeps that matched nothing leave the version alone; -1 means the driver could not tell.
+    # ORM bulk INSERTs from a list of rows return a result without a rowcount.
+    if getattr(result, 'rowcount', -1) != 0:
+        _touch(orm_execute_state.session, [orm_execute_state.statement.table.name])
+    return result
+
+
+@event.listens_for(db.session, 'after_commit')
+def _after_commit(session):
+    names = session.info.pop(_TOUCHED, None)
+    if names:
+        with db.engine.begin() as connection:
+            bump(connection, names)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop(_TOUCHED, None)
+
+
+def bump(connection, names):
+    """Increment the version of each named table, creating missing counters."""
+    names = sorted(names)
+    bumped = connection.execute(
+        update(TableVersion).where(TableVersion.name.in_(names)).values(version=TableVersion.version + 1)
+    ).rowcount
+    if bumped < len(names):
+        existing = set(connection.execute(select(TableVersion.name).where(TableVersion.name.in_(names))).scalars())
+        connection.execute(insert(TableVersion), [{'name': n, 'version': 1} for n in names if n not in existing])
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _seed_counters(target, connection, **kw):
+    # Seeding every counter up front keeps concurrent first writes from racing to insert it
+    existing = set(connection.execute(select(TableVersion.name)).scalars())
+    missing = [{'name': name, 'version': 0} for name in target.tables if name not in existing]
+    if missing:
+        connection.execute(insert(TableVersion), missing)
+
+
+# -------------------- Reads --------------------
+
+def current(names):
+    """{table: version} for the named tables, 0 for tables never written."""
+    found = dict(db.session.execute(
+        select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(names))
+    ).all())
+    return {name: found.get(name, 0) for name in names}
+
+
+def etag(names):
+    """
+    Weak validator for the current request: the path, query parameters,
+    caller and date plus the versions of the tables the response reads.
+    """
+    state = (
+        request.path,
+        sorted(request.args.items(multi=True)),
+        get_jwt_identity(),
+        date.today().isoformat(),
+        sorted(current(names).items()),
+    )
+    return hashlib.blake2b(repr(state).encode(), digest_size=12).hexdigest()
+
+
+def conditional(*models):
+    """
+    Serve 304 Not Modified while none of `models`' tables changed since the
+    client's ETag was issued. Goes below the auth decorators.
+    """
+    names = [m.__tablename__ for m in models]
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            tag = etag(names)
+            if request.if_none_match.contains_weak(tag):
+                response = make_response('', 304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(tag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
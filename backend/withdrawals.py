@@ -0,0 +1,48 @@
+"""
+Opening withdrawal requests.
+
+Shared by the synchronous request_withdrawal endpoint and the surge
+intake workers (intake.py), so both paths apply the same checks.
+"""
+from datetime import datetime
+
+import portfolio
+from models import db, Investment, WithdrawalRequest, transition_status, INVESTMENT_ACTIVE_STATUSES
+
+
+class WithdrawalRefused(Exception):
+    """The investment cannot be withdrawn; the message is safe to show the investor."""
+
+
+def open_withdrawal(investment_id, investor_id, intake_id=None):
+    """
+    Move an active investment to 'withdrawal_requested' and add its pending
+    WithdrawalRequest. Raises LookupError if the investment does not exist
+    and WithdrawalRefused if it cannot be withdrawn. Not committed.
+    """
+    investment = db.session.get(Investment, investment_id)
+    if investment is None:
+        raise LookupError(f'Investment {investment_id} not found')
+
+    if investment.status not in INVESTMENT_ACTIVE_STATUSES:
+        raise WithdrawalRefused('Only approved investments can be withdrawn')
+
+    # Prevent duplicate pending requests
+    if WithdrawalRequest.query.filter_by(investment_id=investment_id, status='pending').first():
+        raise WithdrawalRefused('You already requested a withdrawal for this investment')
+
+    # Conditional transition: only one concurrent request can claim the investment
+    if not transition_status(Investment, investment.id, INVESTMENT_ACTIVE_STATUSES, status='withdrawal_requested'):
+        raise WithdrawalRefused('Only approved investments can be withdrawn')
+
+    withdrawal = WithdrawalRequest(
+        investment_id=investment.id,
+        investor_id=investor_id,
+        amount=investment.amount,
+        status='pending',
+        intake_id=intake_id,
+        created_at=datetime.utcnow()
+    )
+    db.session.add(withdrawal)
+    portfolio.withdrawal_requested(investment)
+    return withdrawal
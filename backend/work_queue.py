@@ -0,0 +1,201 @@
+"""
+Review work queues for admins.
+
+Instead of every admin paging through the same pending list, an admin
+claims the next N unclaimed pending items of a kind. The claim is one
+conditional UPDATE that only takes rows whose lease is free or expired,
+so concurrent claims never hand the same item to two admins. Leases run
+out after LEASE unless renewed by claiming again, which returns the
+admin's whole current batch. Approve/reject endpoints refuse items
+leased to someone else.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, select, update
+
+from models import db, Investor, Investment, LoanApplication, LoanRepayment
+
+LEASE = timedelta(minutes=15)
+MAX_CLAIM = 50
+
+KINDS = {
+    'investors': Investor,
+    'investments': Investment,
+    'loans': LoanApplication,
+    'repayments': LoanRepayment,
+}
+
+
+def pending_filter(model):
+    if model is Investor:
+        return (Investor.is_confirmed.is_(True), Investor.is_approved.is_(False), Investor.is_rejected.is_(False))
+    return (model.status == 'pending',)
+
+
+def _free(model, now):
+    return or_(model.claimed_by.is_(None), model.claimed_until < now)
+
+
+def claim(model, admin_id, count):
+    """
+    Lease up to `count` more unclaimed pending items to `admin_id` (oldest
+    first) and renew the leases they already hold. Returns every item the
+    admin now holds. Commits.
+    """
+    admin_id = int(admin_id)
+    now = datetime.utcnow()
+    until = now + LEASE
+
+    db.session.execute(
+        update(model)
+        .where(model.claimed_by == admin_id, model.claimed_until >= now, *pending_filter(model))
+        .values(claimed_until=until)
+        .execution_options(synchronize_session=False)
+    )
+    if count > 0:
+        candidates = (
+            select(model.id)
+            .where(_free(model, now), *pending_filter(model))
+            .order_by(model.id)
+            .limit(count)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        db.session.execute(
+            update(model)
+            .where(model.id.in_(candidates), _free(model, now), *pending_filter(model))
+            .values(claimed_by=admin_id, claimed_until=until)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    return held(model, admin_id)
+
+
+def held(model, admin_id):
+    """Pending items currently leased to `admin_id`."""
+    return (
+        model.query
+        .filter(model.claimed_by == int(admin_id), model.claimed_until >= datetime.utcnow(), *pending_filter(model))
+        .order_by(model.id)
+        .all()
+    )
+
+
+def release(model, admin_id, ids=None):
+    """Give back some (or all) of an admin's leases. Returns how many were released. Commits."""
+    stmt = update(model).where(model.claimed_by == int(admin_id))
+    if ids is not None:
+        stmt = stmt.where(model.id.in_(ids))
+    released = db.session.execute(
+        stmt.values(claimed_by=None, claimed_until=None).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return released
+
+
+def claimed_by_other(model, row_id, admin_id):
+    """True if the row is under a live lease held by a different admin."""
+    holder = db.session.execute(
+        select(model.claimed_by).where(model.id == row_id, model.claimed_until >= datetime.utcnow())
+    ).scalar()
+    return holder is not None and holder != int(admin_id)
+
+
+def backlog(model):
+    """Pending items of a kind split into claimed and unclaimed."""
+    now = datetime.utcnow()
+    pending, unclaimed = db.session.execute(
+        select(func.count(), func.count().filter(_free(model, now))).where(*pending_filter(model))
+    ).one()
+    return {'pending': pending, 'unclaimed': unclaimed, 'claimed': pending - unclaimed}
+
+
+# -------------------- Review payloads --------------------
+
+def _investor_brief(investor):
+    if investor is None:
+        return None
+    return {
+        'id': investor.id,
+        'name': f'{investor.first_name} {investor.surname}',
+        'email': investor.email,
+        'phone': investor.phone,
+    }
+
+
+def review_items(kind, items):
+    """Serialize claimed items with what a reviewer needs, loading related rows in one query each."""
+    if kind == 'investors':
+        return [
+            dict(inv.to_dict(), files={
+                field: f'/api/admin/investors/{inv.id}/{field}'
+                for field in ('face_photo', 'id_document', 'proof_of_residence')
+            }, claimed_until=inv.claimed_until.isoformat())
+            for inv in items
+        ]
+
+    if kind == 'repayments':
+        loans = {
+            loan.id: loan for loan in
+            LoanApplication.query.filter(LoanApplication.id.in_({r.loan_id for r in items})).all()
+        }
+        paid = dict(db.session.execute(
+            select(LoanRepayment.loan_id, func.sum(LoanRepayment.amount_paid))
+            .where(LoanRepayment.loan_id.in_(list(loans)), LoanRepayment.status == 'approved')
+            .group_by(LoanRepayment.loan_id)
+        ).all())
+        result = []
+        for rep in items:
+            loan = loans.get(rep.loan_id)
+            result.append({
+                'id': rep.id,
+                'loan_id': rep.loan_id,
+                'amount_paid': rep.amount_paid,
+                'date_paid': rep.date_paid.isoformat() if rep.date_paid else None,
+                'method': rep.method,
+                'proof_url': f'/api/admin/loan-repayments/{rep.id}/proof' if rep.proof else None,
+                'loan': {
+                    'full_name': loan.full_name,
+                    'amount': loan.amount,
+                    'interest_rate': loan.interest_rate,
+                    'status': loan.status,
+                    'repayment_due_date': loan.repayment_due_date.isoformat() if loan.repayment_due_date else None,
+                    'total_repaid': paid.get(loan.id, 0.0),
+                } if loan else None,
+                'claimed_until': rep.claimed_until.isoformat(),
+            })
+        return result
+
+    investors = {
+        inv.id: inv for inv in
+        Investor.query.filter(Investor.id.in_({i.investor_id for i in items if i.investor_id})).all()
+    }
+    if kind == 'investments':
+        return [
+            dict(inv.to_dict(),
+                 expected_return=round(inv.projected_value() - inv.amount, 2),
+                 proof_url=f'/api/admin/investments/{inv.id}/proof_of_payment' if inv.proof_of_payment else None,
+                 investor=_investor_brief(investors.get(inv.investor_id)),
+                 claimed_until=inv.claimed_until.isoformat())
+            for inv in items
+        ]
+
+    return [
+        {
+            'id': loan.id,
+            'full_name': loan.full_name,
+            'email': loan.email,
+            'phone': loan.phone,
+            'amount': loan.amount,
+            'purpose': loan.purpose,
+            'interest_rate': loan.interest_rate,
+            'submitted_at': loan.submitted_at.isoformat() if loan.submitted_at else None,
+            'collateral': loan.collateral,
+            'next_of_kin_details': loan.next_of_kin_details,
+            'other_details': loan.other_details,
+            'signed_documents': loan.signed_documents,
+            'investor': _investor_brief(investors.get(loan.investor_id)),
+            'claimed_until': loan.claimed_until.isoformat(),
+        }
+        for loan in items
+    ]
@@ -68,8 +68,9 @@ export default function AdminLoans() {
   const handleAction = async (loanId, type) => {
     setActionLoading(prev => ({ ...prev, [loanId]: true }));
     try {
-      await api.put(`/admin/${type}-loan/${loanId}`);
-      toast.success(`Loan ${type}d successfully`);
+      const res = await api.put(`/admin/${type}-loan/${loanId}`);
+      if (res.status === 202) toast.info(res.data.msg);
+      else toast.success(`Loan ${type}d successfully`);
       fetchLoans();
     } catch (err) {
       toast.error(err.response?.data?.error || `${type} failed`);
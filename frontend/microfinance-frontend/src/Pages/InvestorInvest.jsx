@@ -90,11 +90,20 @@ export default function InvestorInvest() {
 
   const requestWithdrawal = async id => {
     try {
-      await axios.post(
-        `/investor/request-withdrawal/${id}`,
-        {},
-        { headers: { Authorization: `Bearer ${accessToken}` } }
-      );
+      const headers = { Authorization: `Bearer ${accessToken}` };
+      const res = await axios.post(`/investor/request-withdrawal/${id}`, {}, { headers });
+      if (res.status === 202) {
+        // Surge mode: the request is queued, poll until it has been processed
+        toast.info(res.data.msg);
+        const poll = async () => {
+          const { data } = await axios.get(`/investor/withdrawal-requests/${res.data.request_id}`, { headers });
+          if (data.status === 'completed') { toast.success('Withdrawal requested'); fetchInvestments(); }
+          else if (data.status === 'rejected' || data.status === 'failed') toast.error(data.error || 'Withdrawal request failed');
+          else setTimeout(poll, 2000);
+        };
+        setTimeout(poll, 1000);
+        return;
+      }
       toast.success('Withdrawal requested');
       fetchInvestments();
     } catch (err) {
@@ -235,7 +244,7 @@ export default function InvestorInvest() {
                 const maturity = new Date(inv.expected_withdrawal_date);
                 const earliest = getEarliestWithdrawalDate(maturity.toISOString());
                 const today = new Date();
-                const canRequest = inv.status === 'approved' && today >= earliest;
+                const canRequest = ['approved', 'matured'].includes(inv.status) && today >= earliest;
                 const expectedAmt = inv.expected_withdrawal_amount != null
                   ? inv.expected_withdrawal_amount
                   : +(inv.amount * Math.pow(1 + inv.rate / 100, inv.duration_months)).toFixed(2);
@@ -181,7 +181,7 @@ export default function InvestorLoans() {
                   <td className="p-3 whitespace-nowrap">{ln.loan_id}</td>
                   <td className="p-3 whitespace-nowrap">${ln.amount.toFixed(2)}</td>
                   <td className="p-3 whitespace-nowrap">{ln.purpose}</td>
-                  <td className="p-3 whitespace-nowrap capitalize"><span className={ln.status==='approved'?'text-green-600':'text-yellow-600'}>{ln.status}</span></td>
+                  <td className="p-3 whitespace-nowrap capitalize"><span className={ln.status==='approved'?'text-green-600':ln.status==='overdue'?'text-red-600':'text-yellow-600'}>{ln.status}</span></td>
                   <td className="p-3 whitespace-nowrap">{ln.interest_rate}%</td>
                   <td className="p-3 whitespace-nowrap">${ln.total_repayable?.toFixed(2)}</td>
                   <td className="p-3 whitespace-nowrap">{ln.repayment_due_date?new Date(ln.repayment_due_date).toLocaleDateString():'—'}</td>